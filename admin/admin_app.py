@@ -79,7 +79,23 @@ def health():
     try:
         with get_db() as db:
             db.execute(text("SELECT 1"))
-        return {"status": "ok", "db": "connected"}
+        result = {"status": "ok", "db": "connected"}
+
+        from features.embedding_service import get_embedding_service_client, EmbeddingServiceError
+        client = get_embedding_service_client()
+        if client is not None:
+            try:
+                result["embedding_service"] = client.metrics()
+            except EmbeddingServiceError as e:
+                result["embedding_service"] = {"status": "error", "message": str(e)}
+
+            # このワーカーがサービスの代わりにプロセス内で計算している場合は縮退状態とする
+            from features.ai_analysis import get_analyzer
+            analyzer_status = get_analyzer().service_status()
+            result["embedding_service"]["analyzer"] = analyzer_status
+            if analyzer_status["mode"] == "fallback":
+                result["status"] = "degraded"
+        return result
     except Exception as e:
         app.logger.error(f"Health check failed: {e}")
         return {"status": "error", "message": str(e)}, 500
@@ -445,13 +461,16 @@ def run_analysis():
             if analysis_mode == 'smart':
                 # 新しいLLMベース分析
                 analyzer = get_smart_analyzer()
-                results = analyzer.analyze_opinions(opinion_data)
+                use_cache = request.form.get('no_cache') != '1'
+                results = analyzer.analyze_opinions(opinion_data, use_cache=use_cache)
                 results['mode'] = 'smart'
             else:
                 # 従来のBERTクラスタリング
                 analyzer = get_analyzer()
                 results = analyzer.analyze_opinions(opinion_data)
                 results['mode'] = 'classic'
+                # 意見ごとの座標（全件分）は画面・PDFで使わないため、セッションに保存しない（セッション容量対策）
+                results.pop('data', None)
 
             app.logger.info(f"Analysis completed. Results: {list(results.keys())}")
 
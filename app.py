@@ -4,12 +4,10 @@ Flask + LINE Messaging APIを使用したメインアプリ
 """
 
 from flask import Flask, request, abort
+from werkzeug.exceptions import HTTPException
 from linebot.v3 import WebhookHandler
 from linebot.v3.exceptions import InvalidSignatureError
 from linebot.v3.messaging import (
-    Configuration,
-    ApiClient,
-    MessagingApi,
     ReplyMessageRequest,
     TextMessage,
 )
@@ -23,16 +21,24 @@ import logging
 
 from config import (
     LINE_CHANNEL_SECRET,
-    LINE_CHANNEL_ACCESS_TOKEN,
     FLASK_HOST,
     FLASK_PORT,
     FLASK_DEBUG,
+    WEBHOOK_ASYNC,
+    WEBHOOK_WORKER_THREADS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_ENQUEUE_TIMEOUT,
+    SUMMARY_WORKER_ENABLED,
+    OLLAMA_WARMUP_ENABLED,
 )
-from database.db_manager import init_db, get_db, get_or_create_user
+from database.db_manager import init_db, get_db, resolve_user
+from database.user_cache import user_scope
 from handlers.message_handler import handle_text_message
 from handlers.follow_handler import handle_follow
 from handlers.postback_handler import handle_postback
 from web.survey_form import survey_bp
+from utils.event_queue import OrderedEventDispatcher
+from utils.line_api import get_messaging_api
 
 # ログ設定
 from logging.handlers import RotatingFileHandler
@@ -60,8 +66,7 @@ app = Flask(__name__)
 # Webフォーム用blueprintを登録
 app.register_blueprint(survey_bp, url_prefix='/web')
 
-# LINE Bot APIの設定
-configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+# LINE Webhookの設定（Messaging APIクライアントはutils.line_apiで共有）
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
 
@@ -80,9 +85,10 @@ def health():
     """詳細ヘルスチェック"""
     from ollama_client import get_ollama_client
     
-    ollama_status = "ok" if get_ollama_client().is_available() else "error"
+    ollama_health = get_ollama_client().health()
+    ollama_status = "ok" if ollama_health["available"] else "error"
     
-    return {
+    result = {
         "status": "ok",
         "components": {
             "database": "ok",  # TODO: DB接続チェック
@@ -90,6 +96,26 @@ def health():
             "line_api": "ok"
         }
     }
+    
+    if WEBHOOK_ASYNC:
+        result["webhook_queue"] = event_dispatcher.stats()
+
+    from utils.llm_governor import get_llm_governor
+    result["llm_queue"] = get_llm_governor().stats()
+    result["ollama_circuit"] = ollama_health["circuit"]
+    result["ollama_pool"] = ollama_health["pool"]
+    result["ollama_context"] = ollama_health["context"]
+
+    if OLLAMA_WARMUP_ENABLED:
+        from utils.model_warmup import get_model_keeper
+        result["model_warmup"] = get_model_keeper().stats()
+
+    from utils.llm_cache import get_llm_cache
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        result["llm_cache"] = llm_cache.stats()
+    
+    return result
 
 
 @app.route("/callback", methods=["POST"])
@@ -108,10 +134,21 @@ def callback():
     
     # Webhookボディをパース
     try:
-        handler.handle(body, signature)
+        if WEBHOOK_ASYNC:
+            # 署名検証とキュー投入のみ行い、処理はワーカーに任せる
+            payload = handler.parser.parse(body, signature, as_payload=True)
+            items = [(_event_key(event), event) for event in payload.events]
+            # 全イベントを投入できる空きがなければ1件も投入せず、LINEに再送してもらう
+            # （一部だけ投入すると再送時に二重処理になる）
+            if items and not event_dispatcher.submit_all(items, timeout=WEBHOOK_ENQUEUE_TIMEOUT):
+                abort(503)
+        else:
+            handler.handle(body, signature)
     except InvalidSignatureError:
         logger.error("Invalid signature. Please check your channel access token/channel secret.")
         abort(400)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error handling webhook: {e}")
         abort(500)
@@ -119,46 +156,77 @@ def callback():
     return "OK"
 
 
+def _event_key(event) -> str:
+    """イベントの順序保証キー（送信元のユーザー・グループ・ルーム）"""
+    source = event.source
+    return (
+        getattr(source, "user_id", None)
+        or getattr(source, "group_id", None)
+        or getattr(source, "room_id", None)
+        or ""
+    )
+
+
+def dispatch_event(event):
+    """キューから取り出したイベントを対応するハンドラーに振り分け"""
+    if isinstance(event, MessageEvent):
+        if isinstance(event.message, TextMessageContent):
+            handle_message(event)
+    elif isinstance(event, FollowEvent):
+        handle_follow_event(event)
+    elif isinstance(event, PostbackEvent):
+        handle_postback_event(event)
+    else:
+        logger.info(f"No handler for event type: {event.__class__.__name__}")
+
+
+# Webhookイベントのワーカープール（WEBHOOK_ASYNC有効時のみ使用）
+event_dispatcher = OrderedEventDispatcher(
+    dispatch_event,
+    num_workers=WEBHOOK_WORKER_THREADS,
+    queue_size=WEBHOOK_QUEUE_SIZE
+)
+
+
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_message(event: MessageEvent):
     """テキストメッセージイベントのハンドラー"""
     try:
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            
-            # ユーザー情報取得
-            user_id = event.source.user_id
-            user_message = event.message.text
-            
-            logger.info(f"Received message from {user_id}: {user_message}")
-            
+        line_bot_api = get_messaging_api()
+        
+        # ユーザー情報取得
+        user_id = event.source.user_id
+        user_message = event.message.text
+        
+        logger.info(f"Received message from {user_id}: {user_message}")
+        
+        # イベント処理中は解決済みユーザーを各ハンドラーで共有
+        with user_scope(user_id):
             # データベースでユーザーを取得または作成
             with get_db() as db:
-                user = get_or_create_user(db, user_id)
-                logger.info(f"User: {user.id} (hash: {user.line_user_id_hash[:8]}...)")
+                user = resolve_user(db, user_id)
+                logger.info(f"User: {user.user_id} (hash: {user.user_hash[:8]}...)")
             
             # メッセージハンドラーに委譲
             reply_messages = handle_text_message(user_id, user_message)
-            
-            # 応答送信
-            if reply_messages:
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(
-                        reply_token=event.reply_token,
-                        messages=reply_messages
-                    )
+        
+        # 応答送信
+        if reply_messages:
+            line_bot_api.reply_message_with_http_info(
+                ReplyMessageRequest(
+                    reply_token=event.reply_token,
+                    messages=reply_messages
                 )
+            )
             
     except Exception as e:
         logger.error(f"Error in handle_message: {e}")
         # エラー時の応答
         try:
-            with ApiClient(configuration) as api_client:
-                line_bot_api = MessagingApi(api_client)
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(
-                        reply_token=event.reply_token,
-                        messages=[TextMessage(text="""申し訳ございません。現在、対話機能でエラーが発生しています。
+            get_messaging_api().reply_message_with_http_info(
+                ReplyMessageRequest(
+                    reply_token=event.reply_token,
+                    messages=[TextMessage(text="""申し訳ございません。現在、対話機能でエラーが発生しています。
 
 代わりに「アンケート」と送信していただくと、Webフォームからご意見を送信できます。
 
@@ -166,8 +234,8 @@ def handle_message(event: MessageEvent):
 📝 アンケート: 「アンケート」と入力
 💎 ポイント: /point
 ❓ ヘルプ: /help""")]
-                    )
                 )
+            )
         except:
             pass
 
@@ -176,22 +244,22 @@ def handle_message(event: MessageEvent):
 def handle_follow_event(event: FollowEvent):
     """友だち追加イベントのハンドラー"""
     try:
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            
-            user_id = event.source.user_id
-            logger.info(f"New follower: {user_id}")
-            
-            # フォローハンドラーに委譲
+        line_bot_api = get_messaging_api()
+        
+        user_id = event.source.user_id
+        logger.info(f"New follower: {user_id}")
+        
+        # フォローハンドラーに委譲
+        with user_scope(user_id):
             reply_messages = handle_follow(user_id)
-            
-            if reply_messages:
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(
-                        reply_token=event.reply_token,
-                        messages=reply_messages
-                    )
+        
+        if reply_messages:
+            line_bot_api.reply_message_with_http_info(
+                ReplyMessageRequest(
+                    reply_token=event.reply_token,
+                    messages=reply_messages
                 )
+            )
             
     except Exception as e:
         logger.error(f"Error in handle_follow_event: {e}")
@@ -201,24 +269,24 @@ def handle_follow_event(event: FollowEvent):
 def handle_postback_event(event: PostbackEvent):
     """ポストバックイベントのハンドラー"""
     try:
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            
-            user_id = event.source.user_id
-            postback_data = event.postback.data
-            
-            logger.info(f"Postback from {user_id}: {postback_data}")
-            
-            # ポストバックハンドラーに委譲
+        line_bot_api = get_messaging_api()
+        
+        user_id = event.source.user_id
+        postback_data = event.postback.data
+        
+        logger.info(f"Postback from {user_id}: {postback_data}")
+        
+        # ポストバックハンドラーに委譲
+        with user_scope(user_id):
             reply_messages = handle_postback(user_id, postback_data)
-            
-            if reply_messages:
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(
-                        reply_token=event.reply_token,
-                        messages=reply_messages
-                    )
+        
+        if reply_messages:
+            line_bot_api.reply_message_with_http_info(
+                ReplyMessageRequest(
+                    reply_token=event.reply_token,
+                    messages=reply_messages
                 )
+            )
             
     except Exception as e:
         logger.error(f"Error in handle_postback_event: {e}")
@@ -228,6 +296,16 @@ if __name__ == "__main__":
     # データベース初期化
     logger.info("Initializing database...")
     init_db()
+
+    # 対話要約ジョブのワーカー起動
+    if SUMMARY_WORKER_ENABLED:
+        from features.summary_queue import start_summary_worker
+        start_summary_worker()
+
+    # モデルのウォームアップと常駐維持
+    if OLLAMA_WARMUP_ENABLED:
+        from utils.model_warmup import start_model_keeper
+        start_model_keeper()
     
     # アプリケーション起動
     logger.info(f"Starting Flask app on {FLASK_HOST}:{FLASK_PORT}")
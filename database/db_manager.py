@@ -3,14 +3,26 @@
 SQLAlchemyを使用したデータベース接続・操作管理
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey
+from sqlalchemy import (
+    create_engine, event, select, update, insert, func, bindparam,
+    Column, Index, Integer, String, Text, Boolean, Float, DateTime, ForeignKey,
+    LargeBinary, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from typing import Dict
 import hashlib
 from contextlib import contextmanager
 
-from config import DATABASE_URL, LINE_ID_SALT
+from config import DATABASE_URL, LINE_ID_SALT, USER_CACHE_SIZE, USER_CACHE_TTL
+from database.user_cache import (
+    UserIdentityCache,
+    CachedUser,
+    get_request_user,
+    set_request_user,
+    clear_request_user,
+)
 
 # SQLAlchemy設定
 engine = create_engine(
@@ -68,6 +80,22 @@ class Opinion(Base):
     user = relationship("User", back_populates="opinions")
 
 
+class OpinionEmbedding(Base):
+    """意見の埋め込みベクトルモデル（AI分析用、モデルごとに1件）"""
+    __tablename__ = "opinion_embeddings"
+    __table_args__ = (
+        UniqueConstraint("opinion_id", "model_name", name="uq_opinion_embeddings_opinion_model"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    opinion_id = Column(Integer, ForeignKey("opinions.id", ondelete="CASCADE"), nullable=False)
+    model_name = Column(String(200), nullable=False)  # モデル名と計算方法（プーリング・最大長）
+    content_hash = Column(String(64), nullable=False)  # 計算時の意見本文のSHA-256（編集の検出用）
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float16のバイト列
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ChatSession(Base):
     """対話セッションモデル"""
     __tablename__ = "chat_sessions"
@@ -90,6 +118,10 @@ class ChatSession(Base):
 class ChatMessage(Base):
     """対話メッセージモデル"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # セッション単位で時系列に読み出すための複合インデックス
+        Index("idx_chat_messages_session_created", "session_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
@@ -101,6 +133,23 @@ class ChatMessage(Base):
     session = relationship("ChatSession", back_populates="messages")
 
 
+class SummaryJob(Base):
+    """対話要約ジョブモデル（遅延要約キュー）"""
+    __tablename__ = "summary_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
+    line_user_id = Column(String(255))  # 完了通知のプッシュ先
+    status = Column(String(20), default="pending", index=True)  # 'pending', 'running', 'done', 'failed'
+    attempts = Column(Integer, default=0)
+    next_run_at = Column(DateTime, default=datetime.utcnow)
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    opinion_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Poll(Base):
     """アンケートモデル"""
     __tablename__ = "polls"
@@ -232,8 +281,61 @@ def init_db():
     print("Database tables created successfully")
 
 
+# LINE User ID → (ハッシュ, users.id) のワーカー内キャッシュ
+_user_cache = UserIdentityCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _lookup_cached_user(line_user_id: str):
+    """リクエストスコープ → LRUキャッシュの順にユーザー情報を探す"""
+    cached = get_request_user(line_user_id)
+    if cached:
+        return cached
+
+    cached = _user_cache.get(line_user_id)
+    if cached:
+        set_request_user(line_user_id, cached)
+    return cached
+
+
+def _remember_user(line_user_id: str, user):
+    """解決したユーザーをキャッシュとリクエストスコープに登録"""
+    cached = CachedUser(user.line_user_id_hash, user.id)
+    _user_cache.put(line_user_id, cached.user_hash, cached.user_id)
+    set_request_user(line_user_id, cached)
+    return cached
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_cache(mapper, connection, target):
+    """ユーザー行の作成・削除時に該当キャッシュを破棄"""
+    _user_cache.invalidate(user_id=target.id, user_hash=target.line_user_id_hash)
+    clear_request_user()
+
+
+def clear_user_cache():
+    """ユーザーキャッシュを全件破棄（一括削除・DB初期化後に使用）"""
+    _user_cache.clear()
+    clear_request_user()
+
+
+def get_user_cache_stats() -> dict:
+    """ユーザーキャッシュの統計情報"""
+    return _user_cache.stats()
+
+
 def get_or_create_user(db, line_user_id: str, display_name: str = None):
     """ユーザーを取得または新規作成"""
+    cached = _lookup_cached_user(line_user_id)
+    if cached:
+        # 主キー検索のみ（同一セッション内で取得済みならクエリも発生しない）
+        user = db.get(User, cached.user_id)
+        if user and user.line_user_id:
+            return user
+        # 別プロセスで削除された等の不整合はキャッシュを破棄して通常処理へ
+        _user_cache.invalidate(line_user_id=line_user_id)
+        clear_request_user()
+
     user_hash = hash_line_user_id(line_user_id)
     user = db.query(User).filter(User.line_user_id_hash == user_hash).first()
     
@@ -252,27 +354,110 @@ def get_or_create_user(db, line_user_id: str, display_name: str = None):
             user.line_user_id = line_user_id
             db.commit()
     
+    _remember_user(line_user_id, user)
     return user
 
 
+def resolve_user(db, line_user_id: str) -> CachedUser:
+    """
+    ユーザーのハッシュとIDのみを解決（必要な場合のみDBアクセス）
+
+    ORMオブジェクトが不要な処理（意見・投票の登録など）ではこちらを使う
+    """
+    cached = _lookup_cached_user(line_user_id)
+    if cached:
+        return cached
+
+    user = get_or_create_user(db, line_user_id)
+    return CachedUser(user.line_user_id_hash, user.id)
+
+
 def add_points(db, user_id: int, points: int, reason: str, reference_id: int = None):
-    """ユーザーにポイントを付与"""
-    # ユーザーの累積ポイント更新
-    user = db.query(User).filter(User.id == user_id).first()
-    if user:
-        user.total_points += points
-        
-        # 履歴登録
-        history = PointsHistory(
-            user_id=user_id,
-            points=points,
-            reason=reason,
-            reference_id=reference_id
+    """
+    ユーザーにポイントを付与
+
+    累積ポイントは1文のUPDATEで加算するため、複数ワーカーからの同時付与でも
+    取りこぼしが発生しない。コミットは呼び出し元のトランザクション（get_db）に任せる。
+
+    Returns:
+        付与後の累積ポイント（ユーザーが存在しない場合はNone）
+    """
+    total_points = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(total_points=func.coalesce(User.total_points, 0) + points)
+        .returning(User.total_points)
+    ).scalar_one_or_none()
+
+    if total_points is None:
+        return None
+
+    # 履歴登録
+    db.add(PointsHistory(
+        user_id=user_id,
+        points=points,
+        reason=reason,
+        reference_id=reference_id
+    ))
+    db.flush()
+    return total_points
+
+
+def add_points_bulk(db, grants: Dict[int, int], reason: str, reference_id: int = None) -> int:
+    """
+    複数ユーザーにまとめてポイントを付与（管理者の一括付与・投票報酬など）
+
+    Args:
+        grants: {user_id: 付与ポイント}
+        reason: 付与理由
+        reference_id: 関連ID
+
+    Returns:
+        付与したユーザー数
+    """
+    if not grants:
+        return 0
+
+    # 存在するユーザーのみ対象にする
+    existing_ids = {
+        row[0] for row in db.execute(
+            select(User.id).where(User.id.in_(list(grants.keys())))
         )
-        db.add(history)
-        db.commit()
-        return user.total_points
-    return None
+    }
+    params = [
+        {"uid": user_id, "pts": points}
+        for user_id, points in grants.items()
+        if user_id in existing_ids
+    ]
+    if not params:
+        return 0
+
+    users_table = User.__table__
+    db.execute(
+        users_table.update()
+        .where(users_table.c.id == bindparam("uid"))
+        .values(total_points=func.coalesce(users_table.c.total_points, 0) + bindparam("pts")),
+        params
+    )
+    db.execute(
+        insert(PointsHistory),
+        [
+            {
+                "user_id": p["uid"],
+                "points": p["pts"],
+                "reason": reason,
+                "reference_id": reference_id,
+            }
+            for p in params
+        ]
+    )
+
+    # 一括UPDATEはセッション上のUserオブジェクトに反映されないため失効させる
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, User) and obj.id in existing_ids:
+            db.expire(obj, ["total_points"])
+
+    return len(params)
 
 
 if __name__ == "__main__":
@@ -33,7 +33,7 @@ CREATE TABLE IF NOT EXISTS opinions (
 CREATE TABLE IF NOT EXISTS chat_sessions (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-    status VARCHAR(20) DEFAULT 'active',  -- 'active', 'completed', 'abandoned'
+    status VARCHAR(20) DEFAULT 'active',  -- 'active', 'summarizing', 'completed', 'abandoned'
     turn_count INTEGER DEFAULT 0,
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     completed_at TIMESTAMP,
@@ -51,6 +51,33 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 意見の埋め込みベクトルテーブル（AI分析用、モデルごとに1件）
+CREATE TABLE IF NOT EXISTS opinion_embeddings (
+    id SERIAL PRIMARY KEY,
+    opinion_id INTEGER NOT NULL REFERENCES opinions(id) ON DELETE CASCADE,
+    model_name VARCHAR(200) NOT NULL,  -- モデル名と計算方法（プーリング・最大長）
+    content_hash VARCHAR(64) NOT NULL,  -- 計算時の意見本文のSHA-256（編集の検出用）
+    dim INTEGER NOT NULL,
+    vector BYTEA NOT NULL,  -- float16のバイト列
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_opinion_embeddings_opinion_model UNIQUE (opinion_id, model_name)
+);
+
+-- 対話要約ジョブテーブル（遅延要約キュー）
+CREATE TABLE IF NOT EXISTS summary_jobs (
+    id SERIAL PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    line_user_id VARCHAR(255),  -- 完了通知のプッシュ先
+    status VARCHAR(20) DEFAULT 'pending',  -- 'pending', 'running', 'done', 'failed'
+    attempts INTEGER DEFAULT 0,
+    next_run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    opinion_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- アンケート定義テーブル
 CREATE TABLE IF NOT EXISTS polls (
     id SERIAL PRIMARY KEY,
@@ -112,6 +139,8 @@ CREATE INDEX IF NOT EXISTS idx_opinions_cluster_id ON opinions(cluster_id);
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_id ON chat_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_status ON chat_sessions(status);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages(session_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages(session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_summary_jobs_status_next_run ON summary_jobs(status, next_run_at);
 CREATE INDEX IF NOT EXISTS idx_poll_responses_poll_id ON poll_responses(poll_id);
 CREATE INDEX IF NOT EXISTS idx_points_history_user_id ON points_history(user_id);
 
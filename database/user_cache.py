@@ -0,0 +1,137 @@
+"""ユーザー識別情報のキャッシュ
+
+LINE User ID → (ハッシュ値, users.id) の対応をワーカープロセスごとにLRUで保持し、
+イベントごとに繰り返されるハッシュ計算とSELECTを省く。
+
+あわせて、1つのWebhookイベント処理中に解決済みのユーザーを持ち回るための
+リクエストスコープのコンテキスト（contextvars）を提供する。
+"""
+
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+
+class CachedUser(NamedTuple):
+    """キャッシュされるユーザー識別情報"""
+    user_hash: str
+    user_id: int
+
+
+class UserIdentityCache:
+    """LINE User IDをキーとするLRUキャッシュ（TTL付き）"""
+
+    def __init__(self, max_size: int = 10000, ttl: int = 300):
+        """
+        初期化
+
+        Args:
+            max_size: 最大保持件数（超過時は最も古く使われたものから削除）
+            ttl: 有効期限（秒）。別プロセスでの削除を考慮した安全策
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, line_user_id: str) -> Optional[CachedUser]:
+        """キャッシュから取得（期限切れ・未登録の場合はNone）"""
+        with self._lock:
+            entry = self._entries.get(line_user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            cached, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[line_user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(line_user_id)
+            self.hits += 1
+            return cached
+
+    def put(self, line_user_id: str, user_hash: str, user_id: int):
+        """キャッシュに登録"""
+        with self._lock:
+            self._entries[line_user_id] = (CachedUser(user_hash, user_id), time.monotonic())
+            self._entries.move_to_end(line_user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, line_user_id: str = None, user_id: int = None, user_hash: str = None):
+        """指定したユーザーのキャッシュを削除"""
+        with self._lock:
+            if line_user_id is not None:
+                self._entries.pop(line_user_id, None)
+
+            if user_id is None and user_hash is None:
+                return
+
+            stale_keys = [
+                key for key, (cached, _) in self._entries.items()
+                if cached.user_id == user_id or cached.user_hash == user_hash
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+
+    def clear(self):
+        """全件削除"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """キャッシュの統計情報"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# 現在処理中のイベントのユーザー情報 {"line_user_id": str, "user": CachedUser or None}
+_request_user = contextvars.ContextVar("request_user", default=None)
+
+
+@contextmanager
+def user_scope(line_user_id: str):
+    """
+    1つのイベント処理の間、解決済みユーザーを共有するスコープ
+
+    スコープ内で最初に解決されたユーザー情報が保持され、
+    以降の get_request_user() で再利用される。
+    """
+    token = _request_user.set({"line_user_id": line_user_id, "user": None})
+    try:
+        yield
+    finally:
+        _request_user.reset(token)
+
+
+def get_request_user(line_user_id: str) -> Optional[CachedUser]:
+    """現在のスコープで解決済みのユーザー情報を取得"""
+    scope = _request_user.get()
+    if scope and scope["line_user_id"] == line_user_id:
+        return scope["user"]
+    return None
+
+
+def set_request_user(line_user_id: str, cached: CachedUser):
+    """現在のスコープに解決済みのユーザー情報を保存"""
+    scope = _request_user.get()
+    if scope and scope["line_user_id"] == line_user_id:
+        scope["user"] = cached
+
+
+def clear_request_user():
+    """現在のスコープの解決済みユーザー情報を破棄"""
+    scope = _request_user.get()
+    if scope:
+        scope["user"] = None
@@ -2,21 +2,32 @@ import logging
 import numpy as np
 from typing import List, Dict, Any
 import io
+import os
+import time
 import base64
 import matplotlib
 
 # バックエンドをAggに設定（GUIなし環境用）
 matplotlib.use('Agg')
 
+from config import (
+    EMBEDDING_STORE_ENABLED,
+    BERT_BACKEND,
+    BERT_NUM_THREADS,
+    BERT_ONNX_DIR,
+    BERT_BATCH_TOKEN_BUDGET,
+    EMBEDDING_SERVICE_FALLBACK,
+    EMBEDDING_SERVICE_RETRY_SECONDS,
+    ANALYSIS_N_CLUSTERS,
+)
+
 logger = logging.getLogger(__name__)
 
 # PyTorch関連のインポートを遅延させるか、try-exceptで囲む
 try:
     import torch
     from transformers import BertJapaneseTokenizer, BertModel
-    from sklearn.cluster import KMeans
-    from sklearn.decomposition import PCA
-    from sklearn.manifold import TSNE
+    from features.clustering import cluster_embeddings, StageTimer
     import matplotlib.pyplot as plt
     import seaborn as sns
     PYTORCH_AVAILABLE = True
@@ -25,11 +36,20 @@ except ImportError as e:
     PYTORCH_AVAILABLE = False
 
 class OpinionAnalyzer:
-    def __init__(self, model_name: str = "cl-tohoku/bert-base-japanese-v3"):
+    # 埋め込みの計算方法（CLSトークン・最大トークン長）
+    POOLING = "cls"
+    MAX_LENGTH = 128
+    # 結果に含めるクラスタごとの意見数
+    CLUSTER_SAMPLE_TEXTS = 10
+    # 散布図に描画する最大件数（超える場合は間引く）
+    PLOT_MAX_POINTS = 5000
+
+    def __init__(self, model_name: str = "cl-tohoku/bert-base-japanese-v3", use_service: bool = True):
         """
         初期化
         Args:
             model_name: 使用するBERTモデル名
+            use_service: EMBEDDING_SERVICE_URL が設定されていれば埋め込みの計算をサービスに依頼する
         """
         if not PYTORCH_AVAILABLE:
             raise ImportError("AI analysis libraries (torch, transformers, etc.) are not installed.")
@@ -39,6 +59,64 @@ class OpinionAnalyzer:
         self.model_name = model_name
         self.model = None
         self.tokenizer = None
+        self.backend = BERT_BACKEND
+        self.encoder = None
+
+        # 埋め込みベクトル計算サービス（未設定ならNone）
+        self.service = None
+        self.service_fallbacks = 0  # サービスに接続できずプロセス内で計算した回数
+        self.service_error = None
+        self._service_retry_at = 0.0  # この時刻（time.monotonic）まではプロセス内で計算する
+        if use_service:
+            from features.embedding_service import get_embedding_service_client
+            self.service = get_embedding_service_client()
+
+    @property
+    def embedding_key(self) -> str:
+        """保存済み埋め込みの識別子（モデル名と計算方法が同じものだけを再利用する）"""
+        if self._use_service():
+            from features.embedding_service import EmbeddingServiceError
+            try:
+                return self.service.embedding_key
+            except EmbeddingServiceError as e:
+                self._service_failed(e)
+                logger.warning(f"{e}; using local embedding key")
+        key = f"{self.model_name}@{self.POOLING}-{self.MAX_LENGTH}"
+        # int8量子化はベクトルが僅かに変わるため区別する（ONNXはfp32と同じ値になる）
+        return key + "-int8" if self.backend == "torch_int8" else key
+
+    def _use_service(self) -> bool:
+        """サービスで計算するか（失敗後 EMBEDDING_SERVICE_RETRY_SECONDS の間はプロセス内で計算する）"""
+        return self.service is not None and time.monotonic() >= self._service_retry_at
+
+    def _service_failed(self, error: Exception):
+        """サービスの失敗を記録し、一定時間プロセス内の計算に切り替える"""
+        self.service_error = str(error)
+        if EMBEDDING_SERVICE_FALLBACK:
+            self._service_retry_at = time.monotonic() + EMBEDDING_SERVICE_RETRY_SECONDS
+
+    def _service_recovered(self):
+        """サービスが復旧したらプロセス内のモデルを解放する"""
+        if self.service_error is not None:
+            logger.info("Embedding service recovered")
+        self.service_error = None
+        if self.model is not None:
+            logger.info("Releasing in-process BERT model")
+            self.model = None
+            self.tokenizer = None
+            self.encoder = None
+            self.backend = BERT_BACKEND
+
+    def service_status(self) -> Dict[str, Any]:
+        """サービスの利用状況（管理画面の/health用）"""
+        retry_in = max(0.0, self._service_retry_at - time.monotonic())
+        return {
+            "mode": "fallback" if retry_in > 0 else "service",
+            "fallbacks": self.service_fallbacks,
+            "last_error": self.service_error,
+            "retry_in_sec": round(retry_in, 1),
+            "local_model_loaded": self.model is not None,
+        }
 
     def _load_model(self, progress_callback=None):
         """モデルをロードする"""
@@ -57,65 +135,136 @@ class OpinionAnalyzer:
                 
             self.model = BertModel.from_pretrained(self.model_name).to(self.device)
             self.model.eval() # 推論モード
-            logger.info("Model loaded successfully")
+
+            # 推論バックエンド（fp32 / int8動的量子化 / ONNX Runtime）
+            from features.bert_backend import create_encoder
+            onnx_path = os.path.join(BERT_ONNX_DIR, self.model_name.replace("/", "__") + ".onnx")
+            self.encoder = create_encoder(self.backend, self.model, self.device, BERT_NUM_THREADS, onnx_path)
+            self.backend = self.encoder.name
+            logger.info(f"Model loaded successfully (backend: {self.backend})")
             
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
 
-    def compute_embeddings(self, texts: List[str], batch_size: int = 32, progress_callback=None) -> np.ndarray:
+    @staticmethod
+    def _length_buckets(lengths: List[int], max_batch_size: int, token_budget: int) -> List[List[int]]:
+        """
+        トークン数の近いテキスト同士をまとめたバッチ（元のインデックスのリスト）を作る
+
+        トークン数の昇順に並べ、「バッチ内の最大トークン数 × 件数」（パディング後のサイズ）が
+        token_budget を超えるか、件数が max_batch_size に達したところで区切る。
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        current = []
+        for i in order:
+            # 昇順なので追加するテキストがバッチ内の最大トークン数になる
+            if current and (len(current) >= max_batch_size or (len(current) + 1) * lengths[i] > token_budget):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    def compute_embeddings(self, texts: List[str], batch_size: int = 32, progress_callback=None, token_budget: int = None) -> np.ndarray:
         """
         テキストリストから埋め込みベクトルを計算
+
+        トークナイズは最初に1回だけ行い、トークン数の近いテキスト同士をバッチにまとめて
+        パディングを最小限にする。結果は入力と同じ順序で返す。
+
+        Args:
+            batch_size: 1バッチの最大件数
+            token_budget: 1バッチのパディング後の最大トークン数（省略時はBERT_BATCH_TOKEN_BUDGET）
         """
+        if not texts:
+            return np.array([])
+
+        if self._use_service():
+            from features.embedding_service import EmbeddingServiceError
+            try:
+                embeddings = self.service.embed(texts, progress_callback=progress_callback)
+                self._service_recovered()
+                return embeddings
+            except EmbeddingServiceError as e:
+                self._service_failed(e)
+                if not EMBEDDING_SERVICE_FALLBACK:
+                    logger.error(f"Embedding service failed: {e}")
+                    return np.array([])
+                logger.error(
+                    f"Embedding service failed, computing embeddings in-process "
+                    f"(retrying the service in {EMBEDDING_SERVICE_RETRY_SECONDS:.0f}s): {e}"
+                )
+
+        if self.service is not None:
+            self.service_fallbacks += 1
+
         # モデルロード確認
         self._load_model(progress_callback)
-        
-        all_embeddings = []
-        total_batches = (len(texts) + batch_size - 1) // batch_size
-        
+
+        token_budget = token_budget or BERT_BATCH_TOKEN_BUDGET
+
+        # トークナイズ（パディングなし）
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.MAX_LENGTH)
+        keys = list(encoded.keys())
+        batches = self._length_buckets([len(ids) for ids in encoded["input_ids"]], batch_size, token_budget)
+        total_batches = len(batches)
+
+        embeddings = [None] * len(texts)
+
         # バッチ処理
-        for i in range(0, len(texts), batch_size):
-            batch_idx = i // batch_size
+        for batch_idx, indices in enumerate(batches):
             if progress_callback:
                 # 30%〜70%の間で進捗を表示
                 progress = 30 + int((batch_idx / total_batches) * 40)
                 progress_callback(progress, f"ベクトル化を実行中 ({batch_idx+1}/{total_batches})...")
-            
-            batch_texts = texts[i:i + batch_size]
-            
+
             try:
-                # トークナイズ
-                inputs = self.tokenizer(
-                    batch_texts, 
-                    return_tensors="pt", 
-                    padding=True, 
-                    truncation=True, 
-                    max_length=128
-                ).to(self.device)
-                
-                # 推論
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                
-                # CLSトークンのベクトルを取得 (batch_size, hidden_size)
-                cls_embeddings = outputs.last_hidden_state[:, 0, :].cpu().numpy()
-                all_embeddings.append(cls_embeddings)
-                
+                # バッチ内の最長に合わせてパディング
+                inputs = self.tokenizer.pad(
+                    [{k: encoded[k][i] for k in keys} for i in indices],
+                    padding=True,
+                    return_tensors="np"
+                )
+
+                # 推論（CLSトークンのベクトルを取得 (batch_size, hidden_size)）
+                cls_embeddings = self.encoder(dict(inputs))
+                for i, vector in zip(indices, cls_embeddings):
+                    embeddings[i] = vector
+
             except Exception as e:
-                logger.error(f"Error computing embeddings for batch {i}: {e}")
+                logger.error(f"Error computing embeddings for batch {batch_idx}: {e}")
                 continue
-                
-        if not all_embeddings:
+
+        # 失敗したバッチのテキストは除いて入力順に返す
+        computed = [vector for vector in embeddings if vector is not None]
+        if not computed:
             return np.array([])
-            
-        return np.concatenate(all_embeddings, axis=0)
 
-    def analyze_opinions(self, opinions: List[Dict[str, Any]], n_clusters: int = 5, progress_callback=None) -> Dict[str, Any]:
+        return np.stack(computed)
+
+    def get_embeddings(self, opinions: List[Dict[str, Any]], progress_callback=None) -> np.ndarray:
+        """
+        意見リストの埋め込みベクトルを取得（保存済みのものは再利用し、新規・編集済みの意見だけを計算）
+        """
+        if EMBEDDING_STORE_ENABLED:
+            from features.embedding_store import get_or_compute_embeddings
+            try:
+                embeddings = get_or_compute_embeddings(self, opinions, progress_callback=progress_callback)
+                return embeddings if embeddings is not None else np.array([])
+            except Exception as e:
+                # DBに接続できない場合などは全件計算する
+                logger.error(f"Embedding store unavailable, computing all embeddings: {e}")
+        return self.compute_embeddings([op["text"] for op in opinions], progress_callback=progress_callback)
+
+    def analyze_opinions(self, opinions: List[Dict[str, Any]], n_clusters=None, progress_callback=None) -> Dict[str, Any]:
         """
         意見リストを分析し、クラスタリング結果と可視化データを返す
         Args:
             opinions: [{"id": 1, "text": "...", ...}, ...]
-            n_clusters: クラスタ数
+            n_clusters: クラスタ数（"auto"で自動選択、省略時はANALYSIS_N_CLUSTERS）
             progress_callback: func(percent: int, message: str)
         """
         if not opinions:
@@ -129,34 +278,25 @@ class OpinionAnalyzer:
         if progress_callback:
             progress_callback(5, "分析を開始します...")
         
+        if n_clusters is None:
+            n_clusters = ANALYSIS_N_CLUSTERS
+        # データ数がクラスタ数より少ない場合は調整
+        if len(texts) < 2 or (n_clusters != "auto" and min(int(n_clusters), len(texts)) < 2):
+            return {"error": "Not enough data for clustering"}
+
+        timer = StageTimer()
+
         # 1. ベクトル化 (10% - 70%)
-        embeddings = self.compute_embeddings(texts, progress_callback=progress_callback)
+        with timer.stage("embedding"):
+            embeddings = self.get_embeddings(opinions, progress_callback=progress_callback)
         if len(embeddings) == 0:
             return {"error": "Failed to compute embeddings"}
-            
-        # 2. クラスタリング (K-Means) (70% - 85%)
-        if progress_callback:
-            progress_callback(75, "クラスタリングを実行中...")
-            
-        # データ数がクラスタ数より少ない場合は調整
-        actual_n_clusters = min(n_clusters, len(texts))
-        if actual_n_clusters < 2:
-             return {"error": "Not enough data for clustering"}
 
-        kmeans = KMeans(n_clusters=actual_n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(embeddings)
-        
-        # 3. 次元圧縮 (可視化用) (85% - 95%)
-        if progress_callback:
-            progress_callback(85, "可視化データを生成中...")
-            
-        # データ数に応じてPCAかt-SNEを選択
-        if len(texts) > 50:
-            reducer = TSNE(n_components=2, random_state=42, perplexity=min(30, len(texts)-1))
-        else:
-            reducer = PCA(n_components=2, random_state=42)
-            
-        coords = reducer.fit_transform(embeddings)
+        # 2. クラスタリング (70% - 85%) と 3. 次元圧縮 (可視化用) (85% - 95%)
+        clustering = cluster_embeddings(embeddings, n_clusters, progress_callback=progress_callback, timer=timer)
+        cluster_labels = clustering["labels"]
+        coords = clustering["coords"]
+        actual_n_clusters = clustering["n_clusters"]
         
         # 4. 結果の整形
         if progress_callback:
@@ -172,7 +312,9 @@ class OpinionAnalyzer:
                 clusters[label_str] = {"count": 0, "keywords": [], "texts": []}
             
             clusters[label_str]["count"] += 1
-            clusters[label_str]["texts"].append(text)
+            # 件数が多い場合に結果（セッション）が大きくならないよう一部だけ保持
+            if len(clusters[label_str]["texts"]) < self.CLUSTER_SAMPLE_TEXTS:
+                clusters[label_str]["texts"].append(text)
             
             results.append({
                 "id": op_id,
@@ -187,7 +329,9 @@ class OpinionAnalyzer:
             clusters[label]["representative"] = clusters[label]["texts"][0][:20] + "..."
 
         # 5. プロット生成
-        plot_image = self._generate_plot(results, actual_n_clusters)
+        with timer.stage("plot"):
+            plot_image = self._generate_plot(results, actual_n_clusters)
+        logger.info(f"Analysis timings (ms): {timer.timings}")
         
         if progress_callback:
             progress_callback(100, "完了しました！")
@@ -196,7 +340,11 @@ class OpinionAnalyzer:
             "clusters": clusters,
             "data": results,
             "plot_image": plot_image,
-            "total": len(texts)
+            "total": len(texts),
+            "n_clusters": actual_n_clusters,
+            "algorithm": clustering["algorithm"],
+            "k_scores": {str(k): v for k, v in clustering["k_scores"].items()},
+            "timings": timer.timings
         }
 
     def _generate_plot(self, data: List[Dict], n_clusters: int) -> str:
@@ -226,12 +374,17 @@ class OpinionAnalyzer:
                 sns.set(style="whitegrid", font="IPAGothic") # 最終フォールバック
 
         
+        # 件数が多い場合は間引いて描画する
+        if len(data) > self.PLOT_MAX_POINTS:
+            step = len(data) / self.PLOT_MAX_POINTS
+            data = [data[int(i * step)] for i in range(self.PLOT_MAX_POINTS)]
+
         # データをDataFrameに変換してプロットしやすくする
         x = [d["x"] for d in data]
         y = [d["y"] for d in data]
         clusters = [d["cluster"] for d in data]
         
-        scatter = plt.scatter(x, y, c=clusters, cmap='viridis', s=100, alpha=0.7)
+        scatter = plt.scatter(x, y, c=clusters, cmap='viridis', s=100 if len(data) <= 500 else 10, alpha=0.7)
         plt.colorbar(scatter, label='Cluster')
         plt.title('意見の分布 (AI分析結果)')
         plt.xlabel('次元 1')
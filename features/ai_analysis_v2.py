@@ -13,6 +13,8 @@ from collections import defaultdict
 import json
 
 from ollama_client import get_ollama_client
+from utils.llm_governor import BULK
+from utils.llm_cache import llm_cache_disabled
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,8 @@ class SmartOpinionAnalyzer:
         self,
         opinions: List[Dict[str, Any]],
         max_topics: int = 7,
-        progress_callback=None
+        progress_callback=None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         意見を分析し、トピックごとに整理する
@@ -38,6 +41,7 @@ class SmartOpinionAnalyzer:
             opinions: [{"id": 1, "text": "...", "priority_score": 0.8, ...}, ...]
             max_topics: 最大トピック数
             progress_callback: func(percent: int, message: str)
+            use_cache: LLM応答キャッシュを使うか（Falseの場合は全て再計算）
 
         Returns:
             {
@@ -66,36 +70,37 @@ class SmartOpinionAnalyzer:
         if progress_callback:
             progress_callback(5, "意見データを準備中...")
 
-        # 1. LLMでトピック抽出 (5% - 40%)
-        topics_data = self._extract_topics(opinions, max_topics, progress_callback)
+        with llm_cache_disabled(not use_cache):
+            # 1. LLMでトピック抽出 (5% - 40%)
+            topics_data = self._extract_topics(opinions, max_topics, progress_callback)
 
-        if not topics_data:
-            return {"error": "トピック抽出に失敗しました"}
+            if not topics_data:
+                return {"error": "トピック抽出に失敗しました"}
 
-        # 2. 各トピックに意見を割り当て (40% - 70%)
-        topics_with_opinions = self._assign_opinions_to_topics(
-            opinions,
-            topics_data,
-            progress_callback
-        )
+            # 2. 各トピックに意見を割り当て (40% - 70%)
+            topics_with_opinions = self._assign_opinions_to_topics(
+                opinions,
+                topics_data,
+                progress_callback
+            )
 
-        # 3. 各トピックの要約と優先度判定 (70% - 95%)
-        enriched_topics = self._enrich_topics(topics_with_opinions, progress_callback)
+            # 3. 各トピックの要約と優先度判定 (70% - 95%)
+            enriched_topics = self._enrich_topics(topics_with_opinions, progress_callback)
 
-        # 4. 全体サマリー生成 (95% - 100%)
-        if progress_callback:
-            progress_callback(95, "全体サマリーを生成中...")
+            # 4. 全体サマリー生成 (95% - 100%)
+            if progress_callback:
+                progress_callback(95, "全体サマリーを生成中...")
 
-        overall_summary = self._generate_overall_summary(enriched_topics)
+            overall_summary = self._generate_overall_summary(enriched_topics)
 
-        if progress_callback:
-            progress_callback(100, "分析完了！")
+            if progress_callback:
+                progress_callback(100, "分析完了！")
 
-        return {
-            "topics": enriched_topics,
-            "total": len(opinions),
-            "analysis_summary": overall_summary
-        }
+            return {
+                "topics": enriched_topics,
+                "total": len(opinions),
+                "analysis_summary": overall_summary
+            }
 
     def _extract_topics(
         self,
@@ -155,14 +160,15 @@ class SmartOpinionAnalyzer:
                 {"role": "user", "content": prompt}
             ]
 
-            response = self.llm_client.client.chat(
-                model=self.llm_client.model,
-                messages=messages,
+            response = self.llm_client.chat(
+                messages,
                 options={
                     "temperature": 0.3,
                     "num_predict": 1000,
                 },
-                format="json"
+                format="json",
+                priority=BULK,
+                mode="analysis"
             )
 
             result_text = response['message']['content'].strip()
@@ -302,14 +308,15 @@ opinion_indexは意見の番号（0から開始）、topic_idはトピックの
                     {"role": "user", "content": prompt}
                 ]
 
-                response = self.llm_client.client.chat(
-                    model=self.llm_client.model,
-                    messages=messages,
+                response = self.llm_client.chat(
+                    messages,
                     options={
                         "temperature": 0.1,
                         "num_predict": 500,
                     },
-                    format="json"
+                    format="json",
+                    priority=BULK,
+                    mode="analysis"
                 )
 
                 result_text = response['message']['content'].strip()
@@ -382,14 +389,15 @@ opinion_indexは意見の番号（0から開始）、topic_idはトピックの
                     {"role": "user", "content": prompt}
                 ]
 
-                response = self.llm_client.client.chat(
-                    model=self.llm_client.model,
-                    messages=messages,
+                response = self.llm_client.chat(
+                    messages,
                     options={
                         "temperature": 0.2,
                         "num_predict": 500,
                     },
-                    format="json"
+                    format="json",
+                    priority=BULK,
+                    mode="analysis"
                 )
 
                 result_text = response['message']['content'].strip()
@@ -454,10 +462,11 @@ opinion_indexは意見の番号（0から開始）、topic_idはトピックの
                 {"role": "user", "content": prompt}
             ]
 
-            response = self.llm_client.client.chat(
-                model=self.llm_client.model,
-                messages=messages,
-                options={"temperature": 0.2, "num_predict": 100}
+            response = self.llm_client.chat(
+                messages,
+                options={"temperature": 0.2, "num_predict": 100},
+                priority=BULK,
+                mode="analysis"
             )
 
             summary = response['message']['content'].strip()
@@ -0,0 +1,144 @@
+"""BERT推論バックエンド（CPU向け）
+
+OpinionAnalyzer.compute_embeddings のCLSベクトル計算を、BERT_BACKENDで選択した方式で実行する。
+
+- torch: PyTorchのfp32（既定）
+- torch_int8: Linear層をint8に動的量子化したPyTorchモデル（CPUのみ。fp32と比べてベクトルが僅かに変わる）
+- onnx: ONNXにエクスポートしたモデルをONNX Runtimeで実行（onnx, onnxruntime が必要。
+  BERT_ONNX_DIRにモデルがなければ初回にエクスポートする）
+
+BERT_NUM_THREADSで演算スレッド数（intra-op）を指定できる（0はライブラリの既定値）。
+"""
+
+import os
+import logging
+from typing import Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+    PYTORCH_AVAILABLE = True
+except ImportError:
+    PYTORCH_AVAILABLE = False
+
+BACKENDS = ("torch", "torch_int8", "onnx")
+
+# ONNXモデルの入力名
+ONNX_INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+class TorchEncoder:
+    """PyTorchモデルでCLSベクトルを計算"""
+
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        tensors = {k: torch.from_numpy(v).to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            outputs = self.model(**tensors)
+        return outputs.last_hidden_state[:, 0, :].cpu().numpy()
+
+
+class TorchInt8Encoder(TorchEncoder):
+    """Linear層をint8に動的量子化したPyTorchモデル"""
+
+    name = "torch_int8"
+
+    def __init__(self, model):
+        from torch.ao.quantization import quantize_dynamic
+        quantized = quantize_dynamic(model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized.eval(), torch.device("cpu"))
+
+
+class _ClsOutput(torch.nn.Module if PYTORCH_AVAILABLE else object):
+    """ONNXエクスポート用にCLSベクトルだけを返すラッパー"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)
+        return outputs.last_hidden_state[:, 0, :]
+
+
+def export_onnx(model, path: str, opset: int = 17):
+    """BERTモデルをCLSベクトルを出力するONNXモデルとしてエクスポート"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    dummy = torch.ones((2, 8), dtype=torch.long)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.onnx.export(
+        _ClsOutput(model.to("cpu")).eval(),
+        (dummy, dummy, torch.zeros_like(dummy)),
+        tmp_path,
+        input_names=ONNX_INPUT_NAMES,
+        output_names=["cls"],
+        dynamic_axes={name: {0: "batch", 1: "sequence"} for name in ONNX_INPUT_NAMES},
+        opset_version=opset,
+        dynamo=False,
+    )
+    os.replace(tmp_path, path)
+    logger.info(f"Exported ONNX model: {path}")
+
+
+class OnnxEncoder:
+    """ONNX RuntimeでCLSベクトルを計算"""
+
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        feeds = {k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        return self.session.run(None, feeds)[0]
+
+
+def create_encoder(backend: str, model, device, num_threads: int = 0, onnx_path: str = None):
+    """
+    バックエンド名からエンコーダーを作成
+
+    利用できないバックエンドが指定された場合（GPU上でint8、onnxruntime未インストールなど）は
+    警告を出してfp32のPyTorchに切り替える。
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown BERT backend: {backend} (choose from {', '.join(BACKENDS)})")
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+    if backend == "torch_int8":
+        if device.type != "cpu":
+            logger.warning("torch_int8 backend is CPU only; using fp32 torch backend")
+            return TorchEncoder(model, device)
+        return TorchInt8Encoder(model)
+
+    if backend == "onnx":
+        try:
+            if not os.path.exists(onnx_path):
+                export_onnx(model, onnx_path)
+            return OnnxEncoder(onnx_path, num_threads)
+        except Exception as e:
+            # onnx / onnxruntime が未インストールの場合など
+            logger.error(f"ONNX backend unavailable ({e}); using fp32 torch backend")
+            return TorchEncoder(model, device)
+
+    return TorchEncoder(model, device)
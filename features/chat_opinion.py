@@ -7,11 +7,12 @@ UC-001～UC-005を実装
 import logging
 from typing import List, Optional
 from datetime import datetime, timedelta
-from linebot.v3.messaging import TextMessage
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from linebot.v3.messaging import TextMessage, PushMessageRequest
 
 from database.db_manager import (
     get_db,
-    get_or_create_user,
+    resolve_user,
     add_points,
     User,
     ChatSession,
@@ -19,50 +20,58 @@ from database.db_manager import (
     Opinion
 )
 from ollama_client import get_ollama_client
+from utils.session_store import get_session_store
+from utils.line_api import get_messaging_api
 from config import (
     MAX_CHAT_TURNS,
     CHAT_SESSION_TIMEOUT,
-    POINT_CHAT_OPINION
+    POINT_CHAT_OPINION,
+    CHAT_PARALLEL_SUMMARY,
+    CHAT_SUMMARY_WAIT,
+    CHAT_SUMMARY_WORKERS,
+    CHAT_SUMMARY_MODE,
 )
 
 logger = logging.getLogger(__name__)
 
-# セッションキャッシュ（メモリ上で管理）
-_active_sessions = {}
+# 最終ターンの要約を応答生成と並行して実行するためのスレッドプール
+_summary_executor = ThreadPoolExecutor(max_workers=CHAT_SUMMARY_WORKERS, thread_name_prefix="chat-summary")
 
+SUMMARY_PENDING_TEXT = "ご意見ありがとうございました！\n内容をまとめています。完了しましたらお知らせします。"
 
-def get_active_session(user_id: str) -> Optional[dict]:
-    """アクティブなセッション情報を取得"""
-    if user_id in _active_sessions:
-        session_info = _active_sessions[user_id]
-
-        # タイムアウトチェック（UTCで統一）
-        if datetime.utcnow() - session_info['last_updated'] > timedelta(seconds=CHAT_SESSION_TIMEOUT):
-            logger.info(f"Session timeout for user {user_id}")
-            del _active_sessions[user_id]
-            return None
 
-        return session_info
+def get_active_session(user_id: str) -> Optional[dict]:
+    """アクティブなセッション情報を取得（タイムアウト済みの場合はNone）"""
+    return get_session_store().get(user_id)
 
-    return None
 
+def set_active_session(user_id: str, session_id: int, history: List[dict] = None, turn_count: int = None):
+    """
+    アクティブセッションを設定
 
-def set_active_session(user_id: str, session_id: int):
-    """アクティブセッションを設定"""
-    _active_sessions[user_id] = {
-        'session_id': session_id,
-        'last_updated': datetime.utcnow()
-    }
+    Args:
+        user_id: LINE User ID
+        session_id: ChatSession ID
+        history: 対話履歴（指定時はキャッシュし、次ターンのDB読み込みを省く）
+        turn_count: 履歴に対応するターン数（キャッシュの整合性確認用）
+    """
+    session_info = {'session_id': session_id}
+    if history is not None:
+        session_info['history'] = history
+        session_info['turn_count'] = turn_count
+    get_session_store().set(user_id, session_info)
 
 
 def clear_active_session(user_id: str):
     """アクティブセッションをクリア"""
-    if user_id in _active_sessions:
-        del _active_sessions[user_id]
+    get_session_store().delete(user_id)
 
 
 def reset_chat_session(user_id: str):
     """対話セッションをリセット"""
+    session_info = get_active_session(user_id)
+    if session_info:
+        get_ollama_client().end_session(str(session_info['session_id']))
     clear_active_session(user_id)
 
 
@@ -77,10 +86,14 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
     Returns:
         応答メッセージのリスト
     """
+    # Ollama障害中は応答生成を待たずに縮退動作
+    if get_ollama_client().is_circuit_open():
+        return handle_degraded_message(user_id, message_text)
+
     try:
         with get_db() as db:
             # ユーザー取得
-            user = get_or_create_user(db, user_id)
+            user = resolve_user(db, user_id)
 
             # アクティブセッションチェック（キャッシュ）
             session_info = get_active_session(user_id)
@@ -88,17 +101,22 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
             if session_info:
                 # キャッシュから既存セッション取得
                 session_id = session_info['session_id']
-                session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+                session = db.query(ChatSession).filter(
+                    ChatSession.id == session_id,
+                    ChatSession.status == 'active'
+                ).first()
+                if not session:
+                    clear_active_session(user_id)
             else:
                 # DBから最新のアクティブセッションを取得
                 active_sessions = db.query(ChatSession).filter(
-                    ChatSession.user_id == user.id,
+                    ChatSession.user_id == user.user_id,
                     ChatSession.status == 'active'
                 ).order_by(ChatSession.started_at.desc()).all()
 
                 # 複数のアクティブセッションがある場合、最新以外をabandonedにする
                 if len(active_sessions) > 1:
-                    logger.warning(f"Found {len(active_sessions)} active sessions for user {user.id}, cleaning up")
+                    logger.warning(f"Found {len(active_sessions)} active sessions for user {user.user_id}, cleaning up")
                     for old_session in active_sessions[1:]:  # 最新以外
                         old_session.status = 'abandoned'
                         logger.info(f"Abandoned old session {old_session.id}")
@@ -123,7 +141,7 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
             if not session:
                 # 新規セッション開始（UC-001）
                 session = ChatSession(
-                    user_id=user.id,
+                    user_id=user.user_id,
                     status='active',
                     turn_count=0
                 )
@@ -131,8 +149,9 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
                 db.commit()
                 db.refresh(session)
 
-                set_active_session(user_id, session.id)
-                logger.info(f"New chat session started: {session.id} for user {user.id}")
+                set_active_session(user_id, session.id, history=[], turn_count=0)
+                session_info = get_active_session(user_id)
+                logger.info(f"New chat session started: {session.id} for user {user.user_id}")
             
             # 終了判定を先に行う（応答生成前にチェック）
             if session.turn_count >= MAX_CHAT_TURNS:
@@ -148,40 +167,36 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
                 db.add(user_msg)
                 db.commit()
 
+                if CHAT_SUMMARY_MODE == 'deferred':
+                    # 要約はジョブキューで実行し、完了をプッシュで通知
+                    _defer_summary(db, session, user_id)
+                    return [TextMessage(text=SUMMARY_PENDING_TEXT)]
+
+                chat_history = load_session_history(db, session, session_info)
+                chat_history.append({"role": "user", "content": message_text})
+
                 # 要約生成（UC-004）
-                summary_result = finalize_chat_session(db, session)
+                summary_result = finalize_chat_session(db, session, user_id, chat_history)
 
                 if summary_result:
                     # ポイント付与（UC-005）
                     total_points = add_points(
                         db,
-                        user.id,
+                        user.user_id,
                         POINT_CHAT_OPINION,
                         'chat_opinion',
                         reference_id=summary_result['opinion_id']
                     )
 
-                    return [
-                        TextMessage(text=f"""ご意見ありがとうございました！
-
-【あなたの意見】
-{summary_result['summary']}
-
-カテゴリ: {summary_result['category']}
-
-{POINT_CHAT_OPINION}ポイントを付与しました。
-累積ポイント: {total_points} pt
-
-引き続き、ご意見をお聞かせください。""")
-                    ]
+                    return [build_thanks_message(summary_result, total_points)]
                 else:
-                    return [
-                        TextMessage(text="ご意見ありがとうございました！")
-                    ]
+                    # 要約に失敗 → ジョブキューで再試行
+                    _defer_summary(db, session, user_id)
+                    return [TextMessage(text=SUMMARY_PENDING_TEXT)]
 
             # 対話継続 - 応答を生成
-            # 対話履歴取得（既存のメッセージのみ）
-            chat_history = get_chat_history(db, session.id)
+            # 対話履歴取得（既存のメッセージのみ、キャッシュ優先）
+            chat_history = load_session_history(db, session, session_info)
 
             # 最新のユーザーメッセージを履歴に追加
             # （まだDBにコミットされていないが、LLMには渡す必要がある）
@@ -193,14 +208,24 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
                 content_preview = msg['content'][:50] if msg['content'] else '[EMPTY]'
                 logger.info(f"  [{i}] {msg['role']}: '{content_preview}...'")
 
+            ollama_client = get_ollama_client()
+
+            # 今回が最終ターンなら、要約（今回のユーザー発言まで）を応答生成と並行して開始
+            is_final_turn = session.turn_count + 1 >= MAX_CHAT_TURNS
+            summary_future = None
+            if is_final_turn and CHAT_PARALLEL_SUMMARY and CHAT_SUMMARY_MODE != 'deferred':
+                summary_future = _summary_executor.submit(ollama_client.summary_mode, list(chat_history))
+                logger.info(f"Started summary in parallel for final turn of session {session.id}")
+
             # Ollama呼び出し（UC-002: 意見収集対話、UC-003: 追加質問）
             # 完全な対話履歴（最新のユーザーメッセージを含む）を渡す
-            ollama_client = get_ollama_client()
-            assistant_response = ollama_client.chat_mode(message_text, chat_history)
+            assistant_response = ollama_client.chat_mode(message_text, chat_history, session_key=str(session.id))
 
             # 空の応答チェック
             if not assistant_response or not assistant_response.strip():
                 logger.error(f"Empty response from Ollama for session {session.id}")
+                if summary_future:
+                    summary_future.cancel()
                 return [TextMessage(text="申し訳ございません。エラーが発生しました。/resetでやり直してください。")]
 
             # ユーザーメッセージをDB保存
@@ -223,19 +248,48 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
             session.turn_count += 1
             db.commit()
 
-            # セッション更新時刻を更新
-            set_active_session(user_id, session.id)
+            # 履歴キャッシュに今回のやり取りを追記し、セッション更新時刻を更新
+            chat_history.append({"role": "assistant", "content": assistant_response})
+            set_active_session(user_id, session.id, history=chat_history, turn_count=session.turn_count)
 
             # 次回で終了かチェック
             if session.turn_count >= MAX_CHAT_TURNS:
                 # 対話終了 → 要約生成（UC-004）
-                summary_result = finalize_chat_session(db, session)
+                # 以降このセッションの対話応答は生成しないため、ホストの割り当てを解放
+                ollama_client.end_session(str(session.id))
+                if CHAT_SUMMARY_MODE == 'deferred':
+                    # 応答だけ先に返し、要約はジョブキューで実行
+                    _defer_summary(db, session, user_id)
+                    return [
+                        TextMessage(text=assistant_response),
+                        TextMessage(text=SUMMARY_PENDING_TEXT)
+                    ]
+
+                if summary_future:
+                    try:
+                        summary = summary_future.result(timeout=CHAT_SUMMARY_WAIT)
+                    except FutureTimeoutError:
+                        # 要約が間に合わない場合は応答だけ先に返し、完了後にプッシュで通知
+                        logger.info(f"Summary for session {session.id} is late, will notify by push")
+                        session.status = 'summarizing'
+                        db.commit()
+                        clear_active_session(user_id)
+                        summary_future.add_done_callback(
+                            lambda f, sid=session.id, uid=user.user_id: _complete_late_summary(f, user_id, sid, uid)
+                        )
+                        return [
+                            TextMessage(text=assistant_response),
+                            TextMessage(text=SUMMARY_PENDING_TEXT)
+                        ]
+                    summary_result = save_chat_summary(db, session, summary, user_id) if summary else None
+                else:
+                    summary_result = finalize_chat_session(db, session, user_id, chat_history)
                 
                 if summary_result:
                     # ポイント付与（UC-005）
                     total_points = add_points(
                         db,
-                        user.id,
+                        user.user_id,
                         POINT_CHAT_OPINION,
                         'chat_opinion',
                         reference_id=summary_result['opinion_id']
@@ -243,22 +297,14 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
                     
                     return [
                         TextMessage(text=assistant_response),
-                        TextMessage(text=f"""ご意見ありがとうございました！
-
-【あなたの意見】
-{summary_result['summary']}
-
-カテゴリ: {summary_result['category']}
-
-{POINT_CHAT_OPINION}ポイントを付与しました。
-累積ポイント: {total_points} pt
-
-引き続き、ご意見をお聞かせください。""")
+                        build_thanks_message(summary_result, total_points)
                     ]
                 else:
+                    # 要約に失敗 → ジョブキューで再試行
+                    _defer_summary(db, session, user_id)
                     return [
                         TextMessage(text=assistant_response),
-                        TextMessage(text="ご意見ありがとうございました！")
+                        TextMessage(text=SUMMARY_PENDING_TEXT)
                     ]
             else:
                 # 対話継続
@@ -273,6 +319,34 @@ def handle_chat_message(user_id: str, message_text: str) -> List[TextMessage]:
         return [TextMessage(text="申し訳ございません。エラーが発生しました。/resetでやり直してください。")]
 
 
+def handle_degraded_message(user_id: str, message_text: str) -> List[TextMessage]:
+    """
+    Ollama障害中のメッセージ処理
+
+    メッセージをそのまま意見として保存し（カテゴリは後で分類）、アンケートフォームを案内する。
+    """
+    from handlers.command_handler import get_survey_url
+
+    logger.warning("Ollama circuit is open, storing raw message as opinion")
+    try:
+        with get_db() as db:
+            user = resolve_user(db, user_id)
+            db.add(Opinion(
+                user_id=user.user_id,
+                source_type='chat',
+                content=message_text
+            ))
+    except Exception as e:
+        logger.error(f"Error storing raw message in degraded mode: {e}", exc_info=True)
+        return [TextMessage(text="申し訳ございません。エラーが発生しました。しばらくしてからお試しください。")]
+
+    return [TextMessage(text=f"""ただいまAIによる対話を一時停止しています。
+いただいたメッセージはご意見として記録しました。ありがとうございます。
+
+詳しいご意見はアンケートフォームからもお寄せいただけます：
+{get_survey_url(user_id)}""")]
+
+
 def get_chat_history(db, session_id: int) -> List[dict]:
     """
     セッションの対話履歴を取得
@@ -292,13 +366,44 @@ def get_chat_history(db, session_id: int) -> List[dict]:
     ]
 
 
-def finalize_chat_session(db, session: ChatSession) -> Optional[dict]:
+def load_session_history(db, session: ChatSession, session_info: Optional[dict]) -> List[dict]:
+    """
+    対話履歴をキャッシュから取得（キャッシュがない・不整合の場合はDBから読み込む）
+
+    Args:
+        db: データベースセッション
+        session: ChatSessionオブジェクト
+        session_info: get_active_session()の戻り値
+
+    Returns:
+        [{"role": "user"|"assistant", "content": "..."}]（呼び出し側で追記してよいコピー）
+    """
+    if (
+        session_info
+        and session_info.get('session_id') == session.id
+        and session_info.get('turn_count') == session.turn_count
+        and session_info.get('history') is not None
+    ):
+        return list(session_info['history'])
+
+    logger.info(f"History cache miss for session {session.id}, loading from DB")
+    return get_chat_history(db, session.id)
+
+
+def finalize_chat_session(
+    db,
+    session: ChatSession,
+    line_user_id: str = None,
+    chat_history: List[dict] = None
+) -> Optional[dict]:
     """
     対話セッションを終了し、要約を生成してDBに保存
     
     Args:
         db: データベースセッション
         session: ChatSessionオブジェクト
+        line_user_id: LINE User ID（アクティブセッションのクリアに使用）
+        chat_history: 対話履歴（省略時はDBから取得）
     
     Returns:
         {
@@ -309,7 +414,8 @@ def finalize_chat_session(db, session: ChatSession) -> Optional[dict]:
     """
     try:
         # 対話履歴取得
-        chat_history = get_chat_history(db, session.id)
+        if chat_history is None:
+            chat_history = get_chat_history(db, session.id)
         
         if not chat_history:
             logger.warning(f"No chat history for session {session.id}")
@@ -323,37 +429,120 @@ def finalize_chat_session(db, session: ChatSession) -> Optional[dict]:
             logger.error(f"Failed to generate summary for session {session.id}")
             return None
         
-        # セッションに要約を保存
-        session.status = 'completed'
-        session.completed_at = datetime.utcnow()
-        session.summary_text = summary_result.get('summary', '')
-        session.summary_category = summary_result.get('category', 'その他')
-        session.summary_emotion_score = summary_result.get('emotion_score', 5)
-        
-        # 意見テーブルに登録
-        opinion = Opinion(
-            user_id=session.user_id,
-            source_type='chat',
-            content=summary_result.get('summary', ''),
-            category=summary_result.get('category', 'その他'),
-            emotion_score=summary_result.get('emotion_score', 5),
-            session_id=session.id
-        )
-        db.add(opinion)
-        db.commit()
-        db.refresh(opinion)
-        
-        # アクティブセッションをクリア
-        clear_active_session(str(session.user_id))
-        
-        logger.info(f"Chat session finalized: {session.id}, opinion: {opinion.id}")
-        
-        return {
-            "opinion_id": opinion.id,
-            "summary": summary_result.get('summary', ''),
-            "category": summary_result.get('category', 'その他')
-        }
+        return save_chat_summary(db, session, summary_result, line_user_id)
     
     except Exception as e:
         logger.error(f"Error in finalize_chat_session: {e}", exc_info=True)
         return None
+
+
+def save_chat_summary(db, session: ChatSession, summary_result: dict, line_user_id: str = None) -> dict:
+    """
+    生成済みの要約をセッションに保存し、意見テーブルに登録
+
+    Args:
+        db: データベースセッション
+        session: ChatSessionオブジェクト
+        summary_result: summary_mode()の戻り値
+        line_user_id: LINE User ID（アクティブセッションのクリアに使用）
+
+    Returns:
+        {"opinion_id": 意見ID, "summary": 要約文, "category": カテゴリ}
+    """
+    # セッションに要約を保存
+    session.status = 'completed'
+    session.completed_at = datetime.utcnow()
+    session.summary_text = summary_result.get('summary', '')
+    session.summary_category = summary_result.get('category', 'その他')
+    session.summary_emotion_score = summary_result.get('emotion_score', 5)
+    
+    # 意見テーブルに登録
+    opinion = Opinion(
+        user_id=session.user_id,
+        source_type='chat',
+        content=summary_result.get('summary', ''),
+        category=summary_result.get('category', 'その他'),
+        emotion_score=summary_result.get('emotion_score', 5),
+        session_id=session.id
+    )
+    db.add(opinion)
+    db.commit()
+    db.refresh(opinion)
+    
+    # アクティブセッションをクリア
+    if line_user_id:
+        clear_active_session(line_user_id)
+    
+    logger.info(f"Chat session finalized: {session.id}, opinion: {opinion.id}")
+    
+    return {
+        "opinion_id": opinion.id,
+        "summary": summary_result.get('summary', ''),
+        "category": summary_result.get('category', 'その他')
+    }
+
+
+def build_thanks_message(summary_result: dict, total_points: int) -> TextMessage:
+    """要約完了時のお礼メッセージを生成"""
+    return TextMessage(text=f"""ご意見ありがとうございました！
+
+【あなたの意見】
+{summary_result['summary']}
+
+カテゴリ: {summary_result['category']}
+
+{POINT_CHAT_OPINION}ポイントを付与しました。
+累積ポイント: {total_points} pt
+
+引き続き、ご意見をお聞かせください。""")
+
+
+def _defer_summary(db, session: ChatSession, line_user_id: str):
+    """要約をジョブキューに登録し、セッションを対話対象から外す"""
+    from features.summary_queue import enqueue_summary_job, notify_summary_worker
+
+    enqueue_summary_job(db, session, line_user_id)
+    db.commit()
+    clear_active_session(line_user_id)
+    notify_summary_worker()
+
+
+def _complete_late_summary(future, line_user_id: str, session_id: int, user_db_id: int):
+    """応答に間に合わなかった要約を保存し、ポイント付与してプッシュで通知"""
+    try:
+        summary = future.result()
+    except Exception as e:
+        logger.error(f"Late summary failed for session {session_id}: {e}")
+        summary = None
+
+    try:
+        with get_db() as db:
+            session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+            if not session or session.status != 'summarizing':
+                return
+
+            if not summary:
+                # ジョブキューで再試行（完了時にプッシュ通知される）
+                logger.error(f"Failed to generate summary for session {session_id}, retrying via job queue")
+                _defer_summary(db, session, line_user_id)
+                return
+
+            summary_result = save_chat_summary(db, session, summary)
+            total_points = add_points(
+                db,
+                user_db_id,
+                POINT_CHAT_OPINION,
+                'chat_opinion',
+                reference_id=summary_result['opinion_id']
+            )
+
+        get_messaging_api().push_message(
+            PushMessageRequest(
+                to=line_user_id,
+                messages=[build_thanks_message(summary_result, total_points)]
+            )
+        )
+        logger.info(f"Late summary delivered by push for session {session_id}")
+
+    except Exception as e:
+        logger.error(f"Error completing late summary for session {session_id}: {e}", exc_info=True)
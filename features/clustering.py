@@ -0,0 +1,204 @@
+"""意見の埋め込みベクトルのクラスタリング（従来型AI分析）
+
+OpinionAnalyzer.analyze_opinions から呼ばれ、件数が増えても対話的に使える速度を保つ。
+
+- 768次元のベクトルをPCAで ANALYSIS_PCA_COMPONENTS 次元に圧縮してからクラスタリングする
+- ANALYSIS_MINIBATCH_THRESHOLD 件以上はKMeansの代わりにMiniBatchKMeansを使う
+- ANALYSIS_N_CLUSTERS=auto の場合、標本（ANALYSIS_SILHOUETTE_SAMPLE件）のシルエット係数が最大のkを選ぶ
+  （距離行列は標本につき1回だけ計算し、各kの係数は行列演算で求める）
+- 可視化の2次元座標は、ANALYSIS_TSNE_MAX_POINTS 件を超える場合はt-SNEではなくPCAで求める
+- 段階ごとの処理時間（ミリ秒）を結果の timings に記録する
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.manifold import TSNE
+
+from config import (
+    ANALYSIS_K_MIN,
+    ANALYSIS_K_MAX,
+    ANALYSIS_MINIBATCH_THRESHOLD,
+    ANALYSIS_PCA_COMPONENTS,
+    ANALYSIS_SILHOUETTE_SAMPLE,
+    ANALYSIS_TSNE_MAX_POINTS,
+)
+
+logger = logging.getLogger(__name__)
+
+RANDOM_STATE = 42
+
+
+class StageTimer:
+    """段階ごとの処理時間を記録"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def make_kmeans(n_clusters: int, n_samples: int, minibatch_threshold: int = ANALYSIS_MINIBATCH_THRESHOLD, n_init: int = 10):
+    """件数に応じてKMeansかMiniBatchKMeansを作成"""
+    if n_samples >= minibatch_threshold:
+        return MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3, batch_size=4096)
+    return KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=n_init)
+
+
+def reduce_dimensions(embeddings: np.ndarray, n_components: int = ANALYSIS_PCA_COMPONENTS) -> Tuple[np.ndarray, bool]:
+    """
+    PCAで次元を圧縮（n_componentsが0、または件数・次元数が少ない場合はそのまま返す）
+
+    Returns:
+        (ベクトル, PCAで圧縮したか)
+    """
+    n_samples, dim = embeddings.shape
+    if n_components <= 0 or dim <= n_components or n_samples <= n_components:
+        return embeddings, False
+    reduced = PCA(n_components=n_components, random_state=RANDOM_STATE).fit_transform(embeddings)
+    return reduced.astype(np.float32), True
+
+
+def pairwise_distances(X: np.ndarray) -> np.ndarray:
+    """ユークリッド距離行列 (件数, 件数)"""
+    squared = np.einsum("ij,ij->i", X, X)
+    distances = squared[:, None] + squared[None, :] - 2 * (X @ X.T)
+    np.maximum(distances, 0, out=distances)
+    return np.sqrt(distances)
+
+
+def silhouette_from_distances(distances: np.ndarray, labels: np.ndarray) -> float:
+    """距離行列とラベルからシルエット係数の平均を求める（sklearn.metrics.silhouette_score と同じ定義）"""
+    _, inverse = np.unique(labels, return_inverse=True)
+    n_samples = len(labels)
+    n_clusters = inverse.max() + 1
+    if n_clusters < 2 or n_clusters >= n_samples:
+        return 0.0
+
+    onehot = np.zeros((n_samples, n_clusters), dtype=distances.dtype)
+    onehot[np.arange(n_samples), inverse] = 1
+    counts = onehot.sum(axis=0)
+    sums = distances @ onehot  # 各点から各クラスタへの距離の合計
+
+    rows = np.arange(n_samples)
+    own_counts = counts[inverse]
+    a = sums[rows, inverse] / np.maximum(own_counts - 1, 1)
+    other = sums / counts
+    other[rows, inverse] = np.inf
+    b = other.min(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (b - a) / np.maximum(a, b)
+    # 1件だけのクラスタの点は0とする
+    scores[own_counts == 1] = 0
+    return float(np.nan_to_num(scores).mean())
+
+
+def choose_k(
+    embeddings: np.ndarray,
+    k_min: int = ANALYSIS_K_MIN,
+    k_max: int = ANALYSIS_K_MAX,
+    sample_size: int = ANALYSIS_SILHOUETTE_SAMPLE,
+) -> Tuple[int, Dict[int, float]]:
+    """
+    標本のシルエット係数が最大になるクラスタ数を選ぶ
+
+    Returns:
+        (クラスタ数, {k: シルエット係数})
+    """
+    n_samples = len(embeddings)
+    if n_samples > sample_size:
+        rng = np.random.default_rng(RANDOM_STATE)
+        sample = embeddings[rng.choice(n_samples, sample_size, replace=False)]
+    else:
+        sample = embeddings
+
+    candidates = range(k_min, min(k_max, len(sample) - 1) + 1)
+    if not candidates:
+        return min(k_min, n_samples), {}
+
+    distances = pairwise_distances(np.asarray(sample, dtype=np.float32))
+    scores = {}
+    for k in candidates:
+        labels = make_kmeans(k, len(sample), n_init=3).fit_predict(sample)
+        scores[k] = round(silhouette_from_distances(distances, labels), 4)
+
+    best = max(scores, key=scores.get)
+    logger.info(f"Selected k={best} by silhouette ({len(sample)} samples): {scores}")
+    return best, scores
+
+
+def project_2d(embeddings: np.ndarray, reduced: np.ndarray, pca_applied: bool, tsne_max_points: int = ANALYSIS_TSNE_MAX_POINTS) -> np.ndarray:
+    """可視化用の2次元座標"""
+    n_samples = len(embeddings)
+    if 50 < n_samples <= tsne_max_points:
+        return TSNE(n_components=2, random_state=RANDOM_STATE, perplexity=min(30, n_samples - 1)).fit_transform(reduced)
+    if pca_applied:
+        # PCAの主成分は寄与率順のため、先頭2成分が2次元のPCAと同じになる
+        return reduced[:, :2]
+    return PCA(n_components=2, random_state=RANDOM_STATE).fit_transform(embeddings)
+
+
+def cluster_embeddings(
+    embeddings: np.ndarray,
+    n_clusters: Union[int, str, None] = "auto",
+    progress_callback=None,
+    timer: Optional[StageTimer] = None,
+) -> Dict:
+    """
+    埋め込みベクトルをクラスタリングし、可視化用の2次元座標を求める
+
+    Args:
+        n_clusters: クラスタ数（"auto"またはNoneでシルエット係数から自動選択）
+
+    Returns:
+        {"labels", "coords", "n_clusters", "algorithm", "dim", "k_scores", "timings"}
+    """
+    timer = timer or StageTimer()
+    X = np.asarray(embeddings, dtype=np.float32)
+    n_samples = len(X)
+
+    with timer.stage("pca"):
+        reduced, pca_applied = reduce_dimensions(X)
+
+    k_scores = {}
+    with timer.stage("k_selection"):
+        if n_clusters in (None, "auto"):
+            if progress_callback:
+                progress_callback(72, "クラスタ数を選択中...")
+            k, k_scores = choose_k(reduced)
+        else:
+            k = min(int(n_clusters), n_samples)
+
+    if progress_callback:
+        progress_callback(75, "クラスタリングを実行中...")
+    with timer.stage("clustering"):
+        model = make_kmeans(k, n_samples)
+        labels = model.fit_predict(reduced)
+
+    if progress_callback:
+        progress_callback(85, "可視化データを生成中...")
+    with timer.stage("projection"):
+        coords = project_2d(X, reduced, pca_applied)
+
+    logger.info(f"Clustered {n_samples} opinions into {k} clusters ({type(model).__name__}): {timer.timings}")
+    return {
+        "labels": labels,
+        "coords": coords,
+        "n_clusters": k,
+        "algorithm": "minibatch_kmeans" if isinstance(model, MiniBatchKMeans) else "kmeans",
+        "dim": reduced.shape[1],
+        "k_scores": k_scores,
+        "timings": timer.timings,
+    }
@@ -0,0 +1,369 @@
+"""埋め込みベクトル計算サービス（ホスト内で共有するBERTモデル）
+
+get_analyzer() はプロセスごとのシングルトンのため、管理画面のgunicornワーカーやスクリプトが
+それぞれBERT（数百MB）をロードし、各プロセスの最初の分析がロード時間を待つことになる。
+scripts/embedding_service.py でモデルを1つだけロードしたサービスをlocalhostで起動し、
+EMBEDDING_SERVICE_URL を設定すると OpinionAnalyzer.compute_embeddings がサービスに計算を依頼する。
+
+- サービスは複数の呼び出し元からの依頼を EMBEDDING_SERVICE_MAX_WAIT_MS だけ待ってまとめ、
+  最大 EMBEDDING_SERVICE_MAX_BATCH 件ずつ1回の compute_embeddings で計算する
+- POST /embed: {"texts": [...]} → {"model", "dim", "count", "vectors"（float32のBase64）}
+- GET /health: モデルのロード状況、GET /metrics: 待ち行列・バッチの統計
+- クライアントは長いリストを EMBEDDING_SERVICE_CHUNK_SIZE 件ずつ送り、進捗を通知する
+- サービスに接続できない場合、EMBEDDING_SERVICE_FALLBACK が有効ならプロセス内で計算し、
+  EMBEDDING_SERVICE_RETRY_SECONDS 後にサービスを再試行する（復旧したらプロセス内のモデルを解放する）
+"""
+
+import json
+import time
+import queue
+import base64
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    EMBEDDING_SERVICE_URL,
+    EMBEDDING_SERVICE_TIMEOUT,
+    EMBEDDING_SERVICE_CHUNK_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingServiceError(Exception):
+    """サービスに接続できない・計算に失敗した"""
+    pass
+
+
+def encode_vectors(vectors: np.ndarray) -> str:
+    """ベクトル (件数, 次元) をfloat32のBase64文字列に変換"""
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vectors(data: str, count: int, dim: int) -> np.ndarray:
+    """Base64文字列をベクトル (件数, 次元) に変換"""
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(count, dim)
+
+
+class _Pending:
+    """計算待ちの依頼"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """複数の呼び出し元からの依頼をまとめて計算する"""
+
+    def __init__(self, analyzer, max_batch: int = 256, max_wait_ms: float = 20):
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._carry = None  # 前のバッチに入りきらなかった依頼
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.errors = 0
+        self.wait_sec = 0.0
+        self.compute_sec = 0.0
+        self.last_batch_size = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def submit(self, texts: List[str], timeout: float = None) -> np.ndarray:
+        """テキストのベクトルを計算（他の依頼とまとめて計算されるまで待つ）"""
+        pending = _Pending(texts)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise EmbeddingServiceError(f"Embedding request timed out after {timeout}s")
+        if pending.error is not None:
+            raise EmbeddingServiceError(pending.error)
+        return pending.result
+
+    def _next_batch(self) -> List[_Pending]:
+        """最初の依頼から max_wait だけ待ち、max_batch 件までの依頼をまとめる"""
+        first = self._carry
+        self._carry = None
+        while first is None and not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        if first is None:
+            return []
+
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(pending.texts) > self.max_batch:
+                self._carry = pending
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: List[_Pending]):
+        texts = [text for pending in batch for text in pending.texts]
+        started = time.monotonic()
+        try:
+            vectors = self.analyzer.compute_embeddings(texts)
+            if len(vectors) != len(texts):
+                raise EmbeddingServiceError(f"Embedding count mismatch: expected {len(texts)}, got {len(vectors)}")
+        except Exception as e:
+            logger.error(f"Embedding batch failed ({len(batch)} requests, {len(texts)} texts): {e}")
+            with self._lock:
+                self.errors += len(batch)
+            for pending in batch:
+                pending.error = str(e)
+                pending.done.set()
+            return
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.batches += 1
+            self.compute_sec += elapsed
+            self.wait_sec += sum(started - pending.enqueued_at for pending in batch)
+            self.last_batch_size = len(texts)
+
+        offset = 0
+        for pending in batch:
+            pending.result = vectors[offset:offset + len(pending.texts)]
+            offset += len(pending.texts)
+            pending.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize() + (1 if self._carry is not None else 0),
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "errors": self.errors,
+                "avg_batch_size": round(self.texts / self.batches, 1) if self.batches else 0.0,
+                "last_batch_size": self.last_batch_size,
+                "avg_wait_ms": round(self.wait_sec / self.requests * 1000, 1) if self.requests else 0.0,
+                "avg_compute_ms": round(self.compute_sec / self.batches * 1000, 1) if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+class EmbeddingServiceServer:
+    """埋め込みベクトル計算サービスのHTTPサーバー（localhost用）"""
+
+    def __init__(self, analyzer, host: str = "127.0.0.1", port: int = 8765, max_batch: int = 256, max_wait_ms: float = 20, timeout: float = 600):
+        self.analyzer = analyzer
+        self.batcher = EmbeddingBatcher(analyzer, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.load_ms = None
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def load_model(self):
+        """モデルをロード（起動時に1回だけ）"""
+        started = time.perf_counter()
+        self.analyzer._load_model()
+        self.load_ms = round((time.perf_counter() - started) * 1000)
+        logger.info(f"Embedding model loaded in {self.load_ms}ms ({self.analyzer.embedding_key})")
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok" if self.load_ms is not None else "loading",
+            "model": self.analyzer.embedding_key,
+            "backend": self.analyzer.backend,
+            "load_ms": self.load_ms,
+            "uptime_sec": round(time.time() - self.started_at),
+        }
+
+    def metrics(self) -> Dict:
+        return {**self.health(), "queue": self.batcher.stats()}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/health":
+                    self._send_json(200, server.health())
+                elif path == "/metrics":
+                    self._send_json(200, server.metrics())
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                if self.path.split("?", 1)[0] != "/embed":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+                try:
+                    texts = json.loads(raw)["texts"]
+                    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                        raise ValueError("texts must be a list of strings")
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send_json(400, {"error": f"Invalid request: {e}"})
+                    return
+                if not texts:
+                    self._send_json(200, {"model": server.analyzer.embedding_key, "dim": 0, "count": 0, "vectors": ""})
+                    return
+
+                try:
+                    vectors = server.batcher.submit(texts, timeout=server.timeout)
+                except EmbeddingServiceError as e:
+                    self._send_json(503, {"error": str(e)})
+                    return
+                self._send_json(200, {
+                    "model": server.analyzer.embedding_key,
+                    "dim": int(vectors.shape[1]),
+                    "count": len(vectors),
+                    "vectors": encode_vectors(vectors),
+                })
+
+        return Handler
+
+    def start(self):
+        """バックグラウンドスレッドで起動（テスト用）"""
+        self.batcher.start()
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self.batcher.start()
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.batcher.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class EmbeddingServiceClient:
+    """埋め込みベクトル計算サービスのクライアント"""
+
+    def __init__(self, url: str, timeout: float = 600, chunk_size: int = 256):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._session = requests.Session()
+        self._embedding_key = None
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict:
+        import requests
+
+        try:
+            response = self._session.request(method, self.url + path, timeout=kwargs.pop("timeout", self.timeout), **kwargs)
+        except requests.RequestException as e:
+            raise EmbeddingServiceError(f"Embedding service unavailable: {e}") from e
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise EmbeddingServiceError(f"Embedding service error {response.status_code}: {message}")
+        return response.json()
+
+    def health(self) -> Dict:
+        return self._request("GET", "/health", timeout=5)
+
+    def metrics(self) -> Dict:
+        return self._request("GET", "/metrics", timeout=5)
+
+    @property
+    def embedding_key(self) -> str:
+        """サービスが計算するベクトルの識別子（OpinionAnalyzer.embedding_key と同じ形式）"""
+        if self._embedding_key is None:
+            health = self.health()
+            if health["status"] != "ok":
+                # ロード中はバックエンドが切り替わる可能性があるため記録しない
+                return health["model"]
+            self._embedding_key = health["model"]
+        return self._embedding_key
+
+    def embed(self, texts: List[str], progress_callback=None) -> np.ndarray:
+        """テキストリストのベクトル (件数, 次元) を入力順に取得"""
+        if not texts:
+            return np.array([])
+        total_chunks = (len(texts) + self.chunk_size - 1) // self.chunk_size
+        chunks = []
+        for index, start in enumerate(range(0, len(texts), self.chunk_size)):
+            if progress_callback:
+                # 30%〜70%の間で進捗を表示
+                progress = 30 + int((index / total_chunks) * 40)
+                progress_callback(progress, f"ベクトル化を実行中 ({index+1}/{total_chunks})...")
+            result = self._request("POST", "/embed", json={"texts": list(texts[start:start + self.chunk_size])})
+            self._embedding_key = result["model"]
+            chunks.append(decode_vectors(result["vectors"], result["count"], result["dim"]))
+        return np.concatenate(chunks)
+
+
+# シングルトンインスタンス
+_client_instance = None
+
+
+def get_embedding_service_client() -> Optional[EmbeddingServiceClient]:
+    """EMBEDDING_SERVICE_URL が設定されていればクライアントを返す（未設定ならNone）"""
+    global _client_instance
+    if not EMBEDDING_SERVICE_URL:
+        return None
+    if _client_instance is None:
+        _client_instance = EmbeddingServiceClient(
+            EMBEDDING_SERVICE_URL,
+            timeout=EMBEDDING_SERVICE_TIMEOUT,
+            chunk_size=EMBEDDING_SERVICE_CHUNK_SIZE,
+        )
+    return _client_instance
@@ -0,0 +1,190 @@
+"""意見の埋め込みベクトルの保存・再利用
+
+意見本文は作成後ほとんど変わらないため、BERTの埋め込みベクトルを opinion_embeddings テーブルに
+(意見ID, モデル名, 本文のハッシュ) をキーとしてfloat16で保存し、分析のたびに再計算しない。
+
+- 分析時は保存済みのベクトルを読み込み、未計算・編集済みの意見だけを計算して保存する
+- 新しい意見は scripts/backfill_embeddings.py（--loop で常駐）で事前に計算しておける
+- 類似度計算など他の機能も load_embeddings() で保存済みのベクトルを利用できる
+"""
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from database.db_manager import get_db, Opinion, OpinionEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """意見本文のハッシュ（編集の検出用）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: np.ndarray) -> bytes:
+    """ベクトルをfloat16のバイト列に変換"""
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """float16のバイト列をfloat32のベクトルに変換"""
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+
+def load_embeddings(db, opinions: List[Tuple[int, str]], model_name: str) -> Dict[int, np.ndarray]:
+    """
+    保存済みの埋め込みベクトルを取得（本文が変わっていないもののみ）
+
+    Args:
+        opinions: [(意見ID, 本文)]
+        model_name: モデル名（OpinionAnalyzer.embedding_key）
+
+    Returns:
+        {意見ID: ベクトル}
+    """
+    hashes = {op_id: content_hash(text) for op_id, text in opinions}
+    vectors = {}
+    ids = list(hashes)
+    # IN句が長くなりすぎないよう分割して取得
+    for start in range(0, len(ids), 1000):
+        rows = db.query(OpinionEmbedding).filter(
+            OpinionEmbedding.model_name == model_name,
+            OpinionEmbedding.opinion_id.in_(ids[start:start + 1000])
+        ).all()
+        for row in rows:
+            if row.content_hash == hashes[row.opinion_id]:
+                vectors[row.opinion_id] = decode_vector(row.vector)
+    return vectors
+
+
+def save_embeddings(db, items: List[Tuple[int, str, np.ndarray]], model_name: str) -> int:
+    """
+    埋め込みベクトルを保存（既存のものは置き換える）
+
+    事前計算と分析が同じ意見を同時に保存して一意制約に違反した場合は、
+    ロールバックして相手が保存した行を読み直し、置き換える。
+
+    Args:
+        items: [(意見ID, 本文, ベクトル)]
+        model_name: モデル名（OpinionAnalyzer.embedding_key）
+
+    Returns:
+        保存した件数
+    """
+    if not items:
+        return 0
+    for attempt in range(3):
+        existing = {
+            row.opinion_id: row
+            for row in db.query(OpinionEmbedding).filter(
+                OpinionEmbedding.model_name == model_name,
+                OpinionEmbedding.opinion_id.in_([op_id for op_id, _, _ in items])
+            ).all()
+        }
+        now = datetime.utcnow()
+        for op_id, text, vector in items:
+            row = existing.get(op_id)
+            if row is None:
+                row = OpinionEmbedding(opinion_id=op_id, model_name=model_name)
+                db.add(row)
+            row.content_hash = content_hash(text)
+            row.dim = len(vector)
+            row.vector = encode_vector(vector)
+            row.created_at = now
+        try:
+            db.commit()
+            return len(items)
+        except IntegrityError:
+            db.rollback()
+            if attempt == 2:
+                raise
+            logger.info("Embeddings were saved concurrently, reloading and retrying")
+    return 0
+
+
+def get_or_compute_embeddings(analyzer, opinions: List[Dict], progress_callback=None) -> Optional[np.ndarray]:
+    """
+    意見リストの埋め込みベクトルを取得（保存済みのものは再利用し、残りを計算して保存）
+
+    Args:
+        analyzer: OpinionAnalyzer
+        opinions: [{"id": 1, "text": "..."}, ...]
+
+    Returns:
+        入力と同じ順序のベクトル (件数, 次元)。計算に失敗した場合はNone
+    """
+    model_name = analyzer.embedding_key
+    pairs = [(op["id"], op["text"]) for op in opinions]
+
+    with get_db() as db:
+        cached = load_embeddings(db, pairs, model_name)
+
+    missing = [(op_id, text) for op_id, text in pairs if op_id not in cached]
+    logger.info(f"Embeddings: {len(cached)} loaded from store, {len(missing)} to compute")
+
+    if missing:
+        computed = analyzer.compute_embeddings([text for _, text in missing], progress_callback=progress_callback)
+        if len(computed) != len(missing):
+            logger.error(f"Embedding count mismatch: expected {len(missing)}, got {len(computed)}")
+            return None
+        with get_db() as db:
+            # バックエンドが切り替わった場合（int8が使えないなど）に備え、計算後の識別子で保存する
+            save_embeddings(db, [(op_id, text, vec) for (op_id, text), vec in zip(missing, computed)], analyzer.embedding_key)
+        for (op_id, _), vector in zip(missing, computed):
+            # 保存値と同じ精度に揃える（再実行時と結果が変わらないように）
+            cached[op_id] = vector.astype(np.float16).astype(np.float32)
+
+    return np.stack([cached[op_id] for op_id, _ in pairs])
+
+
+def embed_pending(analyzer, limit: int = 1000, batch_size: int = 256, after_id: int = 0) -> Tuple[int, int, int]:
+    """
+    埋め込みが未計算・古い（意見の更新後に計算された）意見を計算して保存
+
+    意見IDの昇順に after_id より後の最大 limit 件を調べる。本文が変わっていない意見
+    （分類・優先度の更新など）だけのページでは計算件数が0になるため、
+    呼び出し側は調べた件数が0になるまで、返された最後のIDから続けて呼び出す。
+
+    Returns:
+        (調べた件数, 計算した件数, 調べた最後の意見ID)
+    """
+    model_name = analyzer.embedding_key
+    with get_db() as db:
+        rows = db.query(Opinion.id, Opinion.content).outerjoin(
+            OpinionEmbedding,
+            (OpinionEmbedding.opinion_id == Opinion.id) & (OpinionEmbedding.model_name == model_name)
+        ).filter(
+            or_(OpinionEmbedding.id.is_(None), Opinion.updated_at > OpinionEmbedding.created_at),
+            Opinion.id > after_id
+        ).order_by(Opinion.id).limit(limit).all()
+        pairs = [(row.id, row.content) for row in rows]
+        # 更新日時だけが変わった意見は本文のハッシュで除外し、次回から対象にならないよう計算日時を更新
+        cached = load_embeddings(db, pairs, model_name)
+        if cached:
+            db.query(OpinionEmbedding).filter(
+                OpinionEmbedding.model_name == model_name,
+                OpinionEmbedding.opinion_id.in_(list(cached))
+            ).update({OpinionEmbedding.created_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+
+    pending = [(op_id, text) for op_id, text in pairs if op_id not in cached]
+    done = 0
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        vectors = analyzer.compute_embeddings([text for _, text in chunk])
+        if len(vectors) != len(chunk):
+            logger.error(f"Embedding count mismatch: expected {len(chunk)}, got {len(vectors)}")
+            continue
+        with get_db() as db:
+            # get_or_compute_embeddingsと同様、バックエンドの切り替えに備えて計算後の識別子で保存する
+            done += save_embeddings(db, [(op_id, text, vec) for (op_id, text), vec in zip(chunk, vectors)], analyzer.embedding_key)
+
+    if pending:
+        logger.info(f"Embedded {done}/{len(pending)} pending opinions")
+    return len(pairs), done, (pairs[-1][0] if pairs else after_id)
@@ -9,7 +9,7 @@ from linebot.v3.messaging import TextMessage
 
 from database.db_manager import (
     get_db,
-    get_or_create_user,
+    resolve_user,
     add_points,
     Poll,
     PollOption,
@@ -34,7 +34,7 @@ def handle_poll_response(user_id: str, poll_id: int, option_id: int) -> List[Tex
     try:
         with get_db() as db:
             # ユーザー取得
-            user = get_or_create_user(db, user_id)
+            user = resolve_user(db, user_id)
             
             # 投票取得
             poll = db.query(Poll).filter(Poll.id == poll_id).first()
@@ -52,7 +52,7 @@ def handle_poll_response(user_id: str, poll_id: int, option_id: int) -> List[Tex
             # 既に回答済みかチェック
             existing_response = db.query(PollResponse).filter(
                 PollResponse.poll_id == poll_id,
-                PollResponse.user_id == user.id
+                PollResponse.user_id == user.user_id
             ).first()
             
             if existing_response:
@@ -61,22 +61,22 @@ def handle_poll_response(user_id: str, poll_id: int, option_id: int) -> List[Tex
             # 回答を保存
             response = PollResponse(
                 poll_id=poll_id,
-                user_id=user.id,
+                user_id=user.user_id,
                 option_id=option_id
             )
             db.add(response)
-            db.commit()
+            db.flush()
             
-            # ポイント付与
+            # ポイント付与（回答と同一トランザクションでコミット）
             total_points = add_points(
                 db,
-                user.id,
+                user.user_id,
                 POINT_POLL_RESPONSE,
                 'poll_response',
                 reference_id=poll_id
             )
             
-            logger.info(f"Poll response saved: user={user.id}, poll={poll_id}, option={option_id}")
+            logger.info(f"Poll response saved: user={user.user_id}, poll={poll_id}, option={option_id}")
             
             # 応答メッセージ
             response_text = f"""📊 ご回答ありがとうございます！
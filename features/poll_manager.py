@@ -7,9 +7,6 @@ import logging
 from typing import List, Optional, Dict
 from datetime import datetime
 from linebot.v3.messaging import (
-    Configuration,
-    ApiClient,
-    MessagingApi,
     PushMessageRequest,
     FlexMessage,
     FlexContainer,
@@ -24,7 +21,7 @@ from database.db_manager import (
     User,
     PollDeliveryLog,
 )
-from config import LINE_CHANNEL_ACCESS_TOKEN
+from utils.line_api import get_messaging_api
 
 logger = logging.getLogger(__name__)
 
@@ -190,32 +187,29 @@ def send_poll_to_users(poll_id: int, user_ids: List[str] = None) -> Dict:
         db.add(delivery_log)
         db.flush()  # ID取得のためflush
 
-        # プッシュ配信
-        configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+        # プッシュ配信（共有クライアントで接続を再利用）
+        messaging_api = get_messaging_api()
         success_count = 0
         failed_count = 0
 
-        with ApiClient(configuration) as api_client:
-            messaging_api = MessagingApi(api_client)
-
-            for user in users:
-                try:
-                    # LINE User IDがある場合のみ送信
-                    if user.line_user_id:
-                        messaging_api.push_message(
-                            PushMessageRequest(
-                                to=user.line_user_id, messages=[flex_message]
-                            )
+        for user in users:
+            try:
+                # LINE User IDがある場合のみ送信
+                if user.line_user_id:
+                    messaging_api.push_message(
+                        PushMessageRequest(
+                            to=user.line_user_id, messages=[flex_message]
                         )
-                        success_count += 1
-                    else:
-                        logger.warning(
-                            f"User {user.id} has no line_user_id, skipping push"
-                        )
-                        failed_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to send poll to user {user.id}: {e}")
+                    )
+                    success_count += 1
+                else:
+                    logger.warning(
+                        f"User {user.id} has no line_user_id, skipping push"
+                    )
                     failed_count += 1
+            except Exception as e:
+                logger.error(f"Failed to send poll to user {user.id}: {e}")
+                failed_count += 1
 
         # ログ更新
         delivery_log.sent_count = success_count
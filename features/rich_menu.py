@@ -4,9 +4,6 @@ import os
 import json
 import logging
 from linebot.v3.messaging import (
-    ApiClient,
-    MessagingApi,
-    Configuration,
     RichMenuRequest,
     RichMenuSize,
     RichMenuArea,
@@ -15,7 +12,7 @@ from linebot.v3.messaging import (
     URIAction
 )
 
-from config import LINE_CHANNEL_ACCESS_TOKEN
+from utils.line_api import get_messaging_api, get_messaging_api_blob
 
 logger = logging.getLogger(__name__)
 
@@ -29,47 +26,44 @@ def create_rich_menu(ngrok_url: str):
     Returns:
         リッチメニューID
     """
-    configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
-    
-    with ApiClient(configuration) as api_client:
-        messaging_api = MessagingApi(api_client)
-        
-        # リッチメニュー定義
-        rich_menu = RichMenuRequest(
-            size=RichMenuSize(width=2500, height=1686),
-            selected=True,
-            name="枚方市民ニーズ抽出メニュー",
-            chatBarText="メニューを開く",
-            areas=[
-                # 左上: 対話で意見
-                RichMenuArea(
-                    bounds=RichMenuBounds(x=0, y=0, width=1250, height=843),
-                    action=MessageAction(text="意見を送りたい")
-                ),
-                # 右上: アンケート（テキスト送信に変更）
-                RichMenuArea(
-                    bounds=RichMenuBounds(x=1250, y=0, width=1250, height=843),
-                    action=MessageAction(text="アンケート")
-                ),
-                # 左下: ポイント確認
-                RichMenuArea(
-                    bounds=RichMenuBounds(x=0, y=843, width=1250, height=843),
-                    action=MessageAction(text="/point")
-                ),
-                # 右下: ヘルプ
-                RichMenuArea(
-                    bounds=RichMenuBounds(x=1250, y=843, width=1250, height=843),
-                    action=MessageAction(text="/help")
-                ),
-            ]
-        )
-        
-        # リッチメニュー作成
-        result = messaging_api.create_rich_menu(rich_menu_request=rich_menu)
-        rich_menu_id = result.rich_menu_id
-        
-        logger.info(f"Rich menu created: {rich_menu_id}")
-        return rich_menu_id
+    messaging_api = get_messaging_api()
+
+    # リッチメニュー定義
+    rich_menu = RichMenuRequest(
+        size=RichMenuSize(width=2500, height=1686),
+        selected=True,
+        name="枚方市民ニーズ抽出メニュー",
+        chatBarText="メニューを開く",
+        areas=[
+            # 左上: 対話で意見
+            RichMenuArea(
+                bounds=RichMenuBounds(x=0, y=0, width=1250, height=843),
+                action=MessageAction(text="意見を送りたい")
+            ),
+            # 右上: アンケート（テキスト送信に変更）
+            RichMenuArea(
+                bounds=RichMenuBounds(x=1250, y=0, width=1250, height=843),
+                action=MessageAction(text="アンケート")
+            ),
+            # 左下: ポイント確認
+            RichMenuArea(
+                bounds=RichMenuBounds(x=0, y=843, width=1250, height=843),
+                action=MessageAction(text="/point")
+            ),
+            # 右下: ヘルプ
+            RichMenuArea(
+                bounds=RichMenuBounds(x=1250, y=843, width=1250, height=843),
+                action=MessageAction(text="/help")
+            ),
+        ]
+    )
+    
+    # リッチメニュー作成
+    result = messaging_api.create_rich_menu(rich_menu_request=rich_menu)
+    rich_menu_id = result.rich_menu_id
+    
+    logger.info(f"Rich menu created: {rich_menu_id}")
+    return rich_menu_id
 
 
 def upload_rich_menu_image(rich_menu_id: str, image_path: str):
@@ -79,19 +73,15 @@ def upload_rich_menu_image(rich_menu_id: str, image_path: str):
         rich_menu_id: リッチメニューID
         image_path: 画像ファイルのパス
     """
-    configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
-    
-    with ApiClient(configuration) as api_client:
-        messaging_api = MessagingApi(api_client)
-        
-        with open(image_path, 'rb') as image:
-            messaging_api.set_rich_menu_image(
-                rich_menu_id=rich_menu_id,
-                body=image.read(),
-                _headers={'Content-Type': 'image/png'}
-            )
-        
-        logger.info(f"Rich menu image uploaded: {rich_menu_id}")
+    # 画像はapi-data.line.me宛てのため、同じ接続プールのMessagingApiBlobで送る
+    with open(image_path, 'rb') as image:
+        get_messaging_api_blob().set_rich_menu_image(
+            rich_menu_id=rich_menu_id,
+            body=image.read(),
+            _headers={'Content-Type': 'image/png'}
+        )
+    
+    logger.info(f"Rich menu image uploaded: {rich_menu_id}")
 
 
 def set_default_rich_menu(rich_menu_id: str):
@@ -100,13 +90,9 @@ def set_default_rich_menu(rich_menu_id: str):
     Args:
         rich_menu_id: リッチメニューID
     """
-    configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+    get_messaging_api().set_default_rich_menu(rich_menu_id=rich_menu_id)
     
-    with ApiClient(configuration) as api_client:
-        messaging_api = MessagingApi(api_client)
-        messaging_api.set_default_rich_menu(rich_menu_id=rich_menu_id)
-        
-        logger.info(f"Default rich menu set: {rich_menu_id}")
+    logger.info(f"Default rich menu set: {rich_menu_id}")
 
 
 def delete_rich_menu(rich_menu_id: str):
@@ -115,13 +101,9 @@ def delete_rich_menu(rich_menu_id: str):
     Args:
         rich_menu_id: リッチメニューID
     """
-    configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+    get_messaging_api().delete_rich_menu(rich_menu_id=rich_menu_id)
     
-    with ApiClient(configuration) as api_client:
-        messaging_api = MessagingApi(api_client)
-        messaging_api.delete_rich_menu(rich_menu_id=rich_menu_id)
-        
-        logger.info(f"Rich menu deleted: {rich_menu_id}")
+    logger.info(f"Rich menu deleted: {rich_menu_id}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+"""対話要約の遅延処理キュー
+
+対話が規定ターン数に達したセッションを summary_jobs テーブルに登録し、
+バックグラウンドワーカーが要約生成・意見登録・ポイント付与・プッシュ通知を行う。
+要約に失敗した場合は指数バックオフで再試行し、上限回数を超えた場合は
+ユーザー発言をそのまま意見として登録する（意見を失わないため）。
+
+ジョブの取得は「pending → running」の条件付きUPDATEで行うため、
+複数のワーカープロセスが同時にポーリングしても同じジョブを二重に処理しない。
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import update, or_, and_
+from linebot.v3.messaging import PushMessageRequest
+
+from database.db_manager import (
+    get_db,
+    add_points,
+    ChatSession,
+    SummaryJob,
+)
+from features.chat_opinion import (
+    get_chat_history,
+    save_chat_summary,
+    build_thanks_message,
+)
+from ollama_client import get_ollama_client
+from utils.line_api import get_messaging_api
+from utils.llm_governor import llm_priority, BACKGROUND
+from config import (
+    POINT_CHAT_OPINION,
+    SUMMARY_JOB_MAX_ATTEMPTS,
+    SUMMARY_JOB_RETRY_BASE,
+    SUMMARY_JOB_LOCK_TIMEOUT,
+    SUMMARY_WORKER_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_summary_job(db, session: ChatSession, line_user_id: str) -> SummaryJob:
+    """
+    要約ジョブを登録（呼び出し元のトランザクションでコミットされる）
+
+    セッションは 'summarizing' に遷移し、アクティブセッションとしては扱われなくなる。
+    """
+    session.status = 'summarizing'
+    job = SummaryJob(
+        session_id=session.id,
+        line_user_id=line_user_id,
+        status='pending',
+        attempts=0,
+        next_run_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.flush()
+    logger.info(f"Summary job {job.id} enqueued for session {session.id}")
+    return job
+
+
+def _claim_next_job() -> Optional[int]:
+    """実行可能なジョブを1件取得してrunningにする（取得できなければNone）"""
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=SUMMARY_JOB_LOCK_TIMEOUT)
+    runnable = or_(
+        and_(SummaryJob.status == 'pending', SummaryJob.next_run_at <= now),
+        # ワーカーが途中で落ちたジョブを回収
+        and_(SummaryJob.status == 'running', SummaryJob.locked_at < stale_before),
+    )
+
+    with get_db() as db:
+        candidates = db.query(SummaryJob.id, SummaryJob.status).filter(runnable).order_by(
+            SummaryJob.next_run_at
+        ).limit(5).all()
+
+        for job_id, status in candidates:
+            claimed = db.execute(
+                update(SummaryJob)
+                .where(SummaryJob.id == job_id, SummaryJob.status == status, runnable)
+                .values(status='running', locked_at=now, attempts=SummaryJob.attempts + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job_id
+
+    return None
+
+
+def _fallback_summary(chat_history: list) -> dict:
+    """要約生成を諦めた場合に、ユーザー発言をそのまま意見として残す"""
+    user_text = " / ".join(m['content'] for m in chat_history if m['role'] == 'user')
+    return {
+        "summary": user_text[:500],
+        "category": "その他",
+        "emotion_score": 5,
+    }
+
+
+def process_job(job_id: int) -> bool:
+    """
+    取得済みのジョブを実行
+
+    Returns:
+        要約を保存できた場合True
+    """
+    with get_db() as db:
+        job = db.query(SummaryJob).filter(SummaryJob.id == job_id).first()
+        if job is None:
+            return False
+        session = db.query(ChatSession).filter(ChatSession.id == job.session_id).first()
+        if not session or session.status != 'summarizing':
+            job.status = 'done'
+            return False
+        chat_history = get_chat_history(db, session.id)
+        attempts = job.attempts
+
+    # LLM呼び出しはトランザクション外で行う
+    summary = None
+    error = None
+    if chat_history:
+        try:
+            with llm_priority(BACKGROUND):
+                summary = get_ollama_client().summary_mode(chat_history)
+            if not summary:
+                error = "summary_mode returned no result"
+        except Exception as e:
+            error = str(e)
+    else:
+        error = "no chat history"
+
+    notify = None
+    with get_db() as db:
+        job = db.query(SummaryJob).filter(SummaryJob.id == job_id).first()
+        if job is None:
+            # LLM呼び出し中にセッションごと削除された（ON DELETE CASCADE）
+            return False
+        session = db.query(ChatSession).filter(ChatSession.id == job.session_id).first()
+        if not session or session.status != 'summarizing':
+            # LLM呼び出し中にセッション・ユーザーが削除された、または他の経路で完了した
+            logger.info(f"Summary job {job_id} dropped: session {job.session_id} is no longer summarizing")
+            job.status = 'done'
+            return False
+
+        if not summary and attempts < SUMMARY_JOB_MAX_ATTEMPTS:
+            # 指数バックオフで再試行
+            delay = SUMMARY_JOB_RETRY_BASE * (2 ** (attempts - 1))
+            job.status = 'pending'
+            job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+            job.last_error = error
+            logger.warning(f"Summary job {job_id} failed (attempt {attempts}), retrying in {delay}s: {error}")
+            return False
+
+        if not summary:
+            logger.error(f"Summary job {job_id} gave up after {attempts} attempts, storing raw messages: {error}")
+            job.last_error = error
+            if not chat_history:
+                job.status = 'failed'
+                session.status = 'completed'
+                session.completed_at = datetime.utcnow()
+                return False
+            summary = _fallback_summary(chat_history)
+
+        summary_result = save_chat_summary(db, session, summary)
+        total_points = add_points(
+            db,
+            session.user_id,
+            POINT_CHAT_OPINION,
+            'chat_opinion',
+            reference_id=summary_result['opinion_id']
+        )
+        job.status = 'done'
+        job.opinion_id = summary_result['opinion_id']
+        notify = (job.line_user_id, summary_result, total_points)
+
+    # 完了通知
+    line_user_id, summary_result, total_points = notify
+    if line_user_id:
+        try:
+            get_messaging_api().push_message(
+                PushMessageRequest(
+                    to=line_user_id,
+                    messages=[build_thanks_message(summary_result, total_points)]
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to push summary result for job {job_id}: {e}")
+
+    logger.info(f"Summary job {job_id} completed: opinion {summary_result['opinion_id']}")
+    return True
+
+
+def run_pending_jobs(max_jobs: int = 10) -> int:
+    """実行可能なジョブを最大max_jobs件処理し、処理件数を返す"""
+    processed = 0
+    while processed < max_jobs:
+        job_id = _claim_next_job()
+        if job_id is None:
+            break
+        try:
+            process_job(job_id)
+        except Exception as e:
+            logger.error(f"Error processing summary job {job_id}: {e}", exc_info=True)
+        processed += 1
+    return processed
+
+
+# バックグラウンドワーカー
+_worker_lock = threading.Lock()
+_worker_thread = None
+_worker_pid = None
+_wakeup = threading.Event()
+
+
+def _worker_loop():
+    """ジョブを定期的にポーリングして処理"""
+    while True:
+        try:
+            run_pending_jobs()
+        except Exception as e:
+            logger.error(f"Summary worker error: {e}", exc_info=True)
+        _wakeup.wait(SUMMARY_WORKER_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_summary_worker():
+    """このプロセスで要約ワーカースレッドを起動（起動済みなら何もしない）"""
+    global _worker_thread, _worker_pid
+    with _worker_lock:
+        if _worker_thread is not None and _worker_pid == os.getpid():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, name="summary-worker", daemon=True)
+        _worker_thread.start()
+        _worker_pid = os.getpid()
+        logger.info(f"Summary worker started (PID {_worker_pid})")
+
+
+def notify_summary_worker():
+    """新しいジョブの登録をワーカーに通知（同一プロセス内のみ即時に反応）"""
+    _wakeup.set()
+
+
+if __name__ == "__main__":
+    # 単独プロセスとして常駐
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Running summary worker in foreground")
+    while True:
+        if run_pending_jobs() == 0:
+            time.sleep(SUMMARY_WORKER_POLL_INTERVAL)
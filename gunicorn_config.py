@@ -22,3 +22,15 @@ loglevel = "info"
 
 # プロセス名
 proc_name = "hirakata_bot"
+
+
+def post_worker_init(worker):
+    """各ワーカープロセスで対話要約ジョブのワーカースレッドとモデルキーパーを起動"""
+    from config import SUMMARY_WORKER_ENABLED, OLLAMA_WARMUP_ENABLED
+    if SUMMARY_WORKER_ENABLED:
+        from features.summary_queue import start_summary_worker
+        start_summary_worker()
+    if OLLAMA_WARMUP_ENABLED:
+        # 全ワーカーで起動し、ロックを取れた1ワーカーだけがウォームアップを行う
+        from utils.model_warmup import start_model_keeper
+        start_model_keeper()
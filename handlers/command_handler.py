@@ -44,12 +44,17 @@ def handle_command(user_id: str, text: str) -> list:
         return [TextMessage(text="不明なコマンドです。/help でコマンド一覧を確認できます。")]
 
 
-def handle_survey(user_id: str) -> list:
-    """アンケートURLを返す"""
+def get_survey_url(user_id: str) -> str:
+    """ユーザー別のアンケートフォームURL"""
     # ngrok URLを環境変数または設定から取得
     # 本番環境では固定URLを使用
     base_url = os.getenv('PUBLIC_URL', 'https://longevous-cubbishly-helena.ngrok-free.dev')
-    survey_url = f"{base_url}/web/survey?user_id={user_id}"
+    return f"{base_url}/web/survey?user_id={user_id}"
+
+
+def handle_survey(user_id: str) -> list:
+    """アンケートURLを返す"""
+    survey_url = get_survey_url(user_id)
     
     survey_text = f"""📝 アンケートフォーム
 
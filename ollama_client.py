@@ -3,21 +3,195 @@
 対話モード、要約モード、分類モードに対応したLLMクライアント
 """
 
-import ollama
 import json
+import time
 import logging
-from typing import List, Dict, Optional
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
 from config import (
     OLLAMA_MODEL,
-    OLLAMA_URL,
+    OLLAMA_HOSTS,
     OLLAMA_TIMEOUT,
+    OLLAMA_QUEUE_TIMEOUT,
+    OLLAMA_HOST_MAX_CONCURRENCY,
+    OLLAMA_CHAT_MODEL,
+    OLLAMA_SUMMARY_MODEL,
+    OLLAMA_CLASSIFY_MODEL,
+    OLLAMA_ANALYSIS_MODEL,
+    OLLAMA_CHAT_KEEP_ALIVE,
+    OLLAMA_SUMMARY_KEEP_ALIVE,
+    OLLAMA_CLASSIFY_KEEP_ALIVE,
+    OLLAMA_ANALYSIS_KEEP_ALIVE,
+    OLLAMA_CHAT_OPTIONS,
+    OLLAMA_SUMMARY_OPTIONS,
+    OLLAMA_CLASSIFY_OPTIONS,
+    OLLAMA_ANALYSIS_OPTIONS,
+    LLM_CACHE_MODES,
+    OLLAMA_CLASSIFY_BATCH_SIZE,
+    OLLAMA_ADAPTIVE_CTX,
+    OLLAMA_CTX_BUCKETS,
+    OLLAMA_CTX_ADAPTIVE_MODES,
+    OLLAMA_CTX_STICKY_SECONDS,
+    OPINION_CATEGORIES,
+    OLLAMA_CB_FAILURE_THRESHOLD,
+    OLLAMA_CB_RESET_TIMEOUT,
+    OLLAMA_HEALTH_CACHE_TTL,
+    CHAT_STREAMING,
+    CHAT_REPLY_CHAR_BUDGET,
     SYSTEM_PROMPT_CHAT,
     SYSTEM_PROMPT_SUMMARY
 )
+from utils.llm_governor import get_llm_governor, LLMQueueTimeout
+from utils.circuit_breaker import CircuitOpenError
+from utils.ollama_pool import OllamaBackendPool, is_host_failure
+from utils.llm_cache import get_llm_cache, make_cache_key, is_cache_disabled
+from utils.context_window import ContextSizer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# モード別の設定（model: 使用モデル / keep_alive: モデルの保持時間 / options: オプションの上書き）
+MODE_SETTINGS = {
+    "chat": {"model": OLLAMA_CHAT_MODEL, "keep_alive": OLLAMA_CHAT_KEEP_ALIVE, "options": OLLAMA_CHAT_OPTIONS},
+    "summary": {"model": OLLAMA_SUMMARY_MODEL, "keep_alive": OLLAMA_SUMMARY_KEEP_ALIVE, "options": OLLAMA_SUMMARY_OPTIONS},
+    "classify": {"model": OLLAMA_CLASSIFY_MODEL, "keep_alive": OLLAMA_CLASSIFY_KEEP_ALIVE, "options": OLLAMA_CLASSIFY_OPTIONS},
+    "analysis": {"model": OLLAMA_ANALYSIS_MODEL, "keep_alive": OLLAMA_ANALYSIS_KEEP_ALIVE, "options": OLLAMA_ANALYSIS_OPTIONS},
+}
+
+# 分類モードのシステムプロンプト
+CLASSIFY_PROMPT = """以下の市民の意見を分析し、カテゴリと感情スコアをJSON形式で出力してください。
+
+カテゴリは以下から選択:
+- 交通
+- 福祉
+- 教育
+- 環境
+- 子育て
+- 医療
+- 防災
+- その他
+
+感情スコアは0-10の整数（10が最も強い不満・要望）
+
+出力形式:
+{
+  "category": "カテゴリ名",
+  "emotion_score": 感情スコア
+}
+"""
+
+# 分類モード（一括）のシステムプロンプト
+CLASSIFY_BATCH_PROMPT = """以下の市民の意見それぞれについて、カテゴリと感情スコアをJSON形式で出力してください。
+意見は {"index": 番号, "text": 意見文} の配列で与えられます。
+
+カテゴリは以下から選択:
+""" + "\n".join(f"- {c}" for c in OPINION_CATEGORIES) + """
+
+感情スコアは0-10の整数（10が最も強い不満・要望）
+
+出力形式（全ての意見について、与えられたindexをそのまま使うこと）:
+{
+  "results": [
+    {"index": 番号, "category": "カテゴリ名", "emotion_score": 感情スコア}
+  ]
+}
+"""
+
+# 一括分類で1件あたりに見込む出力トークン数
+CLASSIFY_BATCH_TOKENS_PER_ITEM = 40
+
+# モードごとの既定オプション（MODE_SETTINGSのoptionsで上書きできる）
+CHAT_OPTIONS = {
+    "temperature": 0.7,  # 対話モードは創造性を持たせる
+    "num_predict": 300,  # 最大トークン数（余裕を持たせる）
+    "num_ctx": 8192,  # コンテキストウィンドウサイズ（OLLAMA_ADAPTIVE_CTX有効時はプロンプト長から選択）
+}
+SUMMARY_OPTIONS = {
+    "temperature": 0.0,  # 決定的な出力
+    "num_predict": 300,
+}
+CLASSIFY_OPTIONS = {
+    "temperature": 0.0,
+    "num_predict": 100,
+}
+MODE_DEFAULT_OPTIONS = {
+    "chat": CHAT_OPTIONS,
+    "summary": SUMMARY_OPTIONS,
+    "classify": CLASSIFY_OPTIONS,
+}
+
+# 文の区切りとみなす文字
+SENTENCE_DELIMITERS = "。！？!?\n"
+
+
+def find_sentence_end(text: str, start: int) -> int:
+    """
+    start文字目以降で最初の文末位置を返す（区切り文字の直後のインデックス）
+
+    見つからない場合は-1
+    """
+    for i in range(max(start, 0), len(text)):
+        if text[i] in SENTENCE_DELIMITERS:
+            return i + 1
+    return -1
+
+
+def build_chat_messages(chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """対話モードのメッセージを構築（最新のユーザーメッセージを含む完全な履歴を渡す）"""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT_CHAT}
+    ]
+    if chat_history:
+        messages.extend(chat_history)
+    return messages
+
+
+def build_summary_messages(chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """要約モードのメッセージを構築"""
+    # 対話ログをテキスト化
+    conversation_text = "\n".join([
+        f"{msg['role']}: {msg['content']}"
+        for msg in chat_history
+        if msg['role'] in ['user', 'assistant']
+    ])
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_SUMMARY},
+        {"role": "user", "content": f"以下の対話ログを要約してください:\n\n{conversation_text}"}
+    ]
+
+
+def build_classify_messages(opinion_text: str) -> List[Dict[str, str]]:
+    """分類モードのメッセージを構築"""
+    return [
+        {"role": "system", "content": CLASSIFY_PROMPT},
+        {"role": "user", "content": opinion_text}
+    ]
+
+
+def build_classify_batch_messages(opinion_texts: List[str]) -> List[Dict[str, str]]:
+    """分類モード（一括）のメッセージを構築"""
+    items = [{"index": i, "text": text} for i, text in enumerate(opinion_texts)]
+    return [
+        {"role": "system", "content": CLASSIFY_BATCH_PROMPT},
+        {"role": "user", "content": json.dumps(items, ensure_ascii=False)}
+    ]
+
+
+def parse_classification(item) -> Optional[Dict]:
+    """分類結果1件を検証して {"category", "emotion_score"} に整形（不正な場合はNone）"""
+    if not isinstance(item, dict):
+        return None
+    category = item.get("category")
+    score = item.get("emotion_score")
+    if category not in OPINION_CATEGORIES:
+        return None
+    if isinstance(score, str) and score.strip().isdigit():
+        score = int(score.strip())
+    if isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= 10:
+        return None
+    return {"category": category, "emotion_score": score}
+
 
 class OllamaClient:
     """Ollama LLMクライアント"""
@@ -25,17 +199,155 @@ class OllamaClient:
     def __init__(self):
         """初期化"""
         self.model = OLLAMA_MODEL
-        self.base_url = OLLAMA_URL
         self.timeout = OLLAMA_TIMEOUT
+        self.modes = {mode: dict(settings) for mode, settings in MODE_SETTINGS.items()}
 
-        # Ollamaクライアント設定（タイムアウトを設定）
-        self.client = ollama.Client(
-            host=self.base_url,
-            timeout=self.timeout
+        # Ollamaホストのプール（ホストごとにタイムアウト・サーキットブレーカー・同時実行数上限を持つ）
+        self.pool = OllamaBackendPool(
+            OLLAMA_HOSTS,
+            timeout=self.timeout,
+            max_concurrency=OLLAMA_HOST_MAX_CONCURRENCY,
+            failure_threshold=OLLAMA_CB_FAILURE_THRESHOLD,
+            reset_timeout=OLLAMA_CB_RESET_TIMEOUT,
+            acquire_timeout=OLLAMA_QUEUE_TIMEOUT
         )
-        logger.info(f"Ollama client initialized with model: {self.model}, timeout: {self.timeout}s")
-    
-    def chat_mode(self, user_message: str, chat_history: List[Dict[str, str]] = None) -> str:
+        logger.info(f"Ollama client initialized with model: {self.model}, hosts: {OLLAMA_HOSTS}, timeout: {self.timeout}s")
+        for mode, settings in self.modes.items():
+            if settings["model"] != self.model:
+                logger.info(f"  {mode} mode uses model: {settings['model']}")
+
+        # ストリーミング応答の計測値（累積）
+        self._stream_lock = threading.Lock()
+        self._stream_metrics = {
+            "requests": 0,
+            "cut_off": 0,
+            "ttft_ms_total": 0.0,
+            "tokens_per_sec_total": 0.0,
+        }
+
+        self._health_lock = threading.Lock()
+        self._health = None  # (利用可能か, 確認時刻)
+
+        # プロンプト長に応じたnum_ctxの選択（無効時はオプションの値をそのまま使う）
+        self.context_sizer = ContextSizer(OLLAMA_CTX_BUCKETS, OLLAMA_CTX_STICKY_SECONDS) if OLLAMA_ADAPTIVE_CTX else None
+
+    @contextmanager
+    def _guarded_call(self, priority: str = None, session_key: str = None, url: str = None):
+        """
+        LLM実行枠とOllamaホストを確保し、そのホストのollama.Clientを返す
+
+        呼び出し結果はホストのサーキットブレーカーに記録される。
+        urlを指定した場合はそのホストだけを対象にする。
+
+        Raises:
+            CircuitOpenError: 全ホストのサーキットがopenの場合（Ollamaに接続せず即座に失敗）
+            LLMQueueTimeout: 実行枠・ホストの待機時間が上限を超えた場合
+        """
+        if self.pool.all_open():
+            raise CircuitOpenError("Ollama circuit is open")
+        with get_llm_governor().slot(priority=priority):
+            with self.pool.lease(session_key, url=url) as backend:
+                yield backend.client
+
+    def resolve_mode(self, mode: str = None, model: str = None, options: Dict = None) -> Tuple[str, Dict, Optional[str]]:
+        """
+        モード別設定を適用したモデル名・オプション・keep_aliveを返す
+
+        オプションは呼び出し側の値に設定ファイルの上書き値を重ねる。
+        """
+        settings = self.modes.get(mode)
+        if settings is None:
+            return model or self.model, options, None
+        merged = dict(options or {})
+        merged.update(settings["options"])
+        return model or settings["model"], merged, settings["keep_alive"]
+
+    def fit_context(self, mode: str, model: str, messages: List[Dict[str, str]], options: Dict) -> Dict:
+        """
+        プロンプト長に応じてnum_ctxを設定したオプションを返す
+
+        対象モード（OLLAMA_CTX_ADAPTIVE_MODES）以外や、モード別オプションで
+        num_ctxが指定されている場合はそのまま返す。
+        """
+        if self.context_sizer is None or mode not in OLLAMA_CTX_ADAPTIVE_MODES:
+            return options
+        if "num_ctx" in self.modes.get(mode, {}).get("options", {}):
+            return options
+        options = dict(options or {})
+        options["num_ctx"] = self.context_sizer.select(model, messages, options.get("num_predict", 0))
+        return options
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        options: Dict = None,
+        format: str = '',
+        model: str = None,
+        priority: str = None,
+        session_key: str = None,
+        mode: str = None,
+        use_cache: bool = None
+    ) -> Dict:
+        """
+        LLM実行枠を確保してからOllamaのchat APIを呼び出す（非ストリーミング）
+
+        Args:
+            priority: 実行枠の優先度（interactive/background/bulk、省略時はllm_priority()の設定）
+            session_key: 同じホストに送るためのキー（対話セッションIDなど）
+            mode: chat/summary/classify/analysis（モード別のモデル・keep_alive・オプションを適用）
+            use_cache: 応答キャッシュを使うか（省略時はLLM_CACHE_MODESのモードのみ使う）
+
+        Raises:
+            CircuitOpenError: サーキットがopenの場合
+            LLMQueueTimeout: 実行枠の待機時間が上限を超えた場合
+        """
+        model, options, keep_alive = self.resolve_mode(mode, model, options)
+
+        if use_cache is None:
+            use_cache = mode in LLM_CACHE_MODES
+        cache = get_llm_cache() if use_cache and not is_cache_disabled() else None
+        if cache is not None:
+            key = make_cache_key(model, messages, options, format)
+            content = cache.get(key)
+            if content is not None:
+                return {"model": model, "message": {"role": "assistant", "content": content}, "done": True, "cached": True}
+
+        # num_ctxは応答内容に影響しないためキャッシュキーの計算後に設定する
+        options = self.fit_context(mode, model, messages, options)
+
+        with self._guarded_call(priority, session_key) as client:
+            response = client.chat(
+                model=model,
+                messages=messages,
+                options=options,
+                format=format,
+                keep_alive=keep_alive
+            )
+
+        if cache is not None:
+            content = response['message']['content']
+            if self._is_cacheable(content, format):
+                cache.set(key, model, content)
+        return response
+
+    @staticmethod
+    def _is_cacheable(content: str, format: str) -> bool:
+        """空応答や壊れたJSONはキャッシュしない（再試行で別の結果を得られるように）"""
+        if not content or not content.strip():
+            return False
+        if format == "json":
+            try:
+                json.loads(content)
+            except ValueError:
+                return False
+        return True
+
+    def chat_mode(
+        self,
+        user_message: str,
+        chat_history: List[Dict[str, str]] = None,
+        session_key: str = None
+    ) -> str:
         """
         対話モード: 市民との対話で意見を引き出す
 
@@ -43,33 +355,38 @@ class OllamaClient:
             user_message: ユーザーのメッセージ（後方互換性のため残すが使用しない）
             chat_history: 対話履歴（最新のユーザーメッセージを含む）
                          [{"role": "user"|"assistant", "content": "..."}]
+            session_key: 対話セッションのキー（同じホストに送り、プロンプトキャッシュを再利用する）
 
         Returns:
             LLMの応答（150文字以内の質問・傾聴）
         """
         try:
-            # メッセージ履歴の構築
-            messages = [
-                {"role": "system", "content": SYSTEM_PROMPT_CHAT}
-            ]
-
-            # 対話履歴を追加（最新のユーザーメッセージを含む完全な履歴）
-            if chat_history:
-                messages.extend(chat_history)
+            # メッセージ履歴の構築（最新のユーザーメッセージを含む完全な履歴）
+            messages = build_chat_messages(chat_history)
 
             # デバッグ情報をログ出力
             logger.info(f"Sending {len(messages)} messages to Ollama (history items: {len(chat_history) if chat_history else 0})")
 
+            options = CHAT_OPTIONS
+
+            if CHAT_STREAMING:
+                # ストリーミングで受信し、文字数上限を超えた最初の文末で生成を打ち切る
+                assistant_message, stats = self.stream_chat(
+                    messages, options, CHAT_REPLY_CHAR_BUDGET, session_key=session_key
+                )
+                assistant_message = assistant_message.strip()
+                logger.info(
+                    f"Chat mode response streamed: {len(assistant_message)} chars, "
+                    f"TTFT {stats['ttft_ms']:.0f}ms, {stats['tokens_per_sec']:.1f} tokens/s, "
+                    f"cut_off={stats['cut_off']}"
+                )
+                if not assistant_message:
+                    logger.error(f"Empty streamed response detected! stats={stats}")
+                    return "申し訳ございません。もう一度お試しいただけますか？"
+                return assistant_message
+
             # Ollama呼び出し
-            response = self.client.chat(
-                model=self.model,
-                messages=messages,
-                options={
-                    "temperature": 0.7,  # 対話モードは創造性を持たせる
-                    "num_predict": 300,  # 最大トークン数（余裕を持たせる）
-                    "num_ctx": 8192,  # コンテキストウィンドウサイズ
-                }
-            )
+            response = self.chat(messages, options, session_key=session_key, mode="chat")
 
             assistant_message = response['message']['content'].strip()
             logger.info(f"Chat mode response generated: {len(assistant_message)} chars")
@@ -92,12 +409,105 @@ class OllamaClient:
             logger.error(f"Error in chat_mode: {e}")
             return "申し訳ございません。少し時間をおいてもう一度お試しください。"
     
-    def summary_mode(self, chat_history: List[Dict[str, str]]) -> Optional[Dict]:
+    def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        options: Dict,
+        char_budget: int,
+        session_key: str = None
+    ) -> Tuple[str, Dict]:
+        """
+        ストリーミングでチャット応答を受信し、文字数上限を超えた最初の文末で打ち切る
+
+        ストリームを閉じるとHTTP接続が切断され、Ollama側の生成も中断される。
+
+        Args:
+            messages: Ollamaに渡すメッセージ
+            options: Ollamaオプション
+            char_budget: 目標文字数（これを超えた最初の文末で打ち切る）
+            session_key: 同じホストに送るためのキー
+
+        Returns:
+            (応答テキスト, {"ttft_ms", "tokens", "tokens_per_sec", "cut_off", "total_ms"})
+        """
+        with self._guarded_call(session_key=session_key) as client:
+            return self._stream_chat(client, messages, options, char_budget)
+
+    def _stream_chat(self, client, messages: List[Dict[str, str]], options: Dict, char_budget: int) -> Tuple[str, Dict]:
+        """stream_chatの本体（呼び出し側で実行枠とホストを確保済み）"""
+        started = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        cut_off = False
+        text = ""
+
+        model, options, keep_alive = self.resolve_mode("chat", options=options)
+        options = self.fit_context("chat", model, messages, options)
+        stream = client.chat(
+            model=model,
+            messages=messages,
+            options=options,
+            stream=True,
+            keep_alive=keep_alive
+        )
+        try:
+            for chunk in stream:
+                piece = chunk.get('message', {}).get('content', '')
+                if piece:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    token_count += 1
+                    text += piece
+
+                if chunk.get('done'):
+                    break
+
+                if len(text) >= char_budget:
+                    end = find_sentence_end(text, char_budget - 1)
+                    if end != -1:
+                        text = text[:end]
+                        cut_off = True
+                        break
+        finally:
+            # 打ち切った場合も含めて接続を閉じる
+            stream.close()
+
+        finished = time.perf_counter()
+        generation_secs = finished - first_token_at if first_token_at else 0.0
+        stats = {
+            "ttft_ms": ((first_token_at or finished) - started) * 1000,
+            "tokens": token_count,
+            "tokens_per_sec": token_count / generation_secs if generation_secs > 0 else 0.0,
+            "cut_off": cut_off,
+            "total_ms": (finished - started) * 1000,
+        }
+
+        with self._stream_lock:
+            self._stream_metrics["requests"] += 1
+            self._stream_metrics["cut_off"] += int(cut_off)
+            self._stream_metrics["ttft_ms_total"] += stats["ttft_ms"]
+            self._stream_metrics["tokens_per_sec_total"] += stats["tokens_per_sec"]
+
+        return text, stats
+
+    def get_stream_metrics(self) -> Dict:
+        """ストリーミング応答の平均TTFT・生成速度を取得"""
+        with self._stream_lock:
+            requests = self._stream_metrics["requests"]
+            return {
+                "requests": requests,
+                "cut_off": self._stream_metrics["cut_off"],
+                "avg_ttft_ms": self._stream_metrics["ttft_ms_total"] / requests if requests else 0.0,
+                "avg_tokens_per_sec": self._stream_metrics["tokens_per_sec_total"] / requests if requests else 0.0,
+            }
+
+    def summary_mode(self, chat_history: List[Dict[str, str]], use_cache: bool = True) -> Optional[Dict]:
         """
         要約モード: 対話ログから構造化データを抽出
         
         Args:
             chat_history: 対話履歴
+            use_cache: 応答キャッシュを使うか
         
         Returns:
             {
@@ -107,27 +517,13 @@ class OllamaClient:
             }
         """
         try:
-            # 対話ログをテキスト化
-            conversation_text = "\n".join([
-                f"{msg['role']}: {msg['content']}"
-                for msg in chat_history
-                if msg['role'] in ['user', 'assistant']
-            ])
-            
-            messages = [
-                {"role": "system", "content": SYSTEM_PROMPT_SUMMARY},
-                {"role": "user", "content": f"以下の対話ログを要約してください:\n\n{conversation_text}"}
-            ]
-            
             # Ollama呼び出し（temperature=0.0で決定的な出力）
-            response = self.client.chat(
-                model=self.model,
-                messages=messages,
-                options={
-                    "temperature": 0.0,
-                    "num_predict": 300,
-                },
-                format="json"  # JSON形式での出力を要求
+            response = self.chat(
+                build_summary_messages(chat_history),
+                options=SUMMARY_OPTIONS,
+                format="json",  # JSON形式での出力を要求
+                mode="summary",
+                use_cache=use_cache
             )
             
             # JSON解析
@@ -144,12 +540,13 @@ class OllamaClient:
             logger.error(f"Error in summary_mode: {e}")
             return None
     
-    def classify_opinion(self, opinion_text: str) -> Optional[Dict]:
+    def classify_opinion(self, opinion_text: str, use_cache: bool = True) -> Optional[Dict]:
         """
         分類モード: 意見をカテゴリ分類し、感情スコアを付与
         
         Args:
             opinion_text: 分類対象の意見文
+            use_cache: 応答キャッシュを使うか
         
         Returns:
             {
@@ -158,40 +555,12 @@ class OllamaClient:
             }
         """
         try:
-            classify_prompt = """以下の市民の意見を分析し、カテゴリと感情スコアをJSON形式で出力してください。
-
-カテゴリは以下から選択:
-- 交通
-- 福祉
-- 教育
-- 環境
-- 子育て
-- 医療
-- 防災
-- その他
-
-感情スコアは0-10の整数（10が最も強い不満・要望）
-
-出力形式:
-{
-  "category": "カテゴリ名",
-  "emotion_score": 感情スコア
-}
-"""
-            
-            messages = [
-                {"role": "system", "content": classify_prompt},
-                {"role": "user", "content": opinion_text}
-            ]
-            
-            response = self.client.chat(
-                model=self.model,
-                messages=messages,
-                options={
-                    "temperature": 0.0,
-                    "num_predict": 100,
-                },
-                format="json"
+            response = self.chat(
+                build_classify_messages(opinion_text),
+                options=CLASSIFY_OPTIONS,
+                format="json",
+                mode="classify",
+                use_cache=use_cache
             )
             
             result_text = response['message']['content'].strip()
@@ -204,15 +573,132 @@ class OllamaClient:
             logger.error(f"Error in classify_opinion: {e}")
             return None
     
-    def is_available(self) -> bool:
-        """Ollamaサービスの死活確認"""
+    def classify_opinions(
+        self,
+        opinion_texts: List[str],
+        batch_size: int = None,
+        use_cache: bool = True
+    ) -> List[Optional[Dict]]:
+        """
+        分類モード（一括）: 複数の意見をまとめて分類
+
+        batch_size件ずつ1回のLLM呼び出しで分類する。JSONが壊れている場合はバッチを
+        半分に分けて再試行し、結果が欠けた意見だけを再度分類する。
+
+        Args:
+            opinion_texts: 分類対象の意見文のリスト
+            batch_size: 1回の呼び出しで分類する件数（省略時は設定値）
+            use_cache: 応答キャッシュを使うか
+
+        Returns:
+            入力と同じ順序の [{"category", "emotion_score"} または None]
+        """
+        batch_size = batch_size or OLLAMA_CLASSIFY_BATCH_SIZE
+        results = []
+        for start in range(0, len(opinion_texts), batch_size):
+            results.extend(self._classify_batch(opinion_texts[start:start + batch_size], use_cache))
+
+        classified = sum(1 for r in results if r is not None)
+        logger.info(f"Opinions classified: {classified}/{len(opinion_texts)}")
+        return results
+
+    def _classify_batch(self, opinion_texts: List[str], use_cache: bool) -> List[Optional[Dict]]:
+        """1バッチ分の分類（失敗時は分割して再試行）"""
+        if len(opinion_texts) == 1:
+            # バッチと同じ検証を通す（カテゴリ外・範囲外のスコア・キーの欠落はNone）
+            return [parse_classification(self.classify_opinion(opinion_texts[0], use_cache=use_cache))]
+
+        results = [None] * len(opinion_texts)
         try:
-            # モデル一覧取得で接続確認
-            self.client.list()
-            return True
+            response = self.chat(
+                build_classify_batch_messages(opinion_texts),
+                options={
+                    "temperature": 0.0,
+                    "num_predict": CLASSIFY_BATCH_TOKENS_PER_ITEM * len(opinion_texts) + 50,
+                },
+                format="json",
+                mode="classify",
+                use_cache=use_cache
+            )
+            parsed = json.loads(response['message']['content'].strip())
+            items = parsed.get("results", []) if isinstance(parsed, dict) else parsed
+            for item in items if isinstance(items, list) else []:
+                index = item.get("index") if isinstance(item, dict) else None
+                if isinstance(index, int) and 0 <= index < len(opinion_texts) and results[index] is None:
+                    results[index] = parse_classification(item)
+        except (CircuitOpenError, LLMQueueTimeout) as e:
+            # 再試行しても失敗するため打ち切る
+            logger.error(f"Batch classification aborted: {e}")
+            return results
         except Exception as e:
-            logger.error(f"Ollama service not available: {e}")
-            return False
+            logger.warning(f"Batch classification of {len(opinion_texts)} opinions failed: {e}")
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if not missing:
+            return results
+
+        if len(missing) == len(opinion_texts):
+            # 全件失敗 → 半分に分けて再試行
+            mid = len(opinion_texts) // 2
+            logger.info(f"Splitting batch of {len(opinion_texts)} opinions and retrying")
+            return (
+                self._classify_batch(opinion_texts[:mid], use_cache)
+                + self._classify_batch(opinion_texts[mid:], use_cache)
+            )
+
+        # 一部だけ欠けた場合は欠けた意見のみ再試行
+        retried = self._classify_batch([opinion_texts[i] for i in missing], use_cache)
+        for i, result in zip(missing, retried):
+            results[i] = result
+        return results
+
+    def is_available(self) -> bool:
+        """
+        Ollamaサービスの死活確認
+
+        結果はOLLAMA_HEALTH_CACHE_TTL秒キャッシュする。サーキットがopenのホストには接続しない。
+        """
+        with self._health_lock:
+            if self._health is not None and time.monotonic() - self._health[1] < OLLAMA_HEALTH_CACHE_TTL:
+                return self._health[0]
+
+        # いずれかのホストが応答すれば利用可能とする（各ホストのサーキットも更新される）
+        available = False
+        for backend in self.pool.backends:
+            if not backend.breaker.allow_request():
+                continue
+            try:
+                # モデル一覧取得で接続確認
+                backend.client.list()
+                backend.breaker.record_success()
+                available = True
+            except Exception as e:
+                if is_host_failure(e):
+                    backend.breaker.record_failure()
+                else:
+                    backend.breaker.cancel()
+                logger.error(f"Ollama service not available at {backend.url}: {e}")
+
+        with self._health_lock:
+            self._health = (available, time.monotonic())
+        return available
+
+    def end_session(self, session_key: str):
+        """対話セッションの終了時に、ホストの割り当て（スティッキー情報）を解放"""
+        self.pool.forget(session_key)
+
+    def is_circuit_open(self) -> bool:
+        """全ホストのサーキットがopenか（Trueの間はOllamaを呼ばずに縮退動作する）"""
+        return self.pool.all_open()
+
+    def health(self) -> Dict:
+        """/health向けの状態（キャッシュ済みの死活確認とホストごとの状態）"""
+        return {
+            "available": self.is_available(),
+            "circuit": "open" if self.is_circuit_open() else "closed",
+            "pool": self.pool.stats(),
+            "context": self.context_sizer.stats() if self.context_sizer is not None else None,
+        }
 
 
 # シングルトンインスタンス
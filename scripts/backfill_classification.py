@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""意見の一括分類バックフィルスクリプト
+
+カテゴリまたは感情スコアが未設定の意見を、OllamaClient.classify_opinions() で
+まとめて分類しデータベースを更新します。カテゴリはユーザーが選択済みの場合は上書きしません。
+
+使い方:
+    python scripts/backfill_classification.py
+    python scripts/backfill_classification.py --batch-size 20 --limit 1000 --priority
+"""
+
+import sys
+import time
+import argparse
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from sqlalchemy import or_
+
+from database.db_manager import get_db, Opinion
+from ollama_client import get_ollama_client
+from utils.llm_governor import llm_priority, BULK
+
+
+def run_backfill(batch_size: int = None, limit: int = None, chunk_size: int = 200, with_priority: bool = False):
+    print("=== 意見の一括分類開始 ===\n")
+
+    client = get_ollama_client()
+    analyzer = None
+    if with_priority:
+        from features.ai_analysis import get_analyzer
+        analyzer = get_analyzer()
+
+    with get_db() as db:
+        query = db.query(Opinion.id).filter(
+            or_(Opinion.category.is_(None), Opinion.emotion_score.is_(None))
+        ).order_by(Opinion.id)
+        if limit:
+            query = query.limit(limit)
+        opinion_ids = [row.id for row in query.all()]
+
+    print(f"対象件数: {len(opinion_ids)}件")
+
+    started = time.perf_counter()
+    updated = 0
+    failed = 0
+
+    for start in range(0, len(opinion_ids), chunk_size):
+        with get_db() as db:
+            opinions = db.query(Opinion).filter(
+                Opinion.id.in_(opinion_ids[start:start + chunk_size])
+            ).order_by(Opinion.id).all()
+
+            with llm_priority(BULK):
+                results = client.classify_opinions([op.content for op in opinions], batch_size=batch_size)
+
+            for op, result in zip(opinions, results):
+                if result is None:
+                    failed += 1
+                    continue
+                if op.category is None:
+                    op.category = result["category"]
+                op.emotion_score = result["emotion_score"]
+                if analyzer is not None and op.priority_score is None:
+                    op.priority_score = analyzer.calculate_priority_score(op.content)
+                updated += 1
+
+            db.commit()
+
+        done = min(start + chunk_size, len(opinion_ids))
+        elapsed = time.perf_counter() - started
+        print(f"  {done}/{len(opinion_ids)}件 ({elapsed:.1f}秒, {done / elapsed:.1f}件/秒)")
+
+    print(f"\n更新完了: {updated}件 / 分類失敗: {failed}件")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="意見の一括分類バックフィル")
+    parser.add_argument("--batch-size", type=int, default=None, help="1回のLLM呼び出しで分類する件数（省略時は設定値）")
+    parser.add_argument("--limit", type=int, default=None, help="処理する最大件数")
+    parser.add_argument("--chunk-size", type=int, default=200, help="1トランザクションで更新する件数")
+    parser.add_argument("--priority", action="store_true", help="未設定の優先度スコアも計算する")
+    args = parser.parse_args()
+
+    run_backfill(args.batch_size, args.limit, args.chunk_size, args.priority)
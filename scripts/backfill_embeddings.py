@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""意見の埋め込みベクトル事前計算スクリプト
+
+埋め込みが未計算、または計算後に編集された意見のベクトルを計算して opinion_embeddings に保存します。
+管理画面の従来型AI分析は保存済みのベクトルを読み込むため、事前に計算しておくと分析が速くなります。
+
+使い方:
+    python scripts/backfill_embeddings.py                  # 未計算分をすべて計算
+    python scripts/backfill_embeddings.py --loop --interval 300   # 常駐して新しい意見を定期的に計算
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from features.ai_analysis import get_analyzer
+from features.embedding_store import embed_pending
+
+
+def run_backfill(limit: int, batch_size: int) -> int:
+    """未計算分がなくなるまで計算"""
+    analyzer = get_analyzer()
+    total = 0
+    after_id = 0
+    started = time.perf_counter()
+    while True:
+        # 本文が変わっていない意見だけのページでも計算件数は0になるため、調べた件数で終了を判定する
+        examined, done, after_id = embed_pending(analyzer, limit=limit, batch_size=batch_size, after_id=after_id)
+        total += done
+        if examined == 0:
+            break
+        if done:
+            elapsed = time.perf_counter() - started
+            print(f"  {total}件計算済み ({elapsed:.1f}秒, {total / elapsed:.1f}件/秒)")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="意見の埋め込みベクトル事前計算")
+    parser.add_argument("--limit", type=int, default=1000, help="1回の問い合わせで取得する意見数")
+    parser.add_argument("--batch-size", type=int, default=256, help="1回の計算・保存の件数")
+    parser.add_argument("--loop", action="store_true", help="常駐して定期的に計算する")
+    parser.add_argument("--interval", type=float, default=300, help="常駐時の確認間隔（秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print("=== 埋め込みベクトル事前計算開始 ===\n")
+    print(f"計算完了: {run_backfill(args.limit, args.batch_size)}件")
+
+    while args.loop:
+        time.sleep(args.interval)
+        run_backfill(args.limit, args.batch_size)
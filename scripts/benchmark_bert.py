@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""BERT推論バックエンドのベンチマーク
+
+同じ意見テキストを各バックエンド（torch / torch_int8 / onnx）でベクトル化し、
+処理速度（件/秒）とfp32のベクトルとのコサイン類似度を表示します。
+BERT_BACKEND / BERT_NUM_THREADS を選ぶために使用します。
+
+使い方:
+    python scripts/benchmark_bert.py
+    python scripts/benchmark_bert.py --backends torch,torch_int8,onnx --n 512 --threads 4
+"""
+
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from features.ai_analysis import OpinionAnalyzer
+from features.bert_backend import create_encoder
+
+# 長さの異なる意見（短いアンケート回答〜長い対話要約）
+SAMPLE_TEXTS = [
+    "バスの本数を増やしてほしい",
+    "公園の遊具が古くて危ないです",
+    "駅前の駐輪場がいつも満車で、朝7時半にはもう停められません。遠くの有料駐輪場に停めているため通勤に時間がかかっています。",
+    "保育園の空きがなく仕事に復帰できません",
+    "夜道が暗いので街灯を増やしてください。特に公園の横の道は人通りもなく真っ暗で、帰宅が遅くなる娘が心配です。",
+    "ゴミの分別ルールが分かりにくい",
+    "高齢の母の通院が大変です。バスの本数が少なく病院まで乗り換えも必要で、タクシーを使うと費用がかさみます。コミュニティバスの路線を見直してほしいです。",
+    "図書館の開館時間を延長してほしい",
+]
+
+
+def _cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def run_benchmark(backends, n, batch_size, threads, onnx_path):
+    analyzer = OpinionAnalyzer(use_service=False)
+    analyzer.backend = "torch"
+    analyzer._load_model()
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(n)]
+
+    rows = []
+    reference = None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        analyzer.encoder = create_encoder(backend, analyzer.model, analyzer.device, threads, onnx_path)
+        if analyzer.encoder.name != backend:
+            print(f"  {backend}: unavailable, skipped")
+            continue
+
+        # 初回はスレッドプールの起動などを含むため計測から除外
+        analyzer.compute_embeddings(texts[:batch_size], batch_size=batch_size)
+        started = time.perf_counter()
+        embeddings = analyzer.compute_embeddings(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+
+        if reference is None:
+            reference = embeddings
+        cosine = _cosine(embeddings, reference)
+        rows.append({
+            "backend": backend,
+            "n": n,
+            "texts_per_sec": n / elapsed,
+            "total_sec": elapsed,
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+        })
+        print(f"  done: {backend}")
+    return rows
+
+
+def print_table(rows):
+    print(f"\n{'backend':<12} {'n':>6} {'texts/s':>9} {'total(s)':>9} {'min cos':>9} {'mean cos':>9}")
+    print("-" * 60)
+    for row in rows:
+        print(
+            f"{row['backend']:<12} {row['n']:>6} {row['texts_per_sec']:>9.1f} {row['total_sec']:>9.2f} "
+            f"{row['min_cosine']:>9.4f} {row['mean_cosine']:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BERT推論バックエンドのベンチマーク")
+    parser.add_argument("--backends", default="torch,torch_int8,onnx", help="比較するバックエンド（カンマ区切り）")
+    parser.add_argument("--n", type=int, default=256, help="ベクトル化する件数")
+    parser.add_argument("--batch-size", type=int, default=32, help="バッチサイズ")
+    parser.add_argument("--threads", type=int, default=0, help="演算スレッド数（0は既定値）")
+    parser.add_argument("--onnx-path", default="instance/bert_onnx/benchmark.onnx", help="ONNXモデルの保存先")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    print("=== BERTバックエンドベンチマーク開始 ===")
+    results = run_benchmark(
+        [b.strip() for b in args.backends.split(",") if b.strip()],
+        args.n, args.batch_size, args.threads, args.onnx_path
+    )
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""モード別モデルのベンチマーク
+
+固定の対話ログ・意見を候補モデルで処理し、モデル×モードごとに
+レイテンシとJSON妥当率（必須キーと値の範囲まで確認）を表示します。
+要約・分類に使える最も軽いモデルを選ぶために使用します。
+--num-ctx で num_ctx の自動選択（adaptive）と固定値を比較できます。
+
+使い方:
+    python scripts/benchmark_models.py --models llama3.2,qwen2.5:1.5b,gemma2:2b
+    python scripts/benchmark_models.py --models qwen2.5:1.5b --modes summary,classify --repeat 3
+    python scripts/benchmark_models.py --models llama3.2 --modes chat,summary --num-ctx adaptive,8192
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from ollama_client import (
+    get_ollama_client,
+    build_chat_messages,
+    build_summary_messages,
+    build_classify_messages,
+    CHAT_OPTIONS,
+    SUMMARY_OPTIONS,
+    CLASSIFY_OPTIONS,
+)
+from config import OPINION_CATEGORIES, OLLAMA_CTX_BUCKETS, OLLAMA_CTX_STICKY_SECONDS
+from utils.context_window import ContextSizer
+
+# 要約モード用の対話ログ
+TRANSCRIPTS = [
+    [
+        {"role": "user", "content": "公園の遊具が古くて心配です"},
+        {"role": "assistant", "content": "具体的にどの公園の、どのような遊具でしょうか？"},
+        {"role": "user", "content": "枚方公園のブランコです。錆びていて危ないと思います"},
+        {"role": "assistant", "content": "お子さんが利用される機会は多いですか？"},
+        {"role": "user", "content": "毎週末に子どもと行きます。他の親御さんも心配しています"},
+    ],
+    [
+        {"role": "user", "content": "駅前の駐輪場がいつも満車です"},
+        {"role": "assistant", "content": "どの駅の駐輪場でしょうか？時間帯によって状況は違いますか？"},
+        {"role": "user", "content": "枚方市駅です。朝7時半にはもう停められません"},
+        {"role": "assistant", "content": "停められない時はどうされていますか？"},
+        {"role": "user", "content": "仕方なく遠くの有料駐輪場に停めていて、通勤に時間がかかります"},
+    ],
+    [
+        {"role": "user", "content": "高齢の母の通院が大変です"},
+        {"role": "assistant", "content": "通院にはどのような手段を使われていますか？"},
+        {"role": "user", "content": "バスですが本数が少なく、病院まで乗り換えも必要です"},
+    ],
+    [
+        {"role": "user", "content": "夜道が暗くて怖いです"},
+        {"role": "assistant", "content": "どのあたりの道でしょうか？"},
+        {"role": "user", "content": "香里園の住宅街です。街灯が少なく、帰宅が遅くなる娘が心配です"},
+        {"role": "assistant", "content": "特に危ないと感じる場所はありますか？"},
+        {"role": "user", "content": "公園の横の道は人通りもなく真っ暗です"},
+    ],
+]
+
+# 分類モード用の意見
+OPINIONS = [
+    "通学路に横断歩道がなく、子どもが車の間を渡っていて危険です。",
+    "保育園の空きがなく、仕事に復帰できません。",
+    "ゴミの分別ルールが分かりにくいので、外国語の案内も作ってほしい。",
+    "市民病院の待ち時間が長すぎます。予約システムを改善してください。",
+    "大雨のときに避難所までの道が冠水します。",
+    "図書館の開館時間を夜まで延長してほしいです。",
+    "介護ヘルパーの人手が足りず、希望の時間にサービスを受けられません。",
+    "バスの本数が減って買い物に行けなくなりました。",
+]
+
+
+def _check_summary(result) -> bool:
+    """要約結果の形式チェック"""
+    return (
+        isinstance(result, dict)
+        and isinstance(result.get("summary"), str) and result["summary"] != ""
+        and isinstance(result.get("category"), str)
+        and isinstance(result.get("emotion_score"), int) and 0 <= result["emotion_score"] <= 10
+    )
+
+
+def _check_classify(result) -> bool:
+    """分類結果の形式チェック（カテゴリは定義済みのもののみ有効）"""
+    return (
+        isinstance(result, dict)
+        and result.get("category") in OPINION_CATEGORIES
+        and isinstance(result.get("emotion_score"), int) and 0 <= result["emotion_score"] <= 10
+    )
+
+
+def _cases(mode: str):
+    """モードごとの (メッセージ, オプション, format, 検証関数) の一覧"""
+    if mode == "summary":
+        return [(build_summary_messages(t), SUMMARY_OPTIONS, "json", _check_summary) for t in TRANSCRIPTS]
+    if mode == "classify":
+        return [(build_classify_messages(o), CLASSIFY_OPTIONS, "json", _check_classify) for o in OPINIONS]
+    # 対話モードは各対話ログの最初のユーザー発言への応答を測る
+    return [(build_chat_messages(t[:1]), CHAT_OPTIONS, "", None) for t in TRANSCRIPTS]
+
+
+def _with_num_ctx(options, num_ctx):
+    """固定のnum_ctxを指定したオプション（adaptiveの場合はそのまま）"""
+    if num_ctx == "adaptive":
+        return options
+    return {**(options or {}), "num_ctx": int(num_ctx)}
+
+
+def run_benchmark(models, modes, repeat, num_ctxs=("adaptive",)):
+    client = get_ollama_client()
+    rows = []
+
+    for num_ctx in num_ctxs:
+        # adaptiveは自動選択、数値の場合は自動選択を止めて固定値を渡す
+        client.context_sizer = (
+            ContextSizer(OLLAMA_CTX_BUCKETS, OLLAMA_CTX_STICKY_SECONDS) if num_ctx == "adaptive" else None
+        )
+        for model in models:
+            for mode in modes:
+                rows.append(_run_case_set(client, model, mode, repeat, num_ctx))
+
+    return rows
+
+
+def _run_case_set(client, model, mode, repeat, num_ctx):
+    """モデル×モード×num_ctxの1組を計測"""
+    cases = _cases(mode)
+    latencies = []
+    load_ms = []
+    valid = 0
+    errors = 0
+
+    # 初回はモデルのロード時間を含むため計測から除外
+    messages, options, fmt, _ = cases[0]
+    try:
+        client.chat(messages, options=_with_num_ctx(options, num_ctx), format=fmt, model=model, mode=mode, use_cache=False)
+    except Exception as e:
+        print(f"  {model} / {mode}: warm-up failed: {e}")
+
+    for _ in range(repeat):
+        for messages, options, fmt, check in cases:
+            started = time.perf_counter()
+            try:
+                response = client.chat(
+                    messages, options=_with_num_ctx(options, num_ctx), format=fmt,
+                    model=model, mode=mode, use_cache=False
+                )
+            except Exception as e:
+                errors += 1
+                print(f"  {model} / {mode}: error: {e}")
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            # バケットが切り替わりモデルが再ロードされた場合はload_durationが大きくなる
+            load_ms.append(response.get('load_duration', 0) / 1e6)
+
+            content = response['message']['content'].strip()
+            if check is None:
+                valid += int(bool(content))
+                continue
+            try:
+                valid += int(check(json.loads(content)))
+            except json.JSONDecodeError:
+                pass
+
+    total = len(cases) * repeat
+    print(f"  done: {model} / {mode} / num_ctx={num_ctx}")
+    return {
+        "model": model,
+        "mode": mode,
+        "num_ctx": num_ctx,
+        "n": total,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "max_ms": max(latencies) if latencies else None,
+        "load_ms": statistics.mean(load_ms) if load_ms else None,
+        "valid_rate": valid / total if total else 0.0,
+        "errors": errors,
+    }
+
+
+def print_table(rows):
+    print(
+        f"\n{'model':<24} {'mode':<9} {'num_ctx':>8} {'n':>4} {'p50(ms)':>9} {'max(ms)':>9} "
+        f"{'load(ms)':>9} {'valid':>7} {'errors':>7}"
+    )
+    print("-" * 94)
+    for row in rows:
+        p50 = f"{row['p50_ms']:.0f}" if row['p50_ms'] is not None else "-"
+        max_ms = f"{row['max_ms']:.0f}" if row['max_ms'] is not None else "-"
+        load = f"{row['load_ms']:.0f}" if row['load_ms'] is not None else "-"
+        print(
+            f"{row['model']:<24} {row['mode']:<9} {row['num_ctx']:>8} {row['n']:>4} {p50:>9} {max_ms:>9} "
+            f"{load:>9} {row['valid_rate']:>6.0%} {row['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="モード別モデルのベンチマーク")
+    parser.add_argument("--models", required=True, help="カンマ区切りの候補モデル")
+    parser.add_argument("--modes", default="summary,classify,chat", help="対象モード（summary,classify,chat）")
+    parser.add_argument("--repeat", type=int, default=1, help="各ケースの繰り返し回数")
+    parser.add_argument("--num-ctx", default="adaptive", help="比較するnum_ctx（adaptiveまたは数値、カンマ区切り）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    num_ctxs = [c.strip() for c in args.num_ctx.split(",") if c.strip()]
+
+    print("=== モデルベンチマーク開始 ===")
+    results = run_benchmark(models, modes, args.repeat, num_ctxs)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""埋め込みベクトル計算サービスの起動スクリプト
+
+BERTモデルを1つだけロードし、管理画面の各ワーカーやスクリプトからの埋め込み計算の依頼を
+まとめて処理します。利用側は EMBEDDING_SERVICE_URL にこのサービスのURLを設定してください。
+
+使い方:
+    python scripts/embedding_service.py                       # 127.0.0.1:8765 で起動
+    python scripts/embedding_service.py --port 8765 --max-batch 256 --max-wait-ms 20
+    EMBEDDING_SERVICE_URL=http://127.0.0.1:8765 gunicorn ... admin.admin_app:app
+"""
+
+import sys
+import logging
+import argparse
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from config import (
+    EMBEDDING_SERVICE_HOST,
+    EMBEDDING_SERVICE_PORT,
+    EMBEDDING_SERVICE_MAX_BATCH,
+    EMBEDDING_SERVICE_MAX_WAIT_MS,
+    EMBEDDING_SERVICE_TIMEOUT,
+)
+from features.ai_analysis import OpinionAnalyzer
+from features.embedding_service import EmbeddingServiceServer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="埋め込みベクトル計算サービス")
+    parser.add_argument("--host", default=EMBEDDING_SERVICE_HOST, help="待ち受けアドレス（localhostのみを推奨）")
+    parser.add_argument("--port", type=int, default=EMBEDDING_SERVICE_PORT)
+    parser.add_argument("--max-batch", type=int, default=EMBEDDING_SERVICE_MAX_BATCH, help="まとめて計算する最大件数")
+    parser.add_argument("--max-wait-ms", type=float, default=EMBEDDING_SERVICE_MAX_WAIT_MS, help="他の依頼を待つ時間（ミリ秒）")
+    parser.add_argument("--model", default="cl-tohoku/bert-base-japanese-v3", help="BERTモデル名")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    # サービス自身はプロセス内で計算する
+    analyzer = OpinionAnalyzer(args.model, use_service=False)
+    server = EmbeddingServiceServer(
+        analyzer,
+        host=args.host,
+        port=args.port,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        timeout=EMBEDDING_SERVICE_TIMEOUT,
+    )
+    print(f"=== 埋め込みベクトル計算サービス起動 ({server.url}) ===")
+    server.load_model()
+    print(f"モデル: {analyzer.embedding_key}（{server.load_ms}ms）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""負荷試験用のLINE Messaging API代替サーバー
+
+api.line.me の代わりに応答・プッシュ・マルチキャスト・リッチメニュー等のエンドポイントを提供し、
+呼び出しを記録します。LINE_API_ENDPOINT をこのサーバーに向けて使用します。
+
+- 応答トークンの再利用は400（Invalid reply token）を返す
+- 秒間リクエスト数の上限（--rps）を超えた場合や指定した割合（--rate-limit-rate）で429を返す
+- 応答までの遅延（--latency-ms, --jitter-ms）を再現
+- /fake/stats でエンドポイント別の件数・429の件数、/fake/calls で直近の呼び出しを確認できる
+
+使い方:
+    python scripts/fake_line_api.py --port 18080 --rps 2000 --latency-ms 30
+    LINE_API_ENDPOINT=http://127.0.0.1:18080 gunicorn -c gunicorn_config.py app:app
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+RATE_LIMIT_BODY = {"message": "The API rate limit has been exceeded. Try again later."}
+
+# (メソッド, パスの正規表現, エンドポイント名)
+ROUTES = [
+    ("POST", r"/v2/bot/message/reply", "reply"),
+    ("POST", r"/v2/bot/message/push", "push"),
+    ("POST", r"/v2/bot/message/multicast", "multicast"),
+    ("POST", r"/v2/bot/message/broadcast", "broadcast"),
+    ("GET", r"/v2/bot/profile/(?P<user_id>[^/]+)", "get_profile"),
+    ("POST", r"/v2/bot/richmenu", "create_rich_menu"),
+    ("GET", r"/v2/bot/richmenu/list", "get_rich_menu_list"),
+    ("POST", r"/v2/bot/richmenu/(?P<rich_menu_id>[^/]+)/content", "set_rich_menu_image"),
+    ("DELETE", r"/v2/bot/richmenu/(?P<rich_menu_id>[^/]+)", "delete_rich_menu"),
+    ("POST", r"/v2/bot/user/all/richmenu/(?P<rich_menu_id>[^/]+)", "set_default_rich_menu"),
+    ("POST", r"/v2/bot/user/(?P<user_id>[^/]+)/richmenu/(?P<rich_menu_id>[^/]+)", "link_rich_menu"),
+    ("DELETE", r"/v2/bot/user/(?P<user_id>[^/]+)/richmenu", "unlink_rich_menu"),
+    ("POST", r"/v2/bot/richmenu/bulk/link", "link_rich_menu_bulk"),
+]
+
+
+class TokenBucket:
+    """秒間リクエスト数の上限"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeLineApiServer:
+    """LINE Messaging APIの代替サーバー"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 18080,
+        rps: float = 0,
+        rate_limit_rate: float = 0.0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        max_calls: int = 10000,
+    ):
+        self.bucket = TokenBucket(rps)
+        self.rate_limit_rate = rate_limit_rate
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+        self._lock = threading.Lock()
+        self.calls = deque(maxlen=max_calls)  # 直近の呼び出し
+        self.counts = {}  # エンドポイント名 → 件数
+        self.rate_limited = 0
+        self.errors = 0
+        self._used_reply_tokens = set()
+        self.rich_menus = {}  # リッチメニューID → 定義
+        self.user_rich_menus = {}  # ユーザーID → リッチメニューID
+        self.default_rich_menu = None
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def _record(self, name: str, path: str, body, status: int):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.calls.append({"endpoint": name, "path": path, "body": body, "status": status, "at": time.time()})
+
+    def calls_for(self, name: str):
+        """指定したエンドポイントの記録済み呼び出し"""
+        with self._lock:
+            return [c for c in self.calls if c["endpoint"] == name]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "counts": dict(self.counts),
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+                "rich_menus": len(self.rich_menus),
+                "linked_users": len(self.user_rich_menus),
+            }
+
+    def handle(self, name: str, params: Dict, body) -> Tuple[int, Dict]:
+        """エンドポイントごとの処理（ステータスと応答本文）"""
+        if name == "reply":
+            token = (body or {}).get("replyToken")
+            with self._lock:
+                if not token or token in self._used_reply_tokens:
+                    return 400, {"message": "Invalid reply token"}
+                self._used_reply_tokens.add(token)
+            return 200, {"sentMessages": [{"id": str(random.randint(10 ** 17, 10 ** 18))} for _ in body.get("messages", [])]}
+        if name in ("push", "multicast", "broadcast"):
+            if name == "multicast" and len((body or {}).get("to", [])) > 500:
+                return 400, {"message": "The request body has 1 error(s)", "details": [{"property": "to", "message": "Size must be between 1 and 500"}]}
+            return 200, {"sentMessages": [{"id": str(random.randint(10 ** 17, 10 ** 18))} for _ in (body or {}).get("messages", [])]}
+        if name == "get_profile":
+            user_id = params["user_id"]
+            return 200, {"userId": user_id, "displayName": f"テストユーザー{user_id[-4:]}", "language": "ja"}
+        if name == "create_rich_menu":
+            rich_menu_id = f"richmenu-{uuid.uuid4().hex}"
+            with self._lock:
+                self.rich_menus[rich_menu_id] = body
+            return 200, {"richMenuId": rich_menu_id}
+        if name == "get_rich_menu_list":
+            with self._lock:
+                return 200, {"richmenus": [{"richMenuId": k, **(v or {})} for k, v in self.rich_menus.items()]}
+
+        rich_menu_id = params.get("rich_menu_id")
+        if rich_menu_id is not None and rich_menu_id not in self.rich_menus:
+            return 404, {"message": "Not found"}
+        with self._lock:
+            if name == "delete_rich_menu":
+                self.rich_menus.pop(rich_menu_id, None)
+            elif name == "set_default_rich_menu":
+                self.default_rich_menu = rich_menu_id
+            elif name == "link_rich_menu":
+                self.user_rich_menus[params["user_id"]] = rich_menu_id
+            elif name == "unlink_rich_menu":
+                self.user_rich_menus.pop(params["user_id"], None)
+            elif name == "link_rich_menu_bulk":
+                for user_id in (body or {}).get("userIds", []):
+                    self.user_rich_menus[user_id] = body.get("richMenuId")
+                return 202, {}
+        return 200, {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict, headers: Dict = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("X-Line-Request-Id", str(uuid.uuid4()))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self, method: str) -> Optional[Tuple[str, Dict]]:
+                path = self.path.split("?", 1)[0]
+                for route_method, pattern, name in ROUTES:
+                    match = re.fullmatch(pattern, path)
+                    if route_method == method and match:
+                        return name, match.groupdict()
+                return None
+
+            def _dispatch(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+
+                path = self.path.split("?", 1)[0]
+                if method == "GET" and path == "/fake/stats":
+                    self._send_json(200, server.stats())
+                    return
+                if method == "GET" and path == "/fake/calls":
+                    with server._lock:
+                        self._send_json(200, {"calls": list(server.calls)[-100:]})
+                    return
+
+                route = self._route(method)
+                if route is None:
+                    self._send_json(404, {"message": "Not found"})
+                    return
+                name, params = route
+
+                if not self.headers.get("Authorization", "").startswith("Bearer "):
+                    self._send_json(401, {"message": "Authentication failed"})
+                    return
+
+                delay = server.latency_ms + random.uniform(0, server.jitter_ms)
+                time.sleep(delay / 1000)
+
+                if not server.bucket.take() or random.random() < server.rate_limit_rate:
+                    with server._lock:
+                        server.rate_limited += 1
+                    server._record(name, path, None, 429)
+                    self._send_json(429, RATE_LIMIT_BODY)
+                    return
+
+                body = None
+                if raw and "json" in self.headers.get("Content-Type", ""):
+                    try:
+                        body = json.loads(raw)
+                    except ValueError:
+                        self._send_json(400, {"message": "The request body could not be parsed as JSON"})
+                        return
+
+                status, response = server.handle(name, params, body)
+                if status >= 400:
+                    with server._lock:
+                        server.errors += 1
+                server._record(name, path, body, status)
+                self._send_json(status, response)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+        return Handler
+
+    def start(self):
+        """バックグラウンドスレッドで起動（テスト用）"""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="負荷試験用のLINE Messaging API代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--rps", type=float, default=0, help="秒間リクエスト数の上限（超えると429、0で無制限）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="ランダムに429を返す割合")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="応答までの遅延（ミリ秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="遅延に加えるランダムな揺らぎ（ミリ秒）")
+    args = parser.parse_args()
+
+    server = FakeLineApiServer(
+        host=args.host,
+        port=args.port,
+        rps=args.rps,
+        rate_limit_rate=args.rate_limit_rate,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+    )
+    print(f"Fake LINE API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""負荷試験用のOllama代替サーバー
+
+モデルを載せていないマシンでボット自身のオーバーヘッドを計測するため、
+OllamaのHTTP API（/api/chat, /api/generate, /api/tags、ストリーミング含む）を
+それらしく模倣します。OLLAMA_URL（またはOLLAMA_HOSTS）をこのサーバーに向けて使用します。
+
+- 応答までの遅延（分布を指定）と生成速度（tokens/sec）、プロンプト評価速度を再現
+- 同時処理数（OLLAMA_NUM_PARALLEL相当）を超えたリクエストは待たせる
+- エラー応答・壊れたJSONを指定した割合で返す
+- format="json" の呼び出しにはプロンプトの種類（要約・分類・一括分類・AI分析）に合わせた
+  JSONを返す（--responses で固定の応答を追加可能）
+- keep_aliveを過ぎたモデルは次のリクエストでロード時間（--load-ms）を加算
+- /fake/stats で処理件数・同時実行数を確認できる
+
+使い方:
+    python scripts/fake_ollama_server.py --port 11500 --latency lognormal:0.2,0.5 --tokens-per-sec 15
+    OLLAMA_URL=http://127.0.0.1:11500 gunicorn -c gunicorn_config.py app:app
+
+遅延分布の指定（秒）:
+    fixed:0.2 / uniform:0.1,0.5 / normal:0.3,0.05 / lognormal:<中央値>,<sigma>
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from config import OPINION_CATEGORIES
+from utils.context_window import estimate_messages_tokens
+
+# 対話モードの既定の応答
+DEFAULT_CHAT_REPLY = "ご意見ありがとうございます。具体的にはどのような場面でお困りでしょうか？よろしければ詳しく教えてください。"
+
+
+def parse_latency(spec: str):
+    """遅延分布の指定から、呼び出すたびに遅延（秒）を返す関数を作る"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        return lambda: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        # 第1引数は中央値（秒）
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def parse_keep_alive(value) -> Optional[float]:
+    """keep_alive（"30m", "5m", "-1", 秒数）を秒に変換（無期限はNone）"""
+    if value is None or value == "":
+        return 300.0
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+    value = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        seconds = float(value[:-1]) * units[value[-1]]
+    else:
+        seconds = float(value)
+    return None if seconds < 0 else seconds
+
+
+def canned_json(messages: List[Dict[str, str]], categories: List[str]) -> Dict:
+    """プロンプトの種類に合わせたJSON応答"""
+    system = messages[0].get("content", "") if messages else ""
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    rng = random.Random(prompt)
+
+    if '"results"' in system:
+        # 一括分類（ユーザー発言は {"index", "text"} の配列）
+        try:
+            items = json.loads(messages[-1]["content"])
+        except (ValueError, KeyError):
+            items = []
+        return {"results": [
+            {"index": item.get("index", i), "category": rng.choice(categories), "emotion_score": rng.randint(0, 10)}
+            for i, item in enumerate(items)
+        ]}
+    if '"summary"' in system:
+        return {"summary": "市民からの意見の要約です。", "category": rng.choice(categories), "emotion_score": rng.randint(0, 10)}
+    if '"category"' in system:
+        return {"category": rng.choice(categories), "emotion_score": rng.randint(0, 10)}
+    if '"topics"' in prompt:
+        return {"topics": [
+            {"name": f"トピック{i + 1}", "description": "代替サーバーのトピックです", "keywords": ["意見", "要望"]}
+            for i in range(3)
+        ]}
+    if '"classifications"' in prompt:
+        count = prompt.count("\n[")
+        return {"classifications": [{"opinion_index": i, "topic_id": rng.randint(0, 2)} for i in range(max(count, 1))]}
+    if '"urgency_level"' in prompt:
+        return {"summary": "意見群の要約です。", "urgency_level": rng.choice(["緊急", "高", "中", "低"]),
+                "recommended_actions": ["現状の調査", "関係部署との協議"]}
+    return {"response": "ok"}
+
+
+class FakeOllamaServer:
+    """Ollama APIの代替サーバー"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 11500,
+        models: List[str] = None,
+        latency: str = "fixed:0",
+        tokens_per_sec: float = 0,
+        prompt_tokens_per_sec: float = 0,
+        num_parallel: int = 4,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        bad_json_rate: float = 0.0,
+        load_ms: float = 0.0,
+        chat_reply: str = DEFAULT_CHAT_REPLY,
+        responses: Dict[str, str] = None,
+    ):
+        self.models = models or ["llama3.2"]
+        self.latency = parse_latency(latency)
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bad_json_rate = bad_json_rate
+        self.load_ms = load_ms
+        self.chat_reply = chat_reply
+        self.responses = responses or {}  # プロンプトに含まれる文字列 → 応答本文
+
+        self._slots = threading.BoundedSemaphore(num_parallel)
+        self._lock = threading.Lock()
+        self._loaded = {}  # モデル名 → 解放される時刻（Noneは無期限）
+        self.metrics = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "loads": 0, "by_path": {}}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    # --- 応答の生成 ---
+
+    def _reply_text(self, messages: List[Dict[str, str]], format: str) -> str:
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        for needle, content in self.responses.items():
+            if needle in prompt:
+                return content
+        if format == "json":
+            text = json.dumps(canned_json(messages, OPINION_CATEGORIES), ensure_ascii=False)
+            if random.random() < self.bad_json_rate:
+                text = text[:len(text) // 2]
+            return text
+        return self.chat_reply
+
+    def _load_model(self, model: str, keep_alive) -> float:
+        """ロードが必要ならロード時間（秒）を返し、解放時刻を更新する"""
+        now = time.monotonic()
+        ttl = parse_keep_alive(keep_alive)
+        with self._lock:
+            expires = self._loaded.get(model, 0.0)
+            loaded = model in self._loaded and (expires is None or expires > now)
+            if ttl == 0:
+                self._loaded.pop(model, None)
+            else:
+                self._loaded[model] = None if ttl is None else now + ttl
+            if not loaded:
+                self.metrics["loads"] += 1
+        return 0.0 if loaded else self.load_ms / 1000
+
+    @staticmethod
+    def _split_tokens(text: str) -> List[str]:
+        """応答を2文字ずつのトークンに分割（日本語の1トークン≒1〜2文字）"""
+        return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.metrics[name] += n
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [
+                        {"name": m, "model": m, "modified_at": datetime.now(timezone.utc).isoformat(), "size": 0}
+                        for m in server.models
+                    ]})
+                elif self.path == "/fake/stats":
+                    with server._lock:
+                        self._send_json(200, {**server.metrics, "loaded": sorted(server._loaded)})
+                elif self.path == "/":
+                    self._send_json(200, {"status": "Ollama is running"})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+
+                with server._lock:
+                    server.metrics["requests"] += 1
+                    server.metrics["by_path"][self.path] = server.metrics["by_path"].get(self.path, 0) + 1
+
+                model = request.get("model", "")
+                if model not in server.models:
+                    server._count("errors")
+                    self._send_json(404, {"error": f"model '{model}' not found, try pulling it first"})
+                    return
+                if random.random() < server.error_rate:
+                    server._count("errors")
+                    time.sleep(server.latency())
+                    self._send_json(server.error_status, {"error": "injected error"})
+                    return
+
+                with server._slots:
+                    with server._lock:
+                        server.metrics["in_flight"] += 1
+                        server.metrics["max_in_flight"] = max(server.metrics["max_in_flight"], server.metrics["in_flight"])
+                    try:
+                        self._generate(request)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # クライアントがストリームを途中で閉じた
+                        pass
+                    finally:
+                        server._count("in_flight", -1)
+
+            def _generate(self, request: Dict):
+                is_chat = self.path == "/api/chat"
+                model = request["model"]
+                if is_chat:
+                    messages = request.get("messages") or []
+                else:
+                    messages = [{"role": "user", "content": request.get("prompt", "")}]
+                    if request.get("system"):
+                        messages.insert(0, {"role": "system", "content": request["system"]})
+
+                started = time.perf_counter()
+                load_secs = server._load_model(model, request.get("keep_alive"))
+                prompt_tokens = estimate_messages_tokens(messages)
+                prompt_secs = prompt_tokens / server.prompt_tokens_per_sec if server.prompt_tokens_per_sec else 0.0
+
+                # 空のプロンプトのgenerateはモデルのロードのみ（ウォームアップ）
+                if not is_chat and not request.get("prompt"):
+                    time.sleep(load_secs)
+                    self._send_json(200, self._final(model, is_chat, "", started, load_secs, 0, 0, "load"))
+                    return
+
+                time.sleep(load_secs + server.latency() + prompt_secs)
+
+                text = server._reply_text(messages, request.get("format", ""))
+                num_predict = (request.get("options") or {}).get("num_predict")
+                tokens = server._split_tokens(text)
+                done_reason = "stop"
+                if num_predict and len(tokens) > num_predict:
+                    tokens = tokens[:num_predict]
+                    done_reason = "length"
+                token_secs = 1 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+
+                if request.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(token_secs)
+                        chunk = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": False}
+                        if is_chat:
+                            chunk["message"] = {"role": "assistant", "content": token}
+                        else:
+                            chunk["response"] = token
+                        self._write_chunk(chunk)
+                    self._write_chunk(self._final(model, is_chat, "", started, load_secs, prompt_tokens, len(tokens), done_reason))
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+
+                time.sleep(token_secs * len(tokens))
+                self._send_json(200, self._final(
+                    model, is_chat, "".join(tokens), started, load_secs, prompt_tokens, len(tokens), done_reason
+                ))
+
+            def _write_chunk(self, body: Dict):
+                data = (json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            @staticmethod
+            def _final(model, is_chat, content, started, load_secs, prompt_tokens, eval_count, done_reason) -> Dict:
+                """最終応答（Ollamaと同じ計測値を含む、単位はナノ秒）"""
+                body = {
+                    "model": model,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "done": True,
+                    "done_reason": done_reason,
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "load_duration": int(load_secs * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": eval_count,
+                }
+                if is_chat:
+                    body["message"] = {"role": "assistant", "content": content}
+                else:
+                    body["response"] = content
+                return body
+
+        return Handler
+
+    # --- 起動・停止 ---
+
+    def start(self):
+        """バックグラウンドスレッドで起動（テスト用）"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="負荷試験用のOllama代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--models", default="llama3.2", help="提供するモデル名（カンマ区切り）")
+    parser.add_argument("--latency", default="fixed:0", help="最初のトークンまでの遅延分布（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=20, help="生成速度（0で待ち時間なし）")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=0, help="プロンプト評価速度（0で待ち時間なし）")
+    parser.add_argument("--num-parallel", type=int, default=4, help="同時処理数（超えた分は待たせる）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラー応答の割合")
+    parser.add_argument("--error-status", type=int, default=500, help="エラー応答のHTTPステータス")
+    parser.add_argument("--bad-json-rate", type=float, default=0.0, help="format=jsonで壊れたJSONを返す割合")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="未ロードのモデルのロード時間（ミリ秒）")
+    parser.add_argument("--responses", default=None, help="固定応答のJSONファイル（{プロンプトに含まれる文字列: 応答}）")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+
+    server = FakeOllamaServer(
+        host=args.host,
+        port=args.port,
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        latency=args.latency,
+        tokens_per_sec=args.tokens_per_sec,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        num_parallel=args.num_parallel,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        bad_json_rate=args.bad_json_rate,
+        load_ms=args.load_ms,
+        responses=responses,
+    )
+    print(f"Fake Ollama server listening on {server.url} (models: {', '.join(server.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Webhookの負荷試験
+
+合成ユーザーからのテキスト・友だち追加・ポストバックのイベントを、LINEと同じ形式の
+署名付き（X-Line-Signature）Webhookとして /callback に送り、レイテンシ（p50/p95/p99）と
+イベント/秒を表示します。
+
+応答・プッシュがapi.line.meに届かないよう、アプリは LINE_API_ENDPOINT を
+scripts/fake_line_api.py に、Ollamaは OLLAMA_URL を scripts/fake_ollama_server.py に向けて起動してください。
+テスト用のDBを使用してください（合成ユーザー・意見が登録されます）。
+
+使い方:
+    python scripts/webhook_load_test.py --url http://127.0.0.1:5000/callback --users 5000 --events 20000 --concurrency 32
+    python scripts/webhook_load_test.py --mix text=0.7,follow=0.1,postback=0.2 --duration 60 --json
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import hmac
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, '/home/hirakata_bot1')
+
+from config import LINE_CHANNEL_SECRET
+
+# 対話モードに送られる一般的な意見
+OPINION_TEXTS = [
+    "駅前の駐輪場がいつも満車で困っています",
+    "公園の遊具が古くて子どもを遊ばせるのが心配です",
+    "バスの本数をもう少し増やしてほしいです",
+    "夜道が暗いので街灯を増やしてください",
+    "保育園の空きがなくて仕事に復帰できません",
+    "ゴミの分別ルールが分かりにくいです",
+    "図書館の開館時間を延長してほしい",
+    "市民病院の待ち時間が長すぎます",
+    "はい、平日の朝が特にひどいです",
+    "子どもが小学生なので通学路が気になります",
+]
+# コマンド・投票の入力
+COMMAND_TEXTS = ["アンケート", "投票", "履歴", "設定", "1", "2"]
+# ポストバックのデータ
+POSTBACK_DATA = [
+    "action=register",
+    "action=toggle_notification&value=true",
+    "action=toggle_notification&value=false",
+    "poll:1:1",
+]
+
+
+def sign(body: bytes, channel_secret: str) -> str:
+    """LINEプラットフォームと同じ方式の署名（HMAC-SHA256のBase64）"""
+    digest = hmac.new(channel_secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def make_user_ids(count: int, seed: int = 0) -> List[str]:
+    """合成ユーザーのLINEユーザーID（U + 32桁の16進数）"""
+    rng = random.Random(seed)
+    return ["U" + "".join(rng.choice("0123456789abcdef") for _ in range(32)) for _ in range(count)]
+
+
+def make_event(event_type: str, user_id: str, rng: random.Random, command_rate: float = 0.1) -> Dict:
+    """Webhookイベントを1件生成"""
+    event = {
+        "type": event_type,
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex.upper()[:26],
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+    }
+    if event_type == "message":
+        texts = COMMAND_TEXTS if rng.random() < command_rate else OPINION_TEXTS
+        event["message"] = {
+            "type": "text",
+            "id": str(rng.randint(10 ** 17, 10 ** 18)),
+            "quoteToken": uuid.uuid4().hex,
+            "text": rng.choice(texts),
+        }
+    elif event_type == "follow":
+        event["follow"] = {"isUnblocked": False}
+    elif event_type == "postback":
+        event["postback"] = {"data": rng.choice(POSTBACK_DATA)}
+    return event
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """イベント種別の比率（例: text=0.8,follow=0.1,postback=0.1）"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = "message" if name.strip() == "text" else name.strip()
+        mix[name] = float(weight)
+    return mix
+
+
+def make_body(user_ids: List[str], mix: Dict[str, float], rng: random.Random, events_per_request: int = 1) -> bytes:
+    """署名対象のWebhookボディを生成"""
+    types = rng.choices(list(mix), weights=list(mix.values()), k=events_per_request)
+    events = [make_event(t, rng.choice(user_ids), rng) for t in types]
+    body = {"destination": "U" + "0" * 32, "events": events}
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """p（0-100）パーセンタイル（最近傍順位法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_load_test(
+    url: str,
+    channel_secret: str,
+    users: int = 1000,
+    requests_total: int = 1000,
+    duration: float = None,
+    concurrency: int = 16,
+    mix: Dict[str, float] = None,
+    events_per_request: int = 1,
+    timeout: float = 30,
+    seed: int = 0,
+) -> Dict:
+    """
+    負荷試験を実行
+
+    duration を指定した場合は時間で、指定しない場合は requests_total 件送って終了する。
+
+    Returns:
+        {"requests", "events", "errors", "status_counts", "elapsed_sec", "events_per_sec", "p50_ms", ...}
+    """
+    mix = mix or {"message": 0.8, "follow": 0.1, "postback": 0.1}
+    user_ids = make_user_ids(users, seed)
+    latencies = []
+    status_counts = {}
+    lock = threading.Lock()
+    sent = [0]
+    deadline = time.monotonic() + duration if duration else None
+
+    def next_request() -> bool:
+        with lock:
+            if deadline is None and sent[0] >= requests_total:
+                return False
+            sent[0] += 1
+        return deadline is None or time.monotonic() < deadline
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        while next_request():
+            body = make_body(user_ids, mix, rng, events_per_request)
+            headers = {"Content-Type": "application/json", "X-Line-Signature": sign(body, channel_secret)}
+            started = time.perf_counter()
+            try:
+                response = session.post(url, data=body, headers=headers, timeout=timeout)
+                status = str(response.status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                status_counts[status] = status_counts.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    completed = len(latencies)
+    return {
+        "requests": completed,
+        "events": completed * events_per_request,
+        "errors": sum(n for status, n in status_counts.items() if status != "200"),
+        "status_counts": status_counts,
+        "concurrency": concurrency,
+        "elapsed_sec": elapsed,
+        "events_per_sec": completed * events_per_request / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.mean(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else 0.0,
+    }
+
+
+def print_report(result: Dict):
+    print(f"\nリクエスト数: {result['requests']} （イベント数: {result['events']}、同時実行数: {result['concurrency']}）")
+    print(f"所要時間: {result['elapsed_sec']:.1f}秒 / {result['events_per_sec']:.1f}イベント/秒")
+    print(
+        f"レイテンシ: p50 {result['p50_ms']:.0f}ms / p95 {result['p95_ms']:.0f}ms / "
+        f"p99 {result['p99_ms']:.0f}ms / max {result['max_ms']:.0f}ms"
+    )
+    print(f"ステータス: {result['status_counts']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhookの負荷試験")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/callback", help="WebhookのURL")
+    parser.add_argument("--secret", default=LINE_CHANNEL_SECRET, help="チャネルシークレット（アプリと同じ値）")
+    parser.add_argument("--users", type=int, default=1000, help="合成ユーザー数")
+    parser.add_argument("--events", type=int, default=1000, help="送信するリクエスト数（--duration未指定時）")
+    parser.add_argument("--duration", type=float, default=None, help="送信を続ける秒数")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時送信数")
+    parser.add_argument("--mix", default="text=0.8,follow=0.1,postback=0.1", help="イベント種別の比率")
+    parser.add_argument("--events-per-request", type=int, default=1, help="1リクエストに含めるイベント数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("チャネルシークレットが未設定です（--secret または LINE_CHANNEL_SECRET）")
+
+    print("=== Webhook負荷試験開始 ===")
+    result = run_load_test(
+        args.url,
+        args.secret,
+        users=args.users,
+        requests_total=args.events,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        mix=parse_mix(args.mix),
+        events_per_request=args.events_per_request,
+        seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
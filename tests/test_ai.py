@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from features.ai_analysis import OpinionAnalyzer
 
 # AIモデルのロードをスキップするためのモック（必要に応じて）
@@ -27,3 +28,48 @@ def test_priority_score_low():
     text = "こんにちは。いい天気ですね。"
     score = analyzer.calculate_priority_score(text)
     assert score == 0.2
+
+
+def test_length_buckets():
+    """長さの近いテキストをまとめ、件数・トークン数の上限で区切るテスト"""
+    lengths = [10, 100, 12, 90, 11, 95]
+    batches = OpinionAnalyzer._length_buckets(lengths, max_batch_size=2, token_budget=1000)
+    assert batches == [[0, 4], [2, 3], [5, 1]]
+
+    # パディング後のトークン数（最大長 × 件数）が上限を超えない
+    batches = OpinionAnalyzer._length_buckets(lengths, max_batch_size=32, token_budget=200)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 200 or len(batch) == 1
+
+
+def test_compute_embeddings_order_and_padding(tmp_path):
+    """バケット化しても入力順に、パディング量に依らない同じベクトルが返ることのテスト"""
+    torch = pytest.importorskip("torch")
+    from transformers import BertConfig, BertJapaneseTokenizer, BertModel
+    from features.bert_backend import create_encoder
+
+    chars = list("駅前の駐輪場がいつも満車で困っています公園遊具古子供心配バス本数増街灯夜道暗")
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars), encoding="utf-8")
+    tokenizer = BertJapaneseTokenizer(
+        str(vocab), word_tokenizer_type="basic", subword_tokenizer_type="character"
+    )
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(chars) + 5, hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=160
+    )
+    model = BertModel(config).eval()
+
+    analyzer = OpinionAnalyzer()
+    analyzer.tokenizer = tokenizer
+    analyzer.model = model
+    analyzer.encoder = create_encoder("torch", model, torch.device("cpu"))
+
+    texts = ["駅前の駐輪場がいつも満車で困っています", "公園", "バスの本数", "夜道が暗いので街灯を増", "子供"]
+    bucketed = analyzer.compute_embeddings(texts, batch_size=2, token_budget=16)
+    single = np.stack([analyzer.compute_embeddings([t])[0] for t in texts])
+
+    assert bucketed.shape == (len(texts), 32)
+    np.testing.assert_allclose(bucketed, single, atol=1e-4)
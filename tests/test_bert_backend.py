@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+from transformers import BertConfig, BertModel
+
+from features.bert_backend import create_encoder
+
+# fp32とのコサイン類似度の下限
+MIN_COSINE = 0.99
+
+
+@pytest.fixture
+def tiny_bert():
+    """ランダム初期化した小さなBERT（モデルのダウンロード不要）"""
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=200, hidden_size=64, num_hidden_layers=2, num_attention_heads=4,
+        intermediate_size=128, max_position_embeddings=64
+    )
+    return BertModel(config).eval()
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    input_ids = rng.integers(5, 200, size=(6, 24), dtype=np.int64)
+    attention_mask = np.ones_like(input_ids)
+    attention_mask[3:, 12:] = 0  # パディングを含む
+    return {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": np.zeros_like(input_ids)}
+
+
+def _cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+@pytest.mark.parametrize("backend", ["torch_int8", "onnx"])
+def test_backend_parity_with_fp32(tiny_bert, tmp_path, backend):
+    """各バックエンドのCLSベクトルがfp32と十分一致することのテスト"""
+    if backend == "onnx":
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime")
+    cpu = torch.device("cpu")
+    reference = create_encoder("torch", tiny_bert, cpu)(_inputs())
+
+    encoder = create_encoder(backend, tiny_bert, cpu, onnx_path=str(tmp_path / "tiny.onnx"))
+    assert encoder.name == backend
+    embeddings = encoder(_inputs())
+
+    assert embeddings.shape == reference.shape
+    assert _cosine(embeddings, reference).min() >= MIN_COSINE
+
+
+def test_unknown_backend_is_rejected(tiny_bert):
+    """未定義のバックエンド名はエラーになることのテスト"""
+    with pytest.raises(ValueError):
+        create_encoder("tensorrt", tiny_bert, torch.device("cpu"))
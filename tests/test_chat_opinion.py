@@ -0,0 +1,175 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import database.db_manager as dbm
+import features.chat_opinion as co
+from database.db_manager import Base, User, ChatSession, ChatMessage, Opinion, clear_user_cache
+from utils.session_store import MemorySessionStore
+
+SUMMARY = {"summary": "公園に日陰がほしい", "category": "環境", "emotion_score": 4}
+
+
+class FakeChatClient:
+    """固定の応答を返し、要約はreleaseがセットされるまで待つスタブ"""
+
+    def __init__(self, release=None):
+        self.release = release
+        self.summary_calls = []
+        self.ended_sessions = []
+
+    def is_circuit_open(self):
+        return False
+
+    def chat_mode(self, message, chat_history, session_key=None):
+        return "ご意見ありがとうございます。"
+
+    def end_session(self, session_key):
+        self.ended_sessions.append(session_key)
+
+    def summary_mode(self, chat_history):
+        self.summary_calls.append(list(chat_history))
+        if self.release is not None:
+            self.release.wait(5)
+        return dict(SUMMARY)
+
+
+class RecordingApi:
+    """プッシュ送信を記録するスタブ"""
+
+    def __init__(self):
+        self.pushed = []
+        self.event = threading.Event()
+
+    def push_message(self, request):
+        self.pushed.append(request)
+        self.event.set()
+
+
+@pytest.fixture
+def chat_db(monkeypatch):
+    """get_db()が参照するDBをインメモリSQLiteに、セッションストアをメモリに差し替え"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    original_bind = dbm.SessionLocal.kw["bind"]
+    dbm.SessionLocal.configure(bind=engine)
+    clear_user_cache()
+    store = MemorySessionStore(ttl=600)
+    monkeypatch.setattr(co, "get_session_store", lambda: store)
+    api = RecordingApi()
+    monkeypatch.setattr(co, "get_messaging_api", lambda: api)
+    yield api
+    clear_user_cache()
+    dbm.SessionLocal.configure(bind=original_bind)
+    Base.metadata.drop_all(engine)
+
+
+def _create_session(line_user_id="chat_user", turn_count=0, status="active"):
+    """DBに履歴1往復分のセッションを作成"""
+    with dbm.get_db() as db:
+        user = User(line_user_id=line_user_id, line_user_id_hash=dbm.hash_line_user_id(line_user_id))
+        db.add(user)
+        db.flush()
+        session = ChatSession(user_id=user.id, status=status, turn_count=turn_count)
+        db.add(session)
+        db.flush()
+        db.add(ChatMessage(session_id=session.id, role="user", content="公園が暑い"))
+        db.add(ChatMessage(session_id=session.id, role="assistant", content="どの公園ですか？"))
+        return session.id, user.id
+
+
+def test_load_session_history_uses_store(chat_db):
+    """ストアの履歴がセッションIDとターン数に一致すればDBを読まずに返すことのテスト"""
+    session_id, _ = _create_session(turn_count=1)
+    cached = [{"role": "user", "content": "キャッシュの発言"}]
+
+    with dbm.get_db() as db:
+        session = db.get(ChatSession, session_id)
+        history = co.load_session_history(
+            db, session, {"session_id": session_id, "history": cached, "turn_count": 1}
+        )
+
+    assert history == cached
+    history.append({"role": "user", "content": "追記"})
+    assert len(cached) == 1  # 呼び出し側の追記はストアの値に影響しない
+
+
+def test_load_session_history_falls_back_to_db(chat_db):
+    """ストアに履歴がない場合、またはターン数が一致しない場合はDBから読み込むことのテスト"""
+    session_id, _ = _create_session(turn_count=1)
+    from_db = [
+        {"role": "user", "content": "公園が暑い"},
+        {"role": "assistant", "content": "どの公園ですか？"},
+    ]
+    stale = {"session_id": session_id, "history": [{"role": "user", "content": "古い履歴"}], "turn_count": 0}
+
+    with dbm.get_db() as db:
+        session = db.get(ChatSession, session_id)
+        assert co.load_session_history(db, session, None) == from_db
+        assert co.load_session_history(db, session, {"session_id": session_id}) == from_db
+        assert co.load_session_history(db, session, stale) == from_db
+
+
+def test_final_turn_returns_summary_when_ready(chat_db, monkeypatch):
+    """並行要約が待機時間内に終われば、最終ターンの応答と一緒にお礼を返すことのテスト"""
+    client = FakeChatClient()
+    monkeypatch.setattr(co, "get_ollama_client", lambda: client)
+    monkeypatch.setattr(co, "CHAT_SUMMARY_MODE", "inline")
+    monkeypatch.setattr(co, "CHAT_PARALLEL_SUMMARY", True)
+    session_id, user_id = _create_session(turn_count=co.MAX_CHAT_TURNS - 1)
+
+    replies = co.handle_chat_message("chat_user", "木陰のベンチがほしい")
+
+    assert replies[0].text == "ご意見ありがとうございます。"
+    assert SUMMARY["summary"] in replies[1].text
+    assert client.summary_calls[0][-1] == {"role": "user", "content": "木陰のベンチがほしい"}
+    assert client.ended_sessions == [str(session_id)]
+    assert chat_db.pushed == []
+    with dbm.get_db() as db:
+        assert db.get(ChatSession, session_id).status == "completed"
+        assert db.query(Opinion).one().category == "環境"
+        assert db.get(User, user_id).total_points == co.POINT_CHAT_OPINION
+
+
+def test_final_turn_pushes_late_summary(chat_db, monkeypatch):
+    """並行要約が待機時間を超えた場合は応答だけ返し、完了後にプッシュで通知することのテスト"""
+    release = threading.Event()
+    client = FakeChatClient(release=release)
+    monkeypatch.setattr(co, "get_ollama_client", lambda: client)
+    monkeypatch.setattr(co, "CHAT_SUMMARY_MODE", "inline")
+    monkeypatch.setattr(co, "CHAT_PARALLEL_SUMMARY", True)
+    monkeypatch.setattr(co, "CHAT_SUMMARY_WAIT", 0.05)
+    session_id, user_id = _create_session(turn_count=co.MAX_CHAT_TURNS - 1)
+
+    replies = co.handle_chat_message("chat_user", "木陰のベンチがほしい")
+
+    assert [r.text for r in replies] == ["ご意見ありがとうございます。", co.SUMMARY_PENDING_TEXT]
+    with dbm.get_db() as db:
+        assert db.get(ChatSession, session_id).status == "summarizing"
+    assert co.get_active_session("chat_user") is None
+
+    release.set()
+    assert chat_db.event.wait(5)
+
+    request = chat_db.pushed[0]
+    assert request.to == "chat_user"
+    assert SUMMARY["summary"] in request.messages[0].text
+    with dbm.get_db() as db:
+        assert db.get(ChatSession, session_id).status == "completed"
+        assert db.get(User, user_id).total_points == co.POINT_CHAT_OPINION
+
+
+def test_late_summary_skipped_when_session_finished(chat_db):
+    """要約の完了時にセッションが要約待ちでなくなっていれば何もしないことのテスト"""
+    session_id, user_id = _create_session(status="completed")
+    future = Future()
+    future.set_result(dict(SUMMARY))
+
+    co._complete_late_summary(future, "chat_user", session_id, user_id)
+
+    assert chat_db.pushed == []
+    with dbm.get_db() as db:
+        assert db.query(Opinion).count() == 0
@@ -0,0 +1,65 @@
+import time
+import pytest
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from ollama_client import OllamaClient
+
+
+def test_breaker_opens_and_probes():
+    """連続失敗でopen、一定時間後に1件だけ試行を許可し、成功でclosedに戻ることのテスト"""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.2)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert breaker.is_open()
+
+    time.sleep(0.25)
+    assert not breaker.is_open()
+    assert breaker.allow_request()  # プローブ
+    assert not breaker.allow_request()  # プローブ中は他を拒否
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens():
+    """プローブが失敗すると再びopenになることのテスト"""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+class FailingClient:
+    """接続エラーを返すOllamaクライアントのスタブ"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        raise ConnectionError("connection refused")
+
+
+def test_client_fails_fast_when_open():
+    """サーキットがopenになった後はOllamaを呼ばずに失敗することのテスト"""
+    client = OllamaClient()
+    backend = client.pool.backends[0]
+    backend.client = FailingClient()
+    backend.breaker.failure_threshold = 2
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.chat([{"role": "user", "content": "test"}])
+
+    assert client.is_circuit_open()
+    with pytest.raises(CircuitOpenError):
+        client.chat([{"role": "user", "content": "test"}])
+    assert backend.client.calls == 2
+    assert client.summary_mode([{"role": "user", "content": "test"}]) is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.datasets import make_blobs
+from sklearn.metrics import silhouette_score
+
+from features.clustering import (
+    choose_k,
+    cluster_embeddings,
+    pairwise_distances,
+    silhouette_from_distances,
+)
+
+
+def test_silhouette_matches_sklearn():
+    """行列演算によるシルエット係数がsklearnと一致することのテスト"""
+    X, _ = make_blobs(n_samples=300, centers=3, n_features=8, random_state=0)
+    labels = np.random.default_rng(0).integers(0, 4, size=len(X))
+    labels[0] = 9  # 1件だけのクラスタ
+
+    score = silhouette_from_distances(pairwise_distances(X), labels)
+
+    assert score == pytest.approx(silhouette_score(X, labels), abs=1e-6)
+
+
+def test_choose_k_finds_separated_clusters():
+    """十分に離れたクラスタの数が自動選択されることのテスト"""
+    X, _ = make_blobs(n_samples=3000, centers=4, n_features=16, cluster_std=0.5, random_state=1)
+
+    k, scores = choose_k(X.astype(np.float32), k_min=2, k_max=8, sample_size=500)
+
+    assert k == 4
+    assert sorted(scores) == list(range(2, 9))
+
+
+def test_cluster_embeddings_large_input():
+    """件数が多い場合はPCA・MiniBatchKMeans・PCAの2次元座標を使うことのテスト"""
+    X, y = make_blobs(n_samples=6000, centers=3, n_features=64, cluster_std=1.0, random_state=2)
+
+    result = cluster_embeddings(X, n_clusters="auto")
+
+    assert result["algorithm"] == "minibatch_kmeans"
+    assert result["n_clusters"] == 3
+    assert result["dim"] == 50
+    assert result["coords"].shape == (6000, 2)
+    assert len(set(zip(result["labels"], y))) == 3  # 元のクラスタと1対1に対応
+    assert set(result["timings"]) == {"pca", "k_selection", "clustering", "projection"}
+
+
+def test_cluster_embeddings_fixed_k_small_input():
+    """クラスタ数を指定した少数データはKMeansで分類することのテスト"""
+    X, _ = make_blobs(n_samples=20, centers=2, n_features=32, random_state=3)
+
+    result = cluster_embeddings(X, n_clusters=3)
+
+    assert result["algorithm"] == "kmeans"
+    assert result["n_clusters"] == 3
+    assert result["k_scores"] == {}
+    assert result["coords"].shape == (20, 2)
@@ -0,0 +1,19 @@
+import logging
+
+from config import _json_env
+
+
+def test_json_env_falls_back_on_invalid_value(monkeypatch, caplog):
+    """JSONオブジェクトでない値は警告して空の辞書になることのテスト"""
+    monkeypatch.setenv("OLLAMA_TEST_OPTIONS", '{"num_ctx": 4096}')
+    assert _json_env("OLLAMA_TEST_OPTIONS") == {"num_ctx": 4096}
+
+    monkeypatch.delenv("OLLAMA_TEST_OPTIONS")
+    assert _json_env("OLLAMA_TEST_OPTIONS") == {}
+
+    with caplog.at_level(logging.WARNING):
+        for invalid in ["{num_ctx: 4096}", "[4096]"]:
+            monkeypatch.setenv("OLLAMA_TEST_OPTIONS", invalid)
+            assert _json_env("OLLAMA_TEST_OPTIONS") == {}
+    assert len(caplog.records) == 2
+    assert all("OLLAMA_TEST_OPTIONS" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,41 @@
+from utils.context_window import ContextSizer, estimate_tokens, estimate_messages_tokens
+from ollama_client import OllamaClient, build_chat_messages, CHAT_OPTIONS
+
+
+def test_estimate_tokens_japanese_and_ascii():
+    """日本語は1文字≒1トークン強、英数字は数文字で1トークンと見積もることのテスト"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("あ" * 100) >= 100
+    assert estimate_tokens("a" * 100) < 40
+    assert estimate_messages_tokens([{"role": "user", "content": "こんにちは"}]) > estimate_tokens("こんにちは")
+
+
+def test_sizer_picks_smallest_bucket_and_sticks():
+    """収まる最小のバケットを選び、直前の大きいバケットは使い続けることのテスト"""
+    sizer = ContextSizer([1024, 2048, 4096], sticky_seconds=60)
+    short = [{"role": "user", "content": "短い質問です"}]
+    long = [{"role": "user", "content": "あ" * 1200}]
+
+    assert sizer.select("m", short, num_predict=300) == 1024
+    assert sizer.select("m", long, num_predict=300) == 2048
+    assert sizer.select("m", short, num_predict=300) == 2048  # 再ロードを避けて据え置き
+    assert sizer.select("other", short, num_predict=300) == 1024  # モデルごとに管理
+    assert sizer.select("m", [{"role": "user", "content": "あ" * 10000}]) == 4096
+    assert sizer.stats()["overflows"] == 1
+
+    sizer.sticky_seconds = 0
+    assert sizer.select("m", short, num_predict=300) == 1024
+
+
+def test_chat_prompt_gets_small_context():
+    """5往復程度の対話ではnum_ctxを8192より小さくすることのテスト"""
+    client = OllamaClient()
+    client.context_sizer = ContextSizer([1024, 2048, 4096, 8192], sticky_seconds=0)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": "公園の遊具が古くて心配です。"} for i in range(10)]
+    messages = build_chat_messages(history)
+
+    options = client.fit_context("chat", "llama3.2", messages, CHAT_OPTIONS)
+
+    assert options["num_ctx"] < 8192
+    assert CHAT_OPTIONS["num_ctx"] == 8192  # 既定オプションは変更しない
+    assert client.fit_context("classify", "llama3.2", messages, {"num_predict": 100}) == {"num_predict": 100}
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from features.embedding_service import (
+    EmbeddingServiceServer,
+    EmbeddingServiceClient,
+    EmbeddingServiceError,
+)
+
+
+class _TextLengthAnalyzer:
+    """テキストの長さと先頭文字のコードをベクトルとして返す分析器（モデル不要）"""
+
+    embedding_key = "test-model@cls-128"
+    backend = "torch"
+
+    def __init__(self):
+        self.calls = []
+
+    def _load_model(self):
+        pass
+
+    def compute_embeddings(self, texts):
+        self.calls.append(len(texts))
+        return np.array([[len(t), ord(t[0]), 0.5] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def service():
+    analyzer = _TextLengthAnalyzer()
+    server = EmbeddingServiceServer(analyzer, port=0, max_batch=64, max_wait_ms=100)
+    server.load_model()
+    server.start()
+    yield server, analyzer
+    server.stop()
+
+
+def test_embed_returns_vectors_in_order(service):
+    """チャンクに分けて送っても入力順のベクトルが返ることのテスト"""
+    server, _ = service
+    client = EmbeddingServiceClient(server.url, chunk_size=3)
+    texts = ["あ", "いい", "ううう", "え", "おおおおお", "か", "きき"]
+    progress = []
+
+    vectors = client.embed(texts, progress_callback=lambda p, m: progress.append(p))
+
+    assert vectors.shape == (len(texts), 3)
+    assert vectors[:, 0].tolist() == [len(t) for t in texts]
+    assert vectors[:, 1].tolist() == [ord(t[0]) for t in texts]
+    assert progress == [30, 43, 56]
+    assert client.embedding_key == "test-model@cls-128"
+
+
+def test_concurrent_requests_are_batched(service):
+    """複数の呼び出し元からの依頼がまとめて計算されることのテスト"""
+    server, analyzer = service
+    results = {}
+
+    def call(i):
+        client = EmbeddingServiceClient(server.url)
+        results[i] = client.embed([chr(0x3042 + i)] * (i + 1))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for i in range(8):
+        assert results[i].shape == (i + 1, 3)
+        assert (results[i][:, 1] == 0x3042 + i).all()
+    metrics = EmbeddingServiceClient(server.url).metrics()
+    assert metrics["status"] == "ok"
+    assert metrics["queue"]["requests"] == 8
+    assert metrics["queue"]["batches"] < 8
+    assert sum(analyzer.calls) == sum(range(1, 9))
+
+
+def test_unavailable_service_raises():
+    """サービスに接続できない場合はEmbeddingServiceErrorになることのテスト"""
+    client = EmbeddingServiceClient("http://127.0.0.1:9", timeout=1)
+    with pytest.raises(EmbeddingServiceError):
+        client.embed(["テスト"])
+
+
+def test_analyzer_uses_service_without_loading_model(service):
+    """サービスが設定されていればOpinionAnalyzerがモデルをロードせずに計算を依頼することのテスト"""
+    from features.ai_analysis import OpinionAnalyzer
+
+    server, _ = service
+    analyzer = OpinionAnalyzer(use_service=False)
+    analyzer.service = EmbeddingServiceClient(server.url)
+
+    vectors = analyzer.compute_embeddings(["駅前", "公園の遊具"])
+
+    assert vectors[:, 0].tolist() == [2, 5]
+    assert analyzer.model is None
+    assert analyzer.embedding_key == "test-model@cls-128"
+
+
+def test_analyzer_returns_to_service_after_recovery(tmp_path, monkeypatch):
+    """サービス停止中はプロセス内で計算し、待機時間後に復旧したサービスへ戻ることのテスト"""
+    torch = pytest.importorskip("torch")
+    import features.ai_analysis as ai_analysis
+    from transformers import BertConfig, BertJapaneseTokenizer, BertModel
+    from features.bert_backend import create_encoder
+
+    chars = list("駅前公園の遊具")
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars), encoding="utf-8")
+
+    def load_tiny_model(progress_callback=None):
+        """モデルのダウンロードの代わりに小さなBERTをロード"""
+        if analyzer.model is not None:
+            return
+        analyzer.tokenizer = BertJapaneseTokenizer(str(vocab), word_tokenizer_type="basic", subword_tokenizer_type="character")
+        config = BertConfig(vocab_size=len(chars) + 5, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32)
+        analyzer.model = BertModel(config).eval()
+        analyzer.encoder = create_encoder("torch", analyzer.model, torch.device("cpu"))
+
+    monkeypatch.setattr(ai_analysis, "EMBEDDING_SERVICE_RETRY_SECONDS", 0.3)
+    analyzer = ai_analysis.OpinionAnalyzer(use_service=False)
+    monkeypatch.setattr(analyzer, "_load_model", load_tiny_model)
+
+    service_analyzer = _TextLengthAnalyzer()
+    # ポートだけ確保して閉じる（サービス停止中）
+    stopped = EmbeddingServiceServer(service_analyzer, port=0, max_wait_ms=1)
+    port = stopped.httpd.server_address[1]
+    analyzer.service = EmbeddingServiceClient(stopped.url, timeout=2)
+    stopped.httpd.server_close()
+
+    # サービス停止中: プロセス内で計算し、縮退状態になる
+    assert analyzer.compute_embeddings(["駅前"]).shape == (1, 16)
+    status = analyzer.service_status()
+    assert status["mode"] == "fallback"
+    assert status["fallbacks"] == 1
+    assert status["local_model_loaded"] is True
+
+    server = EmbeddingServiceServer(service_analyzer, port=port, max_wait_ms=1).start()
+    try:
+        # 待機時間中はサービスに問い合わせない
+        assert analyzer.compute_embeddings(["公園"]).shape == (1, 16)
+        assert service_analyzer.calls == []
+
+        time.sleep(0.35)
+        vectors = analyzer.compute_embeddings(["公園の遊具"])
+        assert vectors[:, 0].tolist() == [5]
+        assert service_analyzer.calls == [1]
+        status = analyzer.service_status()
+        assert status["mode"] == "service"
+        assert status["last_error"] is None
+        assert status["local_model_loaded"] is False
+    finally:
+        server.stop()
@@ -0,0 +1,146 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+import database.db_manager as dbm
+from database.db_manager import Base, Opinion, OpinionEmbedding
+from features.embedding_store import get_or_compute_embeddings, embed_pending, save_embeddings
+
+
+class FakeAnalyzer:
+    """本文の長さから決まるベクトルを返し、計算した本文を記録するスタブ"""
+
+    embedding_key = "fake-model@cls-128"
+
+    def __init__(self):
+        self.computed = []
+
+    def compute_embeddings(self, texts, progress_callback=None):
+        self.computed.extend(texts)
+        return np.array([[len(t), 1.0, 0.5] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def store_db():
+    """get_db()が参照するDBをインメモリSQLiteに差し替え"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    original_bind = dbm.SessionLocal.kw["bind"]
+    dbm.SessionLocal.configure(bind=engine)
+    with dbm.get_db() as db:
+        for text in ["バスが少ない", "公園の遊具が古い", "街灯を増やしてほしい"]:
+            db.add(Opinion(source_type="chat", content=text))
+        db.commit()
+    yield
+    dbm.SessionLocal.configure(bind=original_bind)
+    Base.metadata.drop_all(engine)
+
+
+def _opinions():
+    with dbm.get_db() as db:
+        return [{"id": op.id, "text": op.content} for op in db.query(Opinion).order_by(Opinion.id)]
+
+
+def test_embeddings_are_reused_and_recomputed_after_edit(store_db):
+    """保存済みのベクトルは再利用し、編集された意見だけ再計算することのテスト"""
+    analyzer = FakeAnalyzer()
+    opinions = _opinions()
+
+    first = get_or_compute_embeddings(analyzer, opinions)
+    assert first.shape == (3, 3)
+    assert len(analyzer.computed) == 3
+
+    analyzer.computed.clear()
+    second = get_or_compute_embeddings(analyzer, list(reversed(opinions)))
+    assert analyzer.computed == []
+    assert np.array_equal(second, first[::-1])  # 入力順で返す
+
+    with dbm.get_db() as db:
+        db.query(Opinion).filter(Opinion.id == opinions[0]["id"]).update({"content": "バスの本数が少なくて不便"})
+        db.commit()
+    opinions[0]["text"] = "バスの本数が少なくて不便"
+    third = get_or_compute_embeddings(analyzer, opinions)
+    assert analyzer.computed == ["バスの本数が少なくて不便"]
+    assert third[0][0] == len("バスの本数が少なくて不便")
+
+    with dbm.get_db() as db:
+        row = db.query(OpinionEmbedding).filter(OpinionEmbedding.opinion_id == opinions[0]["id"]).one()
+        assert len(row.vector) == 3 * 2  # float16
+
+
+def test_embed_pending_computes_only_new_opinions(store_db):
+    """事前計算は未計算の意見だけを計算することのテスト"""
+    analyzer = FakeAnalyzer()
+    assert embed_pending(analyzer)[:2] == (3, 3)
+
+    with dbm.get_db() as db:
+        db.add(Opinion(source_type="survey", content="保育園を増やしてほしい"))
+        db.commit()
+
+    analyzer.computed.clear()
+    assert embed_pending(analyzer)[:2] == (1, 1)
+    assert analyzer.computed == ["保育園を増やしてほしい"]
+    assert embed_pending(analyzer) == (0, 0, 0)
+
+
+
+class FallbackAnalyzer(FakeAnalyzer):
+    """計算時にバックエンドが切り替わり、識別子が変わるスタブ（int8が使えない場合など）"""
+
+    embedding_key = "fake-model@cls-128+int8"
+
+    def compute_embeddings(self, texts, progress_callback=None):
+        self.embedding_key = "fake-model@cls-128"
+        return super().compute_embeddings(texts, progress_callback)
+
+
+def test_embed_pending_saves_under_key_after_compute(store_db):
+    """計算中に識別子が変わった場合は計算後の識別子で保存することのテスト"""
+    analyzer = FallbackAnalyzer()
+    assert embed_pending(analyzer)[:2] == (3, 3)
+
+    with dbm.get_db() as db:
+        assert {row.model_name for row in db.query(OpinionEmbedding)} == {"fake-model@cls-128"}
+
+def test_embed_pending_pages_past_metadata_only_updates(store_db):
+    """本文が変わらず更新日時だけ変わった意見のページがあっても、後続の新しい意見まで計算することのテスト"""
+    analyzer = FakeAnalyzer()
+    embed_pending(analyzer)
+    with dbm.get_db() as db:
+        # 分類・優先度の更新など（本文は同じ）
+        db.query(Opinion).update({"updated_at": datetime.utcnow()})
+        db.add(Opinion(source_type="chat", content="図書館の開館時間を延長してほしい"))
+        db.commit()
+
+    analyzer.computed.clear()
+    examined, done, after_id = embed_pending(analyzer, limit=2)
+    assert (examined, done) == (2, 0)
+
+    examined, done, after_id = embed_pending(analyzer, limit=2, after_id=after_id)
+    assert (examined, done) == (2, 1)
+    assert analyzer.computed == ["図書館の開館時間を延長してほしい"]
+    assert embed_pending(analyzer, limit=2, after_id=after_id)[0] == 0
+    assert embed_pending(analyzer)[0] == 0  # 計算日時を更新したため次回は対象外
+
+
+def test_save_embeddings_retries_on_concurrent_insert(store_db):
+    """同じ意見のベクトルが同時に保存されて一意制約に違反しても置き換えて保存することのテスト"""
+    opinion = _opinions()[0]
+    vector = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+
+    with dbm.get_db() as db:
+        def insert_concurrently(session, flush_context, instances):
+            # 既存行の確認後・保存前に別のプロセスが保存した状況を再現
+            with dbm.get_db() as other:
+                save_embeddings(other, [(opinion["id"], opinion["text"], vector * 0)], "fake-model@cls-128")
+
+        event.listen(db, "before_flush", insert_concurrently, once=True)
+        assert save_embeddings(db, [(opinion["id"], opinion["text"], vector)], "fake-model@cls-128") == 1
+
+    with dbm.get_db() as db:
+        rows = db.query(OpinionEmbedding).all()
+        assert len(rows) == 1
+        assert np.frombuffer(rows[0].vector, dtype=np.float16).tolist() == [1.0, 2.0, 3.0]
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from utils.event_queue import OrderedEventDispatcher
+
+
+def test_events_processed_in_order_per_user():
+    """同一ユーザーのイベントが投入順に処理されることのテスト"""
+    processed = {"user_a": [], "user_b": []}
+    lock = threading.Lock()
+
+    def handle(event):
+        user, seq = event
+        time.sleep(0.001)
+        with lock:
+            processed[user].append(seq)
+
+    dispatcher = OrderedEventDispatcher(handle, num_workers=4, queue_size=100)
+    for i in range(20):
+        assert dispatcher.submit("user_a", ("user_a", i))
+        assert dispatcher.submit("user_b", ("user_b", i))
+
+    dispatcher.shutdown(timeout=5)
+
+    assert processed["user_a"] == list(range(20))
+    assert processed["user_b"] == list(range(20))
+
+
+def test_submit_rejected_when_queue_full():
+    """キューが満杯の場合は投入を拒否することのテスト"""
+    release = threading.Event()
+    dispatcher = OrderedEventDispatcher(lambda e: release.wait(5), num_workers=1, queue_size=1)
+
+    results = [dispatcher.submit("user", i, timeout=0.05) for i in range(5)]
+    release.set()
+    dispatcher.shutdown(timeout=5)
+
+    assert results[0] is True
+    assert False in results
+    assert dispatcher.stats()["rejected"] >= 1
+
+
+def test_submit_all_is_all_or_nothing():
+    """全件分の空きがない場合は1件も投入しないことのテスト"""
+    release = threading.Event()
+    dispatcher = OrderedEventDispatcher(lambda e: release.wait(5), num_workers=1, queue_size=3)
+
+    # 1件目は処理中、2件目はキューで待機（空きは2件）
+    assert dispatcher.submit("user", 0)
+    time.sleep(0.05)
+    assert dispatcher.submit("user", 1)
+
+    assert dispatcher.submit_all([("user", 2), ("user", 3), ("user", 4)], timeout=0.05) is False
+    assert dispatcher.stats()["queue_depth"] == 1
+    assert dispatcher.submit_all([("user", 2), ("user", 3)], timeout=0.05) is True
+
+    release.set()
+    dispatcher.shutdown(timeout=5)
+    assert dispatcher.stats()["rejected"] == 3
+
+
+def test_callback_rejects_whole_body_when_queue_fills(client, monkeypatch):
+    """キューが途中で満杯になるWebhookは503を返し、どのイベントも投入しないことのテスト"""
+    import random
+    import app as app_module
+    from scripts.webhook_load_test import make_event, sign
+
+    processed = []
+    release = threading.Event()
+
+    def handle(event):
+        release.wait(5)
+        processed.append(event)
+
+    # 1件は処理中、2件はキューで待機（空きは2件）
+    dispatcher = OrderedEventDispatcher(handle, num_workers=1, queue_size=4)
+    assert dispatcher.submit("other", "queued-0")
+    time.sleep(0.05)
+    assert dispatcher.submit("other", "queued-1")
+    assert dispatcher.submit("other", "queued-2")
+    monkeypatch.setattr(app_module, "WEBHOOK_ASYNC", True)
+    monkeypatch.setattr(app_module, "event_dispatcher", dispatcher)
+
+    rng = random.Random(0)
+    events = [make_event("follow", "U" + "1" * 32, rng) for _ in range(3)]
+    body = json.dumps({"destination": "U" + "0" * 32, "events": events}).encode("utf-8")
+    headers = {"Content-Type": "application/json", "X-Line-Signature": sign(body, "")}
+
+    response = client.post("/callback", data=body, headers=headers)
+
+    release.set()
+    dispatcher.shutdown(timeout=5)
+    assert response.status_code == 503
+    assert processed == ["queued-0", "queued-1", "queued-2"]
@@ -0,0 +1,49 @@
+import pytest
+from scripts.fake_ollama_server import FakeOllamaServer, parse_keep_alive
+from ollama_client import OllamaClient
+from utils.ollama_pool import OllamaBackendPool
+
+
+@pytest.fixture
+def fake_ollama():
+    server = FakeOllamaServer(port=0, tokens_per_sec=0, load_ms=50).start()
+    yield server
+    server.stop()
+
+
+def _client_for(server):
+    client = OllamaClient()
+    client.pool = OllamaBackendPool([server.url], timeout=5)
+    return client
+
+
+def test_client_modes_against_fake_server(fake_ollama):
+    """代替サーバーに対して対話（ストリーミング）・要約・分類・死活確認が動作することのテスト"""
+    client = _client_for(fake_ollama)
+
+    assert client.is_available()
+    text, stats = client.stream_chat([{"role": "user", "content": "公園について"}], {}, char_budget=150)
+    assert text.startswith("ご意見ありがとうございます")
+    assert stats["tokens"] > 1
+
+    summary = client.summary_mode([{"role": "user", "content": "バスの本数を増やしてほしい"}], use_cache=False)
+    assert summary["summary"] and 0 <= summary["emotion_score"] <= 10
+
+    results = client.classify_opinions(["バスが少ない", "保育園が足りない", "道が暗い"], use_cache=False)
+    assert all(r is not None for r in results)
+
+
+def test_fake_server_loads_and_errors(fake_ollama):
+    """未ロードのモデルはロード時間を返し、エラー注入ではHTTPエラーになることのテスト"""
+    client = _client_for(fake_ollama)
+    ollama_client = client.pool.backends[0].client
+
+    first = ollama_client.generate(model="llama3.2", prompt="", keep_alive="5m")
+    second = ollama_client.generate(model="llama3.2", prompt="", keep_alive="5m")
+    assert first["load_duration"] >= 50e6
+    assert second["load_duration"] == 0
+
+    fake_ollama.error_rate = 1.0
+    with pytest.raises(Exception):
+        ollama_client.chat(model="llama3.2", messages=[{"role": "user", "content": "test"}])
+    assert parse_keep_alive("30m") == 1800 and parse_keep_alive("-1") is None
@@ -0,0 +1,22 @@
+from utils import line_api
+
+
+def test_messaging_api_is_shared_per_process(monkeypatch):
+    """同じプロセス内では共有クライアントを再利用し、PIDが変わると作り直すことのテスト"""
+    line_api.close_messaging_api()
+    try:
+        api = line_api.get_messaging_api()
+        blob = line_api.get_messaging_api_blob()
+        assert line_api.get_messaging_api() is api
+        assert blob.api_client is api.api_client
+
+        # fork後の子プロセス相当
+        monkeypatch.setattr(line_api.os, "getpid", lambda: -1)
+        forked = line_api.get_messaging_api()
+        assert forked is not api
+        assert forked.api_client is not api.api_client
+        assert line_api.get_messaging_api() is forked
+        assert line_api.get_messaging_api_blob().api_client is forked.api_client
+    finally:
+        monkeypatch.undo()
+        line_api.close_messaging_api()
@@ -0,0 +1,83 @@
+import time
+import ollama_client
+from ollama_client import OllamaClient
+from utils.llm_cache import LLMCache, llm_cache_disabled
+
+
+class CountingClient:
+    """呼び出し回数を数え、固定の応答を返すスタブ"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        return {"message": {"role": "assistant", "content": self.content}, "done": True}
+
+
+def test_cache_lru_and_ttl(tmp_path):
+    """件数上限で参照の古いものから削除され、TTLを過ぎると無効になることのテスト"""
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2)
+    cache.set("a", "m", "A")
+    time.sleep(0.01)
+    cache.set("b", "m", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"  # aを参照 → bが最も古い
+    cache.set("c", "m", "C")
+    cache.sweep()
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+
+
+def test_cache_sweep_counts_evictions(tmp_path):
+    """SWEEP_INTERVAL回の書き込みごとに上限超過分が削除され、件数が記録されることのテスト"""
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=3)
+    cache.SWEEP_INTERVAL = 5
+    for i in range(5):
+        cache.set(f"k{i}", "m", str(i))
+
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 2
+    assert (tmp_path / "cache.sqlite3").stat().st_mode & 0o777 == 0o600
+
+def test_client_uses_cache_for_classify(tmp_path, monkeypatch):
+    """同じ意見の再分類はOllamaを呼ばず、use_cache=Falseや無効化範囲では呼ぶことのテスト"""
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(ollama_client, "get_llm_cache", lambda: cache)
+    client = OllamaClient()
+    fake = CountingClient('{"category": "交通", "emotion_score": 6}')
+    client.pool.backends[0].client = fake
+
+    first = client.classify_opinion("バスの本数を増やしてほしい")
+    second = client.classify_opinion("バスの本数を増やしてほしい")
+    assert first == second == {"category": "交通", "emotion_score": 6}
+    assert fake.calls == 1
+
+    client.classify_opinion("バスの本数を増やしてほしい", use_cache=False)
+    with llm_cache_disabled():
+        client.classify_opinion("バスの本数を増やしてほしい")
+    assert fake.calls == 3
+
+
+def test_invalid_json_is_not_cached(tmp_path, monkeypatch):
+    """壊れたJSON応答はキャッシュせず、次回は再度問い合わせることのテスト"""
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(ollama_client, "get_llm_cache", lambda: cache)
+    client = OllamaClient()
+    fake = CountingClient('{"category": "交通"')
+    client.pool.backends[0].client = fake
+
+    assert client.classify_opinion("意見") is None
+    assert client.classify_opinion("意見") is None
+    assert fake.calls == 2
+    assert len(cache) == 0
@@ -0,0 +1,111 @@
+import os
+import multiprocessing
+import pytest
+from utils.llm_governor import LLMGovernor, LLMQueueTimeout
+
+
+def _hold_slot(lock_dir, ready, release):
+    """別プロセスで実行枠を1つ占有する"""
+    governor = LLMGovernor(1, lock_dir, wait_timeout=1)
+    with governor.slot():
+        ready.set()
+        release.wait(5)
+
+
+def test_slot_limit_across_processes(tmp_path):
+    """別プロセスが枠を占有している間は待機し、上限時間で失敗することのテスト"""
+    lock_dir = str(tmp_path)
+    ready = multiprocessing.Event()
+    release = multiprocessing.Event()
+    holder = multiprocessing.Process(target=_hold_slot, args=(lock_dir, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(5)
+        governor = LLMGovernor(1, lock_dir, wait_timeout=0.2)
+        with pytest.raises(LLMQueueTimeout):
+            with governor.slot():
+                pass
+        assert governor.stats()["priorities"]["interactive"]["timeouts"] == 1
+    finally:
+        release.set()
+        holder.join(5)
+
+    with governor.slot() as wait_ms:
+        assert wait_ms < 1000
+    assert governor.stats()["priorities"]["interactive"]["acquired"] == 1
+
+
+def test_queue_depth_ignores_dead_waiters(tmp_path):
+    """待機者ファイルのうちロックされていない残骸は数えず削除することのテスト"""
+    governor = LLMGovernor(2, str(tmp_path), wait_timeout=1)
+
+    stale = os.path.join(governor.waiting_dir, "stale")
+    open(stale, "w").close()
+    live_path, live_fd = governor._register_waiter()
+
+    assert governor.queue_depth() == 1
+    assert not os.path.exists(stale)
+
+    governor._unregister_waiter(live_path, live_fd)
+    assert governor.queue_depth() == 0
+
+
+def test_bulk_yields_to_interactive(tmp_path):
+    """対話応答の待機者がいる間はbulkが枠を取らず、予約枠も使わないことのテスト"""
+    governor = LLMGovernor(2, str(tmp_path), wait_timeout=0.2, reserved_slots=1)
+
+    # bulkは予約枠（slot-0）以外しか使えない
+    with governor.slot(priority="bulk"):
+        with pytest.raises(LLMQueueTimeout):
+            with governor.slot(priority="bulk"):
+                pass
+        with governor.slot(priority="interactive"):
+            pass
+
+    # 対話応答の待機者がいる間は空き枠があってもbulkは待つ
+    waiter = governor._register_waiter(rank=0)
+    try:
+        with pytest.raises(LLMQueueTimeout):
+            with governor.slot(priority="bulk"):
+                pass
+    finally:
+        governor._unregister_waiter(*waiter)
+    with governor.slot(priority="bulk"):
+        pass
+
+
+def test_registering_waiter_is_not_reaped(tmp_path):
+    """ロック取得前の一時名の待機者ファイルは残骸とみなさず、登録後は本来の名前だけが残ることのテスト"""
+    governor = LLMGovernor(1, str(tmp_path), wait_timeout=1)
+
+    registering = os.path.join(governor.waiting_dir, ".0-registering")
+    open(registering, "w").close()
+    waiter = governor._register_waiter(rank=0)
+    try:
+        assert governor.queue_depth() == 1
+        assert os.path.exists(registering)
+        assert sorted(os.listdir(governor.waiting_dir)) == sorted([".0-registering", os.path.basename(waiter[0])])
+    finally:
+        governor._unregister_waiter(*waiter)
+    assert governor.queue_depth() == 0
+
+
+def test_waiter_scan_is_shared_within_poll_interval(tmp_path, monkeypatch):
+    """優先度確認のための待機者一覧の走査はPOLL_INTERVALにつき1回であることのテスト"""
+    governor = LLMGovernor(1, str(tmp_path), wait_timeout=1)
+    governor.POLL_INTERVAL = 60
+    scans = []
+    original_scan = governor._scan_waiters
+    monkeypatch.setattr(governor, "_scan_waiters", lambda: scans.append(1) or original_scan())
+
+    waiter = governor._register_waiter(rank=0)
+    try:
+        for _ in range(20):
+            assert governor._has_higher_waiters(2)
+        assert len(scans) == 1
+    finally:
+        governor._unregister_waiter(*waiter)
+
+    # 自プロセスの待機者の増減後は走査し直す
+    assert not governor._has_higher_waiters(2)
+    assert len(scans) == 2
@@ -0,0 +1,91 @@
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from linebot.v3 import WebhookParser
+from linebot.v3.messaging import (
+    Configuration,
+    ApiClient,
+    MessagingApi,
+    PushMessageRequest,
+    ReplyMessageRequest,
+    TextMessage,
+)
+from linebot.v3.messaging.exceptions import ApiException
+from linebot.v3.webhooks import MessageEvent, FollowEvent, PostbackEvent
+
+from scripts.fake_line_api import FakeLineApiServer
+from scripts.webhook_load_test import make_body, make_user_ids, run_load_test, sign
+
+SECRET = "test_channel_secret"
+
+
+@pytest.fixture
+def fake_line():
+    server = FakeLineApiServer(port=0).start()
+    yield server
+    server.stop()
+
+
+def _messaging_api(server):
+    return MessagingApi(ApiClient(Configuration(host=server.url, access_token="test")))
+
+
+def test_fake_line_api_records_and_rate_limits(fake_line):
+    """SDKからの応答・プッシュを記録し、応答トークンの再利用とレート制限でエラーを返すことのテスト"""
+    api = _messaging_api(fake_line)
+
+    api.push_message(PushMessageRequest(to="U" + "a" * 32, messages=[TextMessage(text="お知らせ")]))
+    api.reply_message(ReplyMessageRequest(reply_token="token-1", messages=[TextMessage(text="返信")]))
+    with pytest.raises(ApiException) as reused:
+        api.reply_message(ReplyMessageRequest(reply_token="token-1", messages=[TextMessage(text="返信")]))
+    assert reused.value.status == 400
+
+    fake_line.rate_limit_rate = 1.0
+    with pytest.raises(ApiException) as limited:
+        api.push_message(PushMessageRequest(to="U" + "a" * 32, messages=[TextMessage(text="お知らせ")]))
+    assert limited.value.status == 429
+
+    assert fake_line.calls_for("push")[0]["body"]["messages"][0]["text"] == "お知らせ"
+    assert fake_line.stats()["rate_limited"] == 1
+
+
+def test_generated_webhooks_are_signed_and_parseable():
+    """生成したWebhookボディが署名検証を通り、各種イベントとして解釈できることのテスト"""
+    rng = random.Random(1)
+    body = make_body(make_user_ids(10), {"message": 1, "follow": 1, "postback": 1}, rng, events_per_request=30)
+
+    events = WebhookParser(SECRET).parse(body.decode("utf-8"), sign(body, SECRET))
+
+    assert len(events) == 30
+    assert {type(e) for e in events} == {MessageEvent, FollowEvent, PostbackEvent}
+
+
+def test_run_load_test_reports_latency():
+    """署名を検証するWebhookの代替に負荷をかけ、件数とパーセンタイルを集計することのテスト"""
+    parser = WebhookParser(SECRET)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+            parser.parse(body, self.headers["X-Line-Signature"])
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        result = run_load_test(f"http://127.0.0.1:{httpd.server_address[1]}/callback", SECRET,
+                               users=20, requests_total=40, concurrency=4)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert result["requests"] == 40
+    assert result["status_counts"] == {"200": 40}
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
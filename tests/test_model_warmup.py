@@ -0,0 +1,54 @@
+import os
+from utils.model_warmup import ModelKeeper
+from utils.context_window import ContextSizer
+from ollama_client import OllamaClient
+
+
+class FakeGenerateClient:
+    """generateの呼び出しを記録し、ロード時間を返すスタブ"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, model, prompt, options=None, keep_alive=None, **kwargs):
+        self.calls.append({"model": model, "prompt": prompt, "options": options, "keep_alive": keep_alive})
+        return {"model": model, "response": "", "done": True, "load_duration": 2_500_000_000}
+
+
+def test_only_leader_warms_up_and_stats_are_shared(tmp_path):
+    """ロックを取れた1プロセスだけがウォームアップし、結果は他からも参照できることのテスト"""
+    client = OllamaClient()
+    fake = FakeGenerateClient()
+    client.pool.backends[0].client = fake
+    client.context_sizer = ContextSizer([1024, 2048], sticky_seconds=60)
+    for settings in client.modes.values():
+        settings["model"] = "llama3.2"
+    lock_path = str(tmp_path / "warmup.lock")
+
+    leader = ModelKeeper(client, ["chat", "summary"], lock_path=lock_path)
+    follower = ModelKeeper(client, ["chat", "summary"], lock_path=lock_path)
+    try:
+        results = leader.run_once()
+        assert follower.run_once() is None
+
+        # 同じモデルは1回だけ、空のプロンプトとモードのkeep_alive・実際に使うnum_ctxで送る
+        assert len(fake.calls) == 1
+        assert fake.calls[0]["prompt"] == ""
+        assert fake.calls[0]["keep_alive"] == client.modes["chat"]["keep_alive"]
+        assert fake.calls[0]["options"]["num_ctx"] == 1024
+        assert results[0]["load_ms"] == 2500
+        # プール経由で送られ、ロックファイルは所有者のみ読み書きできる
+        assert client.pool.backends[0].requests == 1
+        assert client.pool.backends[0].outstanding == 0
+        assert os.stat(lock_path).st_mode & 0o777 == 0o600
+
+        stats = follower.stats()
+        assert stats["is_leader"] is False
+        assert stats["results"][0]["model"] == "llama3.2"
+
+        # 実行役が終了すると別のプロセスが引き継ぐ
+        leader.stop()
+        assert follower.run_once() is not None
+    finally:
+        leader.stop()
+        follower.stop()
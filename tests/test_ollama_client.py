@@ -0,0 +1,131 @@
+import json
+from ollama_client import OllamaClient, find_sentence_end
+
+
+class FakeStreamClient:
+    """トークンを1つずつ返すストリーミング応答のスタブ"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def chat(self, model, messages, options=None, stream=False, **kwargs):
+        def generate():
+            try:
+                for piece in self.pieces:
+                    self.consumed += 1
+                    yield {"message": {"role": "assistant", "content": piece}, "done": False}
+                yield {"message": {"role": "assistant", "content": ""}, "done": True}
+            finally:
+                self.closed = True
+        return generate()
+
+
+def test_find_sentence_end():
+    """文末位置の検出テスト"""
+    assert find_sentence_end("こんにちは。元気ですか？", 0) == 6
+    assert find_sentence_end("こんにちは。元気ですか？", 6) == 12
+    assert find_sentence_end("区切りなし", 0) == -1
+
+
+def test_stream_chat_cuts_off_after_budget():
+    """文字数上限を超えた最初の文末で生成を打ち切ることのテスト"""
+    pieces = ["あ" * 8, "。", "い" * 5, "。", "う" * 10, "。", "え" * 10]
+    client = OllamaClient()
+    fake = FakeStreamClient(pieces)
+    client.pool.backends[0].client = fake
+
+    text, stats = client.stream_chat([{"role": "user", "content": "test"}], {}, char_budget=12)
+
+    assert text == "あ" * 8 + "。" + "い" * 5 + "。"
+    assert stats["cut_off"] is True
+    assert fake.closed is True
+    assert fake.consumed < len(pieces)
+    assert stats["tokens"] == 4
+
+
+def test_stream_chat_short_reply_is_not_cut():
+    """上限に満たない応答はそのまま返すことのテスト"""
+    client = OllamaClient()
+    client.pool.backends[0].client = FakeStreamClient(["短い", "応答です。"])
+
+    text, stats = client.stream_chat([{"role": "user", "content": "test"}], {}, char_budget=150)
+
+    assert text == "短い応答です。"
+    assert stats["cut_off"] is False
+    assert client.get_stream_metrics()["requests"] == 1
+
+
+def test_resolve_mode_applies_model_and_overrides():
+    """モード別のモデル・keep_alive・オプション上書きが適用されることのテスト"""
+    client = OllamaClient()
+    client.modes["classify"] = {"model": "small-model", "keep_alive": "5m", "options": {"num_ctx": 2048}}
+
+    model, options, keep_alive = client.resolve_mode("classify", options={"temperature": 0.0, "num_ctx": 8192})
+    assert model == "small-model"
+    assert options == {"temperature": 0.0, "num_ctx": 2048}
+    assert keep_alive == "5m"
+
+    # モード未指定時は既定モデルをそのまま使う
+    assert client.resolve_mode(None, options={"temperature": 0.5}) == (client.model, {"temperature": 0.5}, None)
+
+
+class FakeClassifyClient:
+    """4件以上のバッチには壊れたJSONを返し、「不明」を含む意見には不正なカテゴリを返すスタブ"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def chat(self, model, messages, **kwargs):
+        items = json.loads(messages[-1]["content"]) if messages[0]["content"].startswith("以下の市民の意見それぞれ") else None
+        if items is None:
+            # 1件ずつの分類モード
+            content = json.dumps({"category": "その他", "emotion_score": 3})
+        else:
+            self.batch_sizes.append(len(items))
+            if len(items) >= 4:
+                content = '{"results": [{"index": 0, "category": "交通"'
+            else:
+                content = json.dumps({"results": [
+                    {"index": item["index"], "category": "不明" if "不明" in item["text"] else "交通", "emotion_score": 5}
+                    for item in items
+                ]}, ensure_ascii=False)
+        return {"message": {"role": "assistant", "content": content}, "done": True}
+
+
+def test_classify_opinions_splits_and_retries():
+    """壊れたJSONのバッチは分割し、不正な項目だけ再分類して入力順に返すことのテスト"""
+    client = OllamaClient()
+    fake = FakeClassifyClient()
+    client.pool.backends[0].client = fake
+    texts = ["バスの本数", "駅前の渋滞", "不明な意見", "道路の段差", "信号が短い"]
+
+    results = client.classify_opinions(texts, batch_size=5, use_cache=False)
+
+    assert len(results) == 5
+    assert [r["category"] for r in results] == ["交通", "交通", "その他", "交通", "交通"]
+    assert results[2]["emotion_score"] == 3
+    assert fake.batch_sizes[0] == 5
+    assert max(fake.batch_sizes[1:]) < 4
+
+
+class FakeSingleClassifyClient:
+    """1件ずつの分類モードで指定した応答を返すスタブ"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def chat(self, model, messages, **kwargs):
+        return {"message": {"role": "assistant", "content": json.dumps(self.result, ensure_ascii=False)}, "done": True}
+
+
+def test_classify_opinions_validates_single_item():
+    """1件のバッチも検証し、不正なカテゴリ・スコアはNoneにすることのテスト"""
+    client = OllamaClient()
+
+    client.pool.backends[0].client = FakeSingleClassifyClient({"category": "宇宙開発", "emotion_score": 5})
+    assert client.classify_opinions(["ロケットを飛ばしてほしい"], use_cache=False) == [None]
+
+    client.pool.backends[0].client = FakeSingleClassifyClient({"category": "交通", "emotion_score": "7"})
+    assert client.classify_opinions(["バスの本数"], use_cache=False) == [{"category": "交通", "emotion_score": 7}]
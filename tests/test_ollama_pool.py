@@ -0,0 +1,164 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from utils.ollama_pool import OllamaBackendPool
+from utils.circuit_breaker import CircuitOpenError
+from utils.llm_governor import LLMQueueTimeout
+
+
+class StandInServer:
+    """/api/chat に固定応答を返すOllamaの代わりのHTTPサーバー"""
+
+    def __init__(self, name, delay=0.0, status=200):
+        self.name = name
+        self.delay = delay
+        self.status = status
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                server.requests += 1
+                time.sleep(server.delay)
+                body = json.dumps({
+                    "model": "test",
+                    "message": {"role": "assistant", "content": server.name},
+                    "done": True,
+                }).encode()
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(name, **kwargs):
+        server = StandInServer(name, **kwargs)
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.close()
+
+
+def _chat(pool, session_key=None):
+    with pool.lease(session_key) as backend:
+        response = backend.client.chat(model="test", messages=[{"role": "user", "content": "hi"}])
+    return response["message"]["content"]
+
+
+def test_prefers_faster_host(servers):
+    """応答時間の短いホストに多く振り分けることのテスト"""
+    fast = servers("fast")
+    slow = servers("slow", delay=0.1)
+    pool = OllamaBackendPool([fast.url, slow.url], timeout=5)
+
+    results = [_chat(pool) for _ in range(10)]
+
+    assert results.count("fast") >= 8
+    assert slow.requests >= 1  # 未計測のホストも一度は試す
+
+
+def test_sticky_session_and_concurrency_limit(servers):
+    """同じセッションは同じホストに送り、上限に達したホストは避けることのテスト"""
+    a = servers("a")
+    b = servers("b")
+    pool = OllamaBackendPool([a.url, b.url], timeout=5, max_concurrency=1)
+
+    first = _chat(pool, session_key="session-1")
+    assert all(_chat(pool, session_key="session-1") == first for _ in range(5))
+    assert pool.stats()["sticky_sessions"] == 1
+    pool.forget("session-1")
+    assert pool.stats()["sticky_sessions"] == 0
+
+    # 1件処理中のホストには振り分けない
+    with pool.lease() as busy:
+        other = b if busy.url == a.url else a
+        before = other.requests
+        _chat(pool)
+        assert other.requests == before + 1
+
+
+def test_failover_to_healthy_host(servers):
+    """エラーを返すホストのサーキットがopenになり、正常なホストだけを使うことのテスト"""
+    broken = servers("broken", status=500)
+    healthy = servers("healthy")
+    pool = OllamaBackendPool([broken.url, healthy.url], timeout=5, failure_threshold=1, reset_timeout=60)
+
+    results = []
+    for _ in range(6):
+        try:
+            results.append(_chat(pool))
+        except Exception:
+            results.append("error")
+
+    assert results.count("error") == 1
+    assert results[-3:] == ["healthy"] * 3
+    assert broken.requests == 1
+
+
+
+def test_lease_pinned_to_host():
+    """url指定のリースは他のホストが空いていても指定ホストだけを使うことのテスト"""
+    pool = OllamaBackendPool(["http://127.0.0.1:9", "http://127.0.0.1:10"], timeout=1, max_concurrency=1)
+    target = pool.backends[1]
+
+    for _ in range(3):
+        with pool.lease(url=target.url) as backend:
+            assert backend is target
+    with pool.lease(url=target.url):
+        with pytest.raises(LLMQueueTimeout):
+            with pool.lease(url=target.url, timeout=0.1):
+                pass
+    assert target.requests == 4
+    assert pool.backends[0].requests == 0
+
+def test_all_hosts_down_fails_fast():
+    """全ホストが停止している場合はサーキットがopenになり即座に失敗することのテスト"""
+    pool = OllamaBackendPool(["http://127.0.0.1:9"], timeout=1, failure_threshold=1, reset_timeout=60)
+
+    with pytest.raises(Exception):
+        _chat(pool)
+
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        _chat(pool)
+    assert time.monotonic() - started < 0.1
+
+
+def test_client_errors_do_not_open_circuit(servers):
+    """4xx（モデル未取得など）はホストの障害として記録しないことのテスト"""
+    import ollama
+
+    not_found = servers("not_found", status=404)
+    pool = OllamaBackendPool([not_found.url], timeout=5, failure_threshold=1, reset_timeout=60)
+
+    for _ in range(3):
+        with pytest.raises(ollama.ResponseError):
+            _chat(pool)
+
+    assert not_found.requests == 3
+    backend = pool.stats()["backends"][0]
+    assert backend["failures"] == 0
+    assert not pool.all_open()
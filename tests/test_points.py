@@ -0,0 +1,41 @@
+from database.db_manager import User, PointsHistory, add_points, add_points_bulk
+
+
+def _create_user(db_session, line_user_id):
+    user = User(line_user_id=line_user_id, line_user_id_hash=f"hash_{line_user_id}")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def test_add_points_returns_new_total(db_session):
+    """ポイント付与後の累積ポイントが返ることのテスト"""
+    user = _create_user(db_session, "points_user_1")
+
+    assert add_points(db_session, user.id, 3, "poll_response") == 3
+    assert add_points(db_session, user.id, 10, "chat_opinion") == 13
+    db_session.commit()
+
+    assert db_session.get(User, user.id).total_points == 13
+    assert db_session.query(PointsHistory).filter_by(user_id=user.id).count() == 2
+
+
+def test_add_points_unknown_user(db_session):
+    """存在しないユーザーへの付与はNoneを返し履歴も残さないことのテスト"""
+    assert add_points(db_session, 99999, 5, "free_form") is None
+    assert db_session.query(PointsHistory).count() == 0
+
+
+def test_add_points_bulk(db_session):
+    """一括付与のテスト"""
+    user1 = _create_user(db_session, "points_user_2")
+    user2 = _create_user(db_session, "points_user_3")
+    add_points(db_session, user1.id, 5, "free_form")
+
+    granted = add_points_bulk(db_session, {user1.id: 3, user2.id: 7, 99999: 1}, "poll_reward", reference_id=1)
+    db_session.commit()
+
+    assert granted == 2
+    assert db_session.get(User, user1.id).total_points == 8
+    assert db_session.get(User, user2.id).total_points == 7
+    assert db_session.query(PointsHistory).filter_by(reason="poll_reward").count() == 2
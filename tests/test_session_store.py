@@ -0,0 +1,50 @@
+import time
+from utils.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_ttl_and_size():
+    """メモリストアのTTL失効と件数上限のテスト"""
+    store = MemorySessionStore(ttl=1, max_size=2)
+    store.set("u1", {"session_id": 1})
+    store.set("u2", {"session_id": 2})
+    store.set("u3", {"session_id": 3})
+
+    assert store.get("u1") is None  # 上限超過で削除
+    assert store.get("u3") == {"session_id": 3}
+
+    time.sleep(1.1)
+    assert store.get("u3") is None
+
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    """SQLiteストアが別インスタンス（別ワーカー相当）から参照できることのテスト"""
+    path = str(tmp_path / "sessions.sqlite3")
+    worker_a = SQLiteSessionStore(path, ttl=60)
+    worker_b = SQLiteSessionStore(path, ttl=60)
+
+    worker_a.set("user", {"session_id": 10})
+    assert worker_b.get("user") == {"session_id": 10}
+
+    worker_b.delete("user")
+    assert worker_a.get("user") is None
+
+
+def test_sqlite_store_sweep(tmp_path):
+    """SQLiteストアの期限切れ・上限超過分の掃除のテスト"""
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl=60, max_size=3)
+    for i in range(5):
+        store.set(f"user_{i}", {"session_id": i})
+
+    store.sweep()
+    assert len(store) == 3
+    assert store.get("user_0") is None
+    assert store.get("user_4") == {"session_id": 4}
+
+
+def test_sqlite_store_file_is_private(tmp_path):
+    """SQLiteファイルが所有者のみ読み書きできる権限で作成されることのテスト"""
+    path = tmp_path / "instance" / "sessions.sqlite3"
+    store = SQLiteSessionStore(str(path), ttl=60)
+    store.set("user", {"session_id": 1})
+
+    assert path.stat().st_mode & 0o777 == 0o600
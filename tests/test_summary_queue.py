@@ -0,0 +1,113 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import database.db_manager as dbm
+import features.summary_queue as sq
+from database.db_manager import Base, User, ChatSession, ChatMessage, Opinion, SummaryJob
+
+
+class FakeSummaryClient:
+    """指定回数だけ失敗してから要約を返すスタブ"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def summary_mode(self, chat_history):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return None
+        return {"summary": "バスの本数を増やしてほしい", "category": "交通", "emotion_score": 6}
+
+
+@pytest.fixture
+def queue_db(monkeypatch):
+    """get_db()が参照するDBをインメモリSQLiteに差し替え"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    original_bind = dbm.SessionLocal.kw["bind"]
+    dbm.SessionLocal.configure(bind=engine)
+    monkeypatch.setattr(sq, "get_messaging_api", lambda: type("Api", (), {"push_message": lambda self, req: None})())
+    yield
+    dbm.SessionLocal.configure(bind=original_bind)
+    Base.metadata.drop_all(engine)
+
+
+def _enqueue_session():
+    with dbm.get_db() as db:
+        user = User(line_user_id="queue_user", line_user_id_hash="hash_queue_user")
+        db.add(user)
+        db.flush()
+        session = ChatSession(user_id=user.id, status="active", turn_count=5)
+        db.add(session)
+        db.flush()
+        db.add(ChatMessage(session_id=session.id, role="user", content="バスが少ない"))
+        db.add(ChatMessage(session_id=session.id, role="assistant", content="詳しく教えてください。"))
+        sq.enqueue_summary_job(db, session, "queue_user")
+        return session.id, user.id
+
+
+def test_summary_job_completes(queue_db, monkeypatch):
+    """ジョブが要約を保存してポイントを付与し、二重に取得されないことのテスト"""
+    monkeypatch.setattr(sq, "get_ollama_client", lambda: FakeSummaryClient())
+    session_id, user_id = _enqueue_session()
+
+    assert sq.run_pending_jobs() == 1
+    assert sq.run_pending_jobs() == 0
+
+    with dbm.get_db() as db:
+        job = db.query(SummaryJob).one()
+        assert job.status == "done"
+        assert db.get(ChatSession, session_id).status == "completed"
+        assert db.get(Opinion, job.opinion_id).category == "交通"
+        assert db.get(User, user_id).total_points > 0
+
+
+def test_summary_job_retries_then_falls_back(queue_db, monkeypatch):
+    """要約失敗時に再試行し、上限到達後は発言をそのまま意見登録することのテスト"""
+    monkeypatch.setattr(sq, "get_ollama_client", lambda: FakeSummaryClient(failures=10))
+    monkeypatch.setattr(sq, "SUMMARY_JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(sq, "SUMMARY_JOB_RETRY_BASE", 0)
+    _enqueue_session()
+
+    assert sq.run_pending_jobs() == 2
+
+    with dbm.get_db() as db:
+        job = db.query(SummaryJob).one()
+        assert job.status == "done"
+        assert job.attempts == 2
+        opinion = db.get(Opinion, job.opinion_id)
+        assert opinion.category == "その他"
+        assert "バスが少ない" in opinion.content
+
+
+class DeletingSummaryClient(FakeSummaryClient):
+    """要約生成中にセッションを削除するスタブ（管理者による削除を再現）"""
+
+    def __init__(self, session_id):
+        super().__init__()
+        self.session_id = session_id
+
+    def summary_mode(self, chat_history):
+        with dbm.get_db() as db:
+            db.query(ChatMessage).filter(ChatMessage.session_id == self.session_id).delete()
+            db.query(ChatSession).filter(ChatSession.id == self.session_id).delete()
+            db.commit()
+        return super().summary_mode(chat_history)
+
+
+def test_summary_job_done_when_session_deleted_during_summary(queue_db, monkeypatch):
+    """要約生成中にセッションが削除された場合はジョブを完了扱いにし、意見を登録しないことのテスト"""
+    session_id, user_id = _enqueue_session()
+    monkeypatch.setattr(sq, "get_ollama_client", lambda: DeletingSummaryClient(session_id))
+
+    assert sq.run_pending_jobs() == 1
+    assert sq.run_pending_jobs() == 0
+
+    with dbm.get_db() as db:
+        job = db.query(SummaryJob).one()
+        assert job.status == "done"
+        assert job.opinion_id is None
+        assert db.query(Opinion).count() == 0
+        assert (db.get(User, user_id).total_points or 0) == 0
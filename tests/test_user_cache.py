@@ -0,0 +1,63 @@
+from database.db_manager import (
+    User,
+    get_or_create_user,
+    resolve_user,
+    clear_user_cache,
+    get_user_cache_stats,
+)
+from database.user_cache import UserIdentityCache, user_scope
+
+
+def test_lru_eviction():
+    """最大件数を超えた場合に最も古いエントリが削除されることのテスト"""
+    cache = UserIdentityCache(max_size=2, ttl=60)
+    cache.put("u1", "h1", 1)
+    cache.put("u2", "h2", 2)
+    cache.get("u1")  # u1を最近使用に
+    cache.put("u3", "h3", 3)
+
+    assert cache.get("u1") is not None
+    assert cache.get("u2") is None
+    assert cache.get("u3") is not None
+
+
+def test_resolve_user_uses_cache(db_session):
+    """2回目以降の解決がキャッシュから返されることのテスト"""
+    clear_user_cache()
+    user = get_or_create_user(db_session, "cache_user_1")
+
+    hits_before = get_user_cache_stats()["hits"]
+    resolved = resolve_user(db_session, "cache_user_1")
+
+    assert resolved.user_id == user.id
+    assert resolved.user_hash == user.line_user_id_hash
+    assert get_user_cache_stats()["hits"] == hits_before + 1
+
+
+def test_request_scope_shares_resolved_user(db_session):
+    """同一スコープ内ではLRUを参照せずに解決済みユーザーを返すことのテスト"""
+    clear_user_cache()
+    with user_scope("cache_user_2"):
+        first = resolve_user(db_session, "cache_user_2")
+        lookups_before = get_user_cache_stats()
+        second = resolve_user(db_session, "cache_user_2")
+        lookups_after = get_user_cache_stats()
+
+    assert first == second
+    assert lookups_before["hits"] == lookups_after["hits"]
+    assert lookups_before["misses"] == lookups_after["misses"]
+
+
+def test_cache_invalidated_on_delete(db_session):
+    """ユーザー削除時にキャッシュが破棄されることのテスト"""
+    clear_user_cache()
+    user = get_or_create_user(db_session, "cache_user_3")
+    assert get_user_cache_stats()["size"] == 1
+
+    db_session.delete(user)
+    db_session.commit()
+    assert get_user_cache_stats()["size"] == 0
+
+    recreated = get_or_create_user(db_session, "cache_user_3")
+    assert db_session.query(User).count() == 1
+    assert resolve_user(db_session, "cache_user_3").user_id == recreated.id
@@ -0,0 +1,113 @@
+"""サーキットブレーカー
+
+外部サービス（Ollama）の障害時に、タイムアウトまで待たずに即座に失敗させる。
+
+状態遷移:
+- closed: 通常状態。連続失敗がfailure_threshold回に達するとopenへ
+- open: 全リクエストを即座に拒否。reset_timeout秒経過後、1件だけ試行を許可してhalf_openへ
+- half_open: 試行（プローブ）が成功すればclosed、失敗すれば再びopenへ
+"""
+
+import time
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットがopenのためリクエストを拒否した"""
+
+
+class CircuitBreaker:
+    """連続失敗数によるサーキットブレーカー（プロセス内・スレッドセーフ）"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._metrics = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def is_open(self) -> bool:
+        """リクエストを即座に拒否する状態か（プローブ待ちのhalf_openも含む）"""
+        with self._lock:
+            if self._state == OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            return self._state == HALF_OPEN and self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        """
+        リクエストを実行してよいか判定
+
+        Trueを返した場合、呼び出し側は必ず record_success / record_failure / cancel の
+        いずれかで結果を報告すること（half_openのプローブを解放するため）。
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"Circuit '{self.name}' half-open, probing")
+
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self._metrics["rejected"] += 1
+            return False
+
+    def record_success(self):
+        """成功を記録（half_openならclosedに戻す）"""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """失敗を記録（閾値到達またはプローブ失敗でopenにする）"""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._metrics["opened"] += 1
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after {self._consecutive_failures} consecutive failures"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def cancel(self):
+        """結果を記録せずに試行を取り消す（サービス以外の理由で実行できなかった場合）"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        """状態と累積値"""
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "rejected": self._metrics["rejected"],
+                "opened": self._metrics["opened"],
+            }
@@ -0,0 +1,103 @@
+"""コンテキストウィンドウ（num_ctx）の自動選択
+
+Ollamaはnum_ctx分のKVキャッシュを確保するため、数百トークンの対話に8192を指定すると
+最初のトークンまでの時間が延び、並列数も減る。プロンプトのトークン数を見積もり、
+OLLAMA_CTX_BUCKETS（例: 1024,2048,4096,8192）から収まる最小のサイズを選ぶ。
+
+- num_ctxが変わるとOllamaはモデルを再ロードするため、サイズは段階（バケット）に限定する
+- 直前に使ったバケットで足りる場合はそれを使い続ける（OLLAMA_CTX_STICKY_SECONDS以内）。
+  小さいバケットへの切り替えは一定時間リクエストがなかった後だけ行う
+- 見積もりは日本語を多めに見積もる（不足するとOllamaが先頭＝システムプロンプトから切り捨てるため）
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 文字種ごとの1文字あたりのトークン数（llama3系のトークナイザーで多めに見積もった値）
+TOKENS_PER_ASCII_CHAR = 0.3
+TOKENS_PER_NON_ASCII_CHAR = 1.1
+# メッセージごとのテンプレート（ロール名・区切りトークン）分
+TOKENS_PER_MESSAGE = 8
+# 見積もり誤差の余裕
+SAFETY_MARGIN = 1.15
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を見積もる（日本語は1文字≒1トークン強）"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    non_ascii_chars = len(text) - ascii_chars
+    return int(ascii_chars * TOKENS_PER_ASCII_CHAR + non_ascii_chars * TOKENS_PER_NON_ASCII_CHAR) + 1
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """chat APIに渡すメッセージ全体のトークン数を見積もる"""
+    return sum(estimate_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages)
+
+
+class ContextSizer:
+    """プロンプトに応じたnum_ctxをバケットから選択する"""
+
+    def __init__(self, buckets: List[int], sticky_seconds: float = 300):
+        if not buckets:
+            raise ValueError("At least one context bucket is required")
+        self.buckets = sorted(buckets)
+        self.sticky_seconds = sticky_seconds
+        self._lock = threading.Lock()
+        self._current = {}  # モデル名 → (バケット, 最終使用時刻)
+        self._counts = {b: 0 for b in self.buckets}
+        self._overflows = 0
+
+    def bucket_for(self, required_tokens: int) -> int:
+        """必要トークン数が収まる最小のバケット（収まらない場合は最大）"""
+        for bucket in self.buckets:
+            if required_tokens <= bucket:
+                return bucket
+        return self.buckets[-1]
+
+    def select(self, model: str, messages: List[Dict[str, str]], num_predict: int = 0) -> int:
+        """
+        モデルとメッセージに対するnum_ctxを選択
+
+        Args:
+            model: モデル名（直前のバケットをモデルごとに記憶する）
+            messages: chat APIに渡すメッセージ
+            num_predict: 生成する最大トークン数
+
+        Returns:
+            num_ctx
+        """
+        prompt_tokens = estimate_messages_tokens(messages)
+        required = int((prompt_tokens + max(num_predict, 0)) * SAFETY_MARGIN)
+        needed = self.bucket_for(required)
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = needed
+            current = self._current.get(model)
+            if current is not None and now - current[1] < self.sticky_seconds and current[0] >= needed:
+                bucket = current[0]
+            self._current[model] = (bucket, now)
+            self._counts[bucket] += 1
+            if required > self.buckets[-1]:
+                self._overflows += 1
+
+        if required > self.buckets[-1]:
+            logger.warning(f"Prompt may exceed context window: estimated {required} tokens > num_ctx {bucket}")
+        logger.info(
+            f"num_ctx={bucket} for {model} (estimated prompt {prompt_tokens} + predict {num_predict} tokens)"
+        )
+        return bucket
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "buckets": dict(self._counts),
+                "overflows": self._overflows,
+                "current": {model: bucket for model, (bucket, _) in self._current.items()},
+            }
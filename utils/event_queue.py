@@ -0,0 +1,180 @@
+"""Webhookイベントの非同期処理キュー
+
+/callback は署名検証とキュー投入だけを行って即座に200を返し、
+実際のイベント処理（LLM呼び出しを含む）はワーカースレッドで実行する。
+
+同じユーザーのイベントは常に同じワーカーに割り当てるため、
+ユーザー単位でイベントの処理順序が保たれる。
+キューはプロセス内メモリ上にあるため、ワーカープロセスが強制終了された場合は
+未処理のイベントが失われる点に注意（通常終了時はatexitで処理を待つ）。
+"""
+
+import os
+import time
+import queue
+import zlib
+import atexit
+import logging
+import threading
+from typing import Any, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 終了処理用の番兵
+_STOP = object()
+
+
+class OrderedEventDispatcher:
+    """ユーザー単位で順序を保証するイベントワーカープール"""
+
+    def __init__(self, handler_func: Callable[[Any], None], num_workers: int = 4, queue_size: int = 1000):
+        """
+        初期化
+
+        Args:
+            handler_func: イベント1件を処理する関数
+            num_workers: ワーカースレッド数
+            queue_size: キュー全体の最大イベント数（ワーカーごとに等分）
+        """
+        self.handler_func = handler_func
+        self.num_workers = max(1, num_workers)
+        self.shard_size = max(1, queue_size // self.num_workers)
+
+        self._queues = []
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        # 投入は1件ずつ直列に行う（空き容量の確認と投入の間に他の投入が割り込まないように）
+        self._submit_lock = threading.Lock()
+
+        # 統計情報
+        self.processed_count = 0
+        self.failed_count = 0
+        self.rejected_count = 0
+
+    def start(self):
+        """ワーカースレッドを起動（fork後のプロセスで初回投入時に呼ばれる）"""
+        with self._lock:
+            # gunicornのfork後はスレッドが引き継がれないため、PIDが変わったら作り直す
+            if self._pid == os.getpid():
+                return
+
+            self._queues = [queue.Queue(maxsize=self.shard_size) for _ in range(self.num_workers)]
+            self._threads = []
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(self._queues[i],),
+                    name=f"webhook-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+            self._pid = os.getpid()
+            atexit.register(self.shutdown)
+            logger.info(f"Webhook event workers started: {self.num_workers} threads (PID {self._pid})")
+
+    def submit(self, key: str, event: Any, timeout: float = 0.5) -> bool:
+        """
+        イベントをキューに投入
+
+        Args:
+            key: 順序保証の単位（LINE User ID等）
+            event: 処理対象イベント
+            timeout: キューが満杯の場合の待機秒数
+
+        Returns:
+            投入に成功したかどうか
+        """
+        return self.submit_all([(key, event)], timeout=timeout)
+
+    def submit_all(self, items: List[Tuple[str, Any]], timeout: float = 0.5) -> bool:
+        """
+        複数のイベントをまとめてキューに投入（全件投入できる空きがなければ1件も投入しない）
+
+        Webhookの1リクエストに含まれるイベントを途中まで投入して失敗すると、
+        LINEの再送で投入済みのイベントが二重に処理されるため、全件か0件のどちらかにする。
+
+        Args:
+            items: [(順序保証の単位, イベント)]
+            timeout: キューに空きができるまでの待機秒数
+
+        Returns:
+            投入に成功したかどうか
+        """
+        self.start()
+
+        needed = {}
+        for key, _ in items:
+            shard = self._shard(key)
+            needed[shard] = needed.get(shard, 0) + 1
+
+        deadline = time.monotonic() + timeout
+        with self._submit_lock:
+            # ワーカーは取り出すだけなので、ロック中に確認した空きが減ることはない
+            while any(self.shard_size - self._queues[shard].qsize() < count for shard, count in needed.items()):
+                if time.monotonic() >= deadline or any(count > self.shard_size for count in needed.values()):
+                    self.rejected_count += len(items)
+                    logger.warning(f"Webhook queue is full, rejecting {len(items)} events")
+                    return False
+                time.sleep(0.005)
+
+            enqueued_at = time.time()
+            for key, event in items:
+                self._queues[self._shard(key)].put_nowait((event, enqueued_at))
+        return True
+
+    def _shard(self, key: str) -> int:
+        """順序保証の単位からワーカーの番号を求める"""
+        return zlib.crc32((key or "").encode()) % self.num_workers
+
+    def _worker_loop(self, event_queue: queue.Queue):
+        """ワーカースレッドのメインループ"""
+        while True:
+            item = event_queue.get()
+            try:
+                if item is _STOP:
+                    return
+
+                event, enqueued_at = item
+                wait_ms = (time.time() - enqueued_at) * 1000
+                if wait_ms > 1000:
+                    logger.warning(f"Webhook event waited {wait_ms:.0f}ms in queue")
+
+                try:
+                    self.handler_func(event)
+                    self.processed_count += 1
+                except Exception as e:
+                    self.failed_count += 1
+                    logger.error(f"Error processing queued webhook event: {e}", exc_info=True)
+            finally:
+                event_queue.task_done()
+
+    def stats(self) -> dict:
+        """キューの状態を取得"""
+        return {
+            "workers": self.num_workers,
+            "queue_depth": sum(q.qsize() for q in self._queues),
+            "processed": self.processed_count,
+            "failed": self.failed_count,
+            "rejected": self.rejected_count,
+        }
+
+    def shutdown(self, timeout: float = 25.0):
+        """キューに残ったイベントを処理してからワーカーを停止"""
+        if self._pid != os.getpid():
+            return
+
+        for q in self._queues:
+            try:
+                q.put(_STOP, timeout=1)
+            except queue.Full:
+                logger.warning("Webhook queue still full at shutdown, pending events may be lost")
+
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0, deadline - time.time()))
+
+        self._pid = None
+        logger.info("Webhook event workers stopped")
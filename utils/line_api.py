@@ -0,0 +1,84 @@
+"""LINE Messaging APIクライアントの共有管理
+
+ハンドラーやプッシュ配信ごとにApiClientを生成すると、毎回api.line.meへの
+TCP+TLS接続が発生する。プロセス内で1つのApiClientを共有し、
+urllib3のコネクションプール（Keep-Alive）を再利用する。
+
+gunicornのfork後に親プロセスのソケットを共有しないよう、
+PIDが変わった場合はクライアントを作り直す。
+"""
+
+import os
+import logging
+import threading
+from linebot.v3.messaging import (
+    Configuration,
+    ApiClient,
+    MessagingApi,
+    MessagingApiBlob,
+)
+
+from config import LINE_CHANNEL_ACCESS_TOKEN, LINE_API_POOL_SIZE, LINE_API_ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_api_client = None
+_messaging_api = None
+_messaging_api_blob = None
+_owner_pid = None
+
+
+def _create_configuration() -> Configuration:
+    """接続プール設定付きのConfigurationを生成"""
+    configuration = Configuration(host=LINE_API_ENDPOINT, access_token=LINE_CHANNEL_ACCESS_TOKEN)
+    # 同一ホストへの同時接続数（urllib3のmaxsize）
+    configuration.connection_pool_maxsize = LINE_API_POOL_SIZE
+    return configuration
+
+
+def _ensure_client():
+    """このプロセス用の共有ApiClientを用意（fork後は作り直す）"""
+    global _api_client, _messaging_api, _messaging_api_blob, _owner_pid
+
+    pid = os.getpid()
+    if _api_client is not None and _owner_pid == pid:
+        return
+
+    with _lock:
+        if _api_client is None or _owner_pid != pid:
+            # fork前のクライアントはcloseすると親のソケットまで閉じるため破棄のみ
+            _api_client = ApiClient(_create_configuration())
+            _messaging_api = MessagingApi(_api_client)
+            # 画像などのバイナリ用API（ホストはapi-data.line.meが呼び出しごとに指定される）
+            _messaging_api_blob = MessagingApiBlob(_api_client)
+            _owner_pid = pid
+            logger.info(f"LINE API client created (PID {pid}, pool size: {LINE_API_POOL_SIZE})")
+
+
+def get_messaging_api() -> MessagingApi:
+    """プロセス共有のMessagingApiインスタンスを取得"""
+    _ensure_client()
+    return _messaging_api
+
+
+def get_messaging_api_blob() -> MessagingApiBlob:
+    """プロセス共有のMessagingApiBlobインスタンスを取得（リッチメニュー画像のアップロードなど）"""
+    _ensure_client()
+    return _messaging_api_blob
+
+
+def close_messaging_api():
+    """共有クライアントを閉じる（プロセス終了時・テスト用）"""
+    global _api_client, _messaging_api, _messaging_api_blob, _owner_pid
+
+    with _lock:
+        if _api_client is not None and _owner_pid == os.getpid():
+            try:
+                _api_client.close()
+            except Exception as e:
+                logger.warning(f"Error closing LINE API client: {e}")
+        _api_client = None
+        _messaging_api = None
+        _messaging_api_blob = None
+        _owner_pid = None
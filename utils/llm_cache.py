@@ -0,0 +1,146 @@
+"""LLM応答キャッシュ
+
+temperatureが低く同じ入力に対してほぼ同じ出力を返す呼び出し（要約・分類・AI分析）の
+応答を、(モデル, メッセージ, オプション, format) のハッシュをキーに共有SQLiteファイルへ保存する。
+同じ意見に対する再分析・再分類はOllamaを呼ばずに即座に返せる。
+
+- 最終参照から古い順に削除（LRU、最大件数 LLM_CACHE_MAX_ENTRIES）
+- 作成から LLM_CACHE_TTL 秒を過ぎたエントリは無効
+- 呼び出しごとの無効化: OllamaClient.chat(use_cache=False)
+- 範囲での無効化: with llm_cache_disabled(): ...
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+)
+from utils.sqlite_ttl_store import SQLiteTTLStore
+
+logger = logging.getLogger(__name__)
+
+# llm_cache_disabled()の範囲内ではキャッシュを使わない
+_cache_disabled: ContextVar[bool] = ContextVar("llm_cache_disabled", default=False)
+
+
+@contextmanager
+def llm_cache_disabled(disabled: bool = True):
+    """with内のLLM呼び出しでキャッシュを使わない（disabled=Falseなら何もしない）"""
+    token = _cache_disabled.set(disabled or _cache_disabled.get())
+    try:
+        yield
+    finally:
+        _cache_disabled.reset(token)
+
+
+def is_cache_disabled() -> bool:
+    """現在の範囲でキャッシュが無効化されているか"""
+    return _cache_disabled.get()
+
+
+def make_cache_key(model: str, messages: List[Dict], options: Optional[Dict], format: str) -> str:
+    """呼び出し内容のハッシュ"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "options": options or {}, "format": format},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(SQLiteTTLStore):
+    """共有SQLiteファイルによるLLM応答キャッシュ（複数ワーカー対応）"""
+
+    TABLE = "llm_cache"
+    EXPIRY_COLUMN = "created_at"
+    EVICTION_COLUMN = "accessed_at"
+
+    def __init__(self, path: str, ttl: int = 604800, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        super().__init__(path, ttl=ttl, max_size=max_entries)
+
+    def schema(self):
+        return [
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed_at ON llm_cache(accessed_at)",
+        ]
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._metrics[name] += n
+
+    def get(self, key: str) -> Optional[str]:
+        """有効なエントリの応答本文を取得（参照時刻も更新）"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT content FROM llm_cache WHERE key = ? AND created_at >= ?",
+            (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+
+        conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return row[0]
+
+    def set(self, key: str, model: str, content: str):
+        """応答本文を保存"""
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, content, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, model, content, now, now)
+        )
+        self._count("writes")
+        self._after_write()
+
+    def sweep(self) -> int:
+        """期限切れエントリと上限超過分（参照の古い順）を削除"""
+        removed = super().sweep()
+        self._count("evictions", removed)
+        return removed
+
+    def stats(self) -> Dict:
+        """件数（全プロセス共有）とヒット率（このプロセスの累積）"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        metrics["entries"] = len(self)
+        return metrics
+
+
+# シングルトンインスタンス
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """LLM応答キャッシュのシングルトンインスタンスを取得（無効時はNone）"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+                logger.info(f"LLM cache initialized: {LLM_CACHE_PATH}")
+    return _llm_cache
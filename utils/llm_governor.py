@@ -0,0 +1,297 @@
+"""LLM同時実行数の制御（プロセス横断セマフォ）
+
+Ollamaサーバーが同時に処理できるリクエスト数（OLLAMA_NUM_PARALLEL × ホスト数）を超えて
+リクエストを送らないよう、全プロセス（gunicornワーカー・管理画面・スクリプト）で
+共有するスロットを flock で管理する。
+
+- スロット: ロックディレクトリ内の slot-0 ～ slot-(N-1) ファイル。排他ロックを取れたものを使用
+- 待機者: waiting/ 内に待機中のみ存在するファイルを置き、その数を待ち行列の深さとする
+  （一覧の走査はプロセスごとに POLL_INTERVAL につき1回までとし、待機中のスレッドで共有する）
+- 待機時間が上限を超えた場合は LLMQueueTimeout を送出する（Ollama側で詰まって
+  OLLAMA_TIMEOUT まで待たされるより早く失敗させる）
+
+優先度:
+- interactive: 市民との対話応答（既定）
+- background: 対話要約ジョブなど、数秒～数分遅れてよい処理
+- bulk: 管理画面の一括分析など
+優先度の高い待機者がいる間、低い優先度のリクエストは枠を取らずに待つ。
+またbackground/bulkは先頭のLLM_RESERVED_INTERACTIVE_SLOTS個の枠を使わないため、
+一括分析の実行中でも対話応答は待たずに実行できる。
+"""
+
+import os
+import time
+import fcntl
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List
+
+from config import (
+    OLLAMA_NUM_PARALLEL,
+    OLLAMA_HOSTS,
+    OLLAMA_QUEUE_TIMEOUT,
+    OLLAMA_BATCH_QUEUE_TIMEOUT,
+    LLM_LOCK_DIR,
+    LLM_RESERVED_INTERACTIVE_SLOTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# 優先度（値が小さいほど優先）
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BULK = "bulk"
+PRIORITY_RANKS = {INTERACTIVE: 0, BACKGROUND: 1, BULK: 2}
+
+# 現在の処理の優先度（llm_priority()で切り替え）
+_current_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """with内で行うLLM呼び出しの優先度を設定"""
+    if priority not in PRIORITY_RANKS:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class LLMQueueTimeout(RuntimeError):
+    """LLMの実行枠を待機時間内に確保できなかった"""
+
+
+class LLMGovernor:
+    """flockによるプロセス横断のLLM実行枠管理"""
+
+    # 空き枠を確認する間隔（秒）
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, slots: int, lock_dir: str, wait_timeout: float,
+                 batch_wait_timeout: float = None, reserved_slots: int = 0):
+        self.slots = max(1, slots)
+        self.lock_dir = lock_dir
+        self.wait_timeout = wait_timeout
+        self.batch_wait_timeout = wait_timeout if batch_wait_timeout is None else batch_wait_timeout
+        # 全枠を予約すると低優先度の処理が実行できなくなるため、最低1枠は残す
+        self.reserved_slots = min(max(0, reserved_slots), self.slots - 1)
+        self.waiting_dir = os.path.join(lock_dir, "waiting")
+        os.makedirs(self.waiting_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # 待機者一覧の走査結果（POLL_INTERVALの間は同じプロセスの待機者で共有）
+        self._scan_lock = threading.Lock()
+        self._scan_at = 0.0
+        self._scan_ranks = None
+        self._metrics = {
+            priority: {
+                "acquired": 0,
+                "timeouts": 0,
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+            }
+            for priority in PRIORITY_RANKS
+        }
+
+    def _try_acquire(self, rank: int):
+        """優先度に応じて使えるスロットの排他ロックを取得（空きがなければNone）"""
+        first = 0 if rank == 0 else self.reserved_slots
+        candidates = list(range(first, self.slots))
+        for index in random.sample(candidates, len(candidates)):
+            path = os.path.join(self.lock_dir, f"slot-{index}")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def _register_waiter(self, rank: int = 0):
+        """待機者ファイルを作成してロック（ロック中は生存中の待機者とみなす）
+
+        ロックを取る前のファイルを他プロセスが「異常終了した待機者」とみなして削除しないよう、
+        走査対象外の一時名で排他作成・ロックしてから本来の名前に変更する。
+        """
+        name = f"{rank}-{time.time():.6f}-{os.getpid()}-{threading.get_ident()}"
+        tmp_path = os.path.join(self.waiting_dir, f".{name}")
+        path = os.path.join(self.waiting_dir, name)
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.rename(tmp_path, path)
+        except BaseException:
+            os.close(fd)
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._invalidate_scan()
+        return path, fd
+
+    def _unregister_waiter(self, path: str, fd: int):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        self._invalidate_scan()
+
+    def _invalidate_scan(self):
+        """このプロセスの待機者が増減したため、次の確認で走査し直す"""
+        with self._scan_lock:
+            self._scan_ranks = None
+
+    def _live_waiter_ranks(self, max_age: float = None) -> List[int]:
+        """
+        全プロセスで実行枠を待っているリクエストの優先度一覧
+
+        Args:
+            max_age: この秒数以内の走査結果があれば再利用する（省略時はPOLL_INTERVAL、0で常に走査）
+        """
+        max_age = self.POLL_INTERVAL if max_age is None else max_age
+        with self._scan_lock:
+            now = time.monotonic()
+            if self._scan_ranks is None or now - self._scan_at >= max_age:
+                self._scan_ranks = self._scan_waiters()
+                self._scan_at = now
+            return list(self._scan_ranks)
+
+    def _scan_waiters(self) -> List[int]:
+        """待機者ファイルを走査して優先度一覧を返す（異常終了した待機者の残骸は削除）"""
+        ranks = []
+        for name in os.listdir(self.waiting_dir):
+            if name.startswith("."):
+                # 登録中（ロック取得前）の一時ファイル
+                continue
+            path = os.path.join(self.waiting_dir, name)
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # ロックを取れた = 待機者プロセスが既に存在しない
+                os.unlink(path)
+            except BlockingIOError:
+                ranks.append(int(name.split("-", 1)[0]))
+            except FileNotFoundError:
+                pass
+            finally:
+                os.close(fd)
+        return ranks
+
+    def _has_higher_waiters(self, rank: int) -> bool:
+        """自分より優先度の高い待機者がいるか"""
+        return rank > 0 and any(r < rank for r in self._live_waiter_ranks())
+
+    def queue_depth(self) -> int:
+        """全プロセスで実行枠を待っているリクエスト数"""
+        return len(self._live_waiter_ranks(max_age=0))
+
+    @contextmanager
+    def slot(self, timeout: float = None, priority: str = None):
+        """
+        LLMの実行枠を確保するコンテキストマネージャー
+
+        Args:
+            timeout: 待機時間の上限（秒、省略時は優先度に応じた設定値）
+            priority: 優先度（省略時はllm_priority()で設定された値）
+
+        Raises:
+            LLMQueueTimeout: 上限時間内に枠が空かなかった場合
+        """
+        priority = priority or _current_priority.get()
+        rank = PRIORITY_RANKS[priority]
+        if timeout is None:
+            timeout = self.wait_timeout if rank == 0 else self.batch_wait_timeout
+        started = time.perf_counter()
+
+        fd = None if self._has_higher_waiters(rank) else self._try_acquire(rank)
+        if fd is None:
+            waiter = self._register_waiter(rank)
+            try:
+                deadline = started + timeout
+                while fd is None:
+                    if time.perf_counter() >= deadline:
+                        with self._lock:
+                            self._metrics[priority]["timeouts"] += 1
+                        depth = self.queue_depth()
+                        logger.warning(f"LLM queue wait timed out after {timeout}s ({priority}, queue depth {depth})")
+                        raise LLMQueueTimeout(f"No LLM slot available within {timeout}s (queue depth {depth})")
+                    time.sleep(self.POLL_INTERVAL * (0.5 + random.random()))
+                    if not self._has_higher_waiters(rank):
+                        fd = self._try_acquire(rank)
+            finally:
+                self._unregister_waiter(*waiter)
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            metrics = self._metrics[priority]
+            self._in_flight += 1
+            metrics["acquired"] += 1
+            metrics["wait_ms_total"] += wait_ms
+            metrics["wait_ms_max"] = max(metrics["wait_ms_max"], wait_ms)
+        if wait_ms >= 1000:
+            logger.info(f"LLM slot acquired after {wait_ms:.0f}ms wait ({priority})")
+
+        try:
+            yield wait_ms
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self) -> Dict:
+        """実行枠の利用状況（待ち行列の深さは全プロセス、その他はこのプロセスの累積）"""
+        ranks = self._live_waiter_ranks(max_age=0)
+        with self._lock:
+            by_priority = {}
+            for priority, rank in PRIORITY_RANKS.items():
+                metrics = self._metrics[priority]
+                acquired = metrics["acquired"]
+                by_priority[priority] = {
+                    "queue_depth": ranks.count(rank),
+                    "acquired": acquired,
+                    "timeouts": metrics["timeouts"],
+                    "avg_wait_ms": metrics["wait_ms_total"] / acquired if acquired else 0.0,
+                    "max_wait_ms": metrics["wait_ms_max"],
+                }
+            return {
+                "slots": self.slots,
+                "reserved_interactive_slots": self.reserved_slots,
+                "queue_depth": len(ranks),
+                "in_flight": self._in_flight,
+                "priorities": by_priority,
+            }
+
+
+# シングルトンインスタンス
+_llm_governor = None
+_llm_governor_lock = threading.Lock()
+
+def get_llm_governor() -> LLMGovernor:
+    """LLM実行枠管理のシングルトンインスタンスを取得"""
+    global _llm_governor
+    if _llm_governor is None:
+        with _llm_governor_lock:
+            if _llm_governor is None:
+                # 各ホストがOLLAMA_NUM_PARALLEL件ずつ並列処理できる
+                slots = OLLAMA_NUM_PARALLEL * len(OLLAMA_HOSTS)
+                _llm_governor = LLMGovernor(
+                    slots,
+                    LLM_LOCK_DIR,
+                    OLLAMA_QUEUE_TIMEOUT,
+                    batch_wait_timeout=OLLAMA_BATCH_QUEUE_TIMEOUT,
+                    reserved_slots=LLM_RESERVED_INTERACTIVE_SLOTS
+                )
+                logger.info(f"LLM governor initialized: {slots} slots in {LLM_LOCK_DIR}")
+    return _llm_governor
@@ -0,0 +1,185 @@
+"""Ollamaモデルのウォームアップと常駐維持
+
+しばらくリクエストがないとOllamaはモデルをメモリから解放し、次の利用者の最初の
+メッセージがモデルのロード（数秒）を待つことになる。プロセス起動時と一定間隔で
+使用中の各モデルに空のプロンプトでgenerateを送り、モデルをロードしてkeep_aliveを延長する。
+
+- 対象はOLLAMA_WARMUP_MODESのモードで使うモデル（モード別のkeep_aliveを指定）
+- num_ctxが変わるとOllamaはモデルを再ロードするため、実際の呼び出しと同じnum_ctxを指定する
+- 通常の呼び出しと同じく、LLM実行枠（background優先度）とホストの同時実行数の上限を守る
+- 複数のgunicornワーカーのうち、ロックファイルをflockできた1プロセスだけが実行する
+  （そのプロセスが終了するとロックが解放され、別のワーカーが次の周期で引き継ぐ）
+- 結果（ロード時間など）はロックファイル横のJSONに書き出し、どのワーカーの/healthからも参照できる
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.llm_governor import BACKGROUND
+from config import (
+    OLLAMA_WARMUP_MODES,
+    OLLAMA_WARMUP_INTERVAL,
+    OLLAMA_WARMUP_LOCK_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelKeeper:
+    """使用中モデルのウォームアップを行う（1プロセスのみ）"""
+
+    def __init__(self, client, modes: List[str], interval: float = 600, lock_path: str = "instance/hirakata_llm_warmup.lock"):
+        self.client = client
+        self.modes = modes
+        self.interval = interval
+        self.lock_path = lock_path
+        self.state_path = lock_path + ".json"
+        self._lock_fd = None
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    def targets(self) -> List[Tuple[str, str, Optional[str], Dict]]:
+        """ウォームアップ対象の (モード, モデル, keep_alive, オプション) の一覧（モデルの重複は除く）"""
+        from ollama_client import MODE_DEFAULT_OPTIONS
+
+        targets = []
+        seen = set()
+        for mode in self.modes:
+            model, options, keep_alive = self.client.resolve_mode(mode, options=MODE_DEFAULT_OPTIONS.get(mode))
+            if model in seen:
+                continue
+            seen.add(model)
+            options = dict(options or {})
+            if self.client.context_sizer is not None and "num_ctx" not in self.client.modes[mode]["options"]:
+                # 実際の呼び出しで選ばれるnum_ctx（直前のバケット、未使用なら最小のバケット）に合わせる
+                current = self.client.context_sizer.stats()["current"].get(model)
+                options["num_ctx"] = current or self.client.context_sizer.buckets[0]
+            targets.append((mode, model, keep_alive, options))
+        return targets
+
+    def try_become_leader(self) -> bool:
+        """ロックファイルをflockできればこのプロセスが実行役になる"""
+        if self._lock_fd is not None:
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        logger.info(f"Model keeper leader: PID {os.getpid()}")
+        return True
+
+    def warm_up(self) -> List[Dict]:
+        """全ホスト×対象モデルにロード要求を送り、結果を記録する"""
+        results = []
+        for backend in self.client.pool.backends:
+            if backend.breaker.is_open():
+                continue
+            for mode, model, keep_alive, options in self.targets():
+                started = time.perf_counter()
+                result = {"host": backend.url, "model": model, "mode": mode, "keep_alive": keep_alive, "at": time.time()}
+                try:
+                    # 空のプロンプトはトークンを生成せず、モデルのロードとkeep_aliveの延長だけを行う
+                    # ロード中もOllamaの処理枠を使うため、対話応答より後回しにして同時実行数に数える
+                    with self.client._guarded_call(priority=BACKGROUND, url=backend.url) as client:
+                        response = client.generate(model=model, prompt="", options=options, keep_alive=keep_alive)
+                    result["ok"] = True
+                    result["load_ms"] = response.get("load_duration", 0) / 1e6
+                except Exception as e:
+                    result["ok"] = False
+                    result["error"] = str(e)
+                    logger.warning(f"Warm-up failed for {model} on {backend.url}: {e}")
+                result["total_ms"] = (time.perf_counter() - started) * 1000
+                results.append(result)
+                if result["ok"]:
+                    logger.info(f"Warmed up {model} on {backend.url}: load {result['load_ms']:.0f}ms")
+
+        self._write_state(results)
+        return results
+
+    def _write_state(self, results: List[Dict]):
+        """結果をJSONに書き出す（他のワーカーの/health用）"""
+        state = {"leader_pid": os.getpid(), "updated_at": time.time(), "results": results}
+        tmp_path = f"{self.state_path}.{os.getpid()}"
+        try:
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Failed to write warm-up state: {e}")
+
+    def run_once(self) -> Optional[List[Dict]]:
+        """実行役であればウォームアップを1回行う（実行役でなければNone）"""
+        if not self.try_become_leader():
+            return None
+        return self.warm_up()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Model keeper error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """このプロセスでキーパースレッドを起動（起動済みなら何もしない）"""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="model-keeper", daemon=True)
+        self._thread.start()
+        self._thread_pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict:
+        """直近のウォームアップ結果（実行役のプロセスが書き出したもの）"""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {"leader_pid": None, "updated_at": None, "results": []}
+        state["is_leader"] = self._lock_fd is not None
+        return state
+
+
+# シングルトンインスタンス
+_model_keeper = None
+_model_keeper_lock = threading.Lock()
+
+def get_model_keeper() -> ModelKeeper:
+    """モデルキーパーのシングルトンインスタンスを取得"""
+    global _model_keeper
+    if _model_keeper is None:
+        with _model_keeper_lock:
+            if _model_keeper is None:
+                from ollama_client import get_ollama_client
+                _model_keeper = ModelKeeper(
+                    get_ollama_client(),
+                    OLLAMA_WARMUP_MODES,
+                    interval=OLLAMA_WARMUP_INTERVAL,
+                    lock_path=OLLAMA_WARMUP_LOCK_PATH
+                )
+    return _model_keeper
+
+
+def start_model_keeper():
+    """起動時のウォームアップと定期的な常駐維持を開始"""
+    get_model_keeper().start()
@@ -0,0 +1,200 @@
+"""Ollamaバックエンドプール
+
+複数のOllamaサーバー（OLLAMA_HOSTS）にリクエストを振り分ける。
+
+- 選択: 「処理中件数+1」×「応答時間の指数移動平均」が最小のホスト
+  （未計測のホストを優先して試し、以降は速くて空いているホストを選ぶ）
+- ホストごとにサーキットブレーカーと同時実行数の上限（プロセス内）を持つ
+- 同じ対話セッションは同じホストに送る（スティッキー）。Ollamaのプロンプトキャッシュ
+  （KVキャッシュ）を再利用でき、履歴の再評価を省ける
+- サーキットブレーカーに失敗として記録するのは接続エラー・タイムアウト・5xxのみ
+  （モデル未取得などの4xxはリクエスト側の問題のため、正常なホストを切り離さない）
+- 全ホストのサーキットがopenの場合は CircuitOpenError、上限まで埋まっていて
+  待機時間内に空かない場合は LLMQueueTimeout を送出する
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import httpx
+import ollama
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.llm_governor import LLMQueueTimeout
+
+logger = logging.getLogger(__name__)
+
+
+def is_host_failure(error: Exception) -> bool:
+    """ホストの障害とみなす例外か（接続エラー・タイムアウト・5xx）"""
+    if isinstance(error, ollama.ResponseError):
+        # ストリーム途中のエラーはステータスコードが-1になる
+        return error.status_code >= 500 or error.status_code < 0
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class OllamaBackend:
+    """プール内の1ホスト"""
+
+    def __init__(self, url: str, timeout: float, max_concurrency: int,
+                 failure_threshold: int, reset_timeout: float):
+        self.url = url
+        self.client = ollama.Client(host=url, timeout=timeout)
+        self.breaker = CircuitBreaker(f"ollama:{url}", failure_threshold, reset_timeout)
+        self.max_concurrency = max(1, max_concurrency)
+        self.outstanding = 0
+        self.latency_ewma = None  # 秒
+        self.requests = 0
+        self.failures = 0
+
+    def score(self) -> float:
+        """選択の優先度（小さいほど優先）"""
+        return (self.outstanding + 1) * (self.latency_ewma or 0.0)
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "latency_ewma_ms": self.latency_ewma * 1000 if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "circuit": self.breaker.stats(),
+        }
+
+
+class OllamaBackendPool:
+    """Ollamaホストの選択・同時実行数管理・スティッキールーティング"""
+
+    # 応答時間の指数移動平均の重み
+    EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        hosts: List[str],
+        timeout: float = 30,
+        max_concurrency: int = 4,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30,
+        acquire_timeout: float = 10,
+        sticky_size: int = 10000
+    ):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.backends = [
+            OllamaBackend(url, timeout, max_concurrency, failure_threshold, reset_timeout)
+            for url in hosts
+        ]
+        self.acquire_timeout = acquire_timeout
+        self.sticky_size = sticky_size
+        self._cond = threading.Condition()
+        self._sticky = OrderedDict()  # セッションキー → ホストURL
+
+    def all_open(self) -> bool:
+        """全ホストのサーキットがopenか"""
+        return all(b.breaker.is_open() for b in self.backends)
+
+    def _select(self, session_key: Optional[str], url: Optional[str] = None) -> Optional[OllamaBackend]:
+        """空きのあるホストを選択（_condのロック内で呼ぶ）"""
+        usable = [
+            b for b in self.backends
+            if (url is None or b.url == url)
+            and b.outstanding < b.max_concurrency and not b.breaker.is_open()
+        ]
+        if not usable:
+            return None
+
+        if session_key is not None:
+            url = self._sticky.get(session_key)
+            for backend in usable:
+                if backend.url == url:
+                    return backend
+
+        best = min(b.score() for b in usable)
+        return random.choice([b for b in usable if b.score() == best])
+
+    @contextmanager
+    def lease(self, session_key: str = None, timeout: float = None, url: str = None):
+        """
+        ホストを1つ確保するコンテキストマネージャー（OllamaBackendを返す）
+
+        with内で例外が発生した場合はそのホストの失敗として記録する。
+
+        Args:
+            session_key: 同じホストに送るためのキー
+            timeout: 空きホストを待つ時間の上限（秒）
+            url: 指定した場合はそのホストだけを対象にする（全ホストへのウォームアップなど）
+
+        Raises:
+            CircuitOpenError: 全ホストのサーキットがopenの場合
+            LLMQueueTimeout: 待機時間内に空きホストがなかった場合
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self.all_open():
+                    raise CircuitOpenError("All Ollama backends are unavailable")
+                backend = self._select(session_key, url)
+                if backend is not None and backend.breaker.allow_request():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMQueueTimeout(f"No Ollama backend available within {timeout}s")
+                # サーキットの再試行時刻は通知されないため短い間隔で再確認する
+                self._cond.wait(min(remaining, 0.5))
+
+            backend.outstanding += 1
+            backend.requests += 1
+            if session_key is not None:
+                self._sticky[session_key] = backend.url
+                self._sticky.move_to_end(session_key)
+                while len(self._sticky) > self.sticky_size:
+                    self._sticky.popitem(last=False)
+
+        started = time.perf_counter()
+        outcome = "failure"
+        try:
+            yield backend
+            outcome = "success"
+        except Exception as e:
+            if not is_host_failure(e):
+                outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if outcome == "success":
+                backend.breaker.record_success()
+            elif outcome == "failure":
+                backend.breaker.record_failure()
+            else:
+                # リクエスト側のエラーは記録しない（half_openのプローブだった場合は解放する）
+                backend.breaker.cancel()
+            with self._cond:
+                backend.outstanding -= 1
+                if outcome == "success":
+                    if backend.latency_ewma is None:
+                        backend.latency_ewma = elapsed
+                    else:
+                        backend.latency_ewma += self.EWMA_ALPHA * (elapsed - backend.latency_ewma)
+                elif outcome == "failure":
+                    backend.failures += 1
+                self._cond.notify()
+
+    def forget(self, session_key: str):
+        """セッションのスティッキー情報を削除"""
+        with self._cond:
+            self._sticky.pop(session_key, None)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "backends": [b.stats() for b in self.backends],
+                "sticky_sessions": len(self._sticky),
+            }
@@ -0,0 +1,132 @@
+"""対話セッションストア
+
+LINE User ID → アクティブな対話セッション情報 を保持するキー・バリューストア。
+TTL（最終更新からの経過時間）による失効と最大件数の上限を持つ。
+
+バックエンド:
+- memory: プロセス内LRU（単一プロセス・開発用）
+- sqlite: 共有SQLiteファイル（gunicornの全ワーカーから参照できる）
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    CHAT_SESSION_TIMEOUT,
+    CHAT_SESSION_STORE,
+    CHAT_SESSION_STORE_PATH,
+    CHAT_SESSION_STORE_SIZE,
+)
+from utils.sqlite_ttl_store import SQLiteTTLStore
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionStore:
+    """プロセス内LRUによるセッションストア"""
+
+    def __init__(self, ttl: int = 600, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """有効なエントリを取得（期限切れはNone）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, updated_at = entry
+            if time.time() - updated_at > self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: dict):
+        """エントリを保存（最終更新時刻も更新）"""
+        with self._lock:
+            self._entries[key] = (dict(value), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """エントリを削除"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def sweep(self) -> int:
+        """期限切れエントリを一括削除"""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, updated_at) in self._entries.items() if now - updated_at > self.ttl]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteSessionStore(SQLiteTTLStore):
+    """共有SQLiteファイルによるセッションストア（複数ワーカー対応）"""
+
+    TABLE = "chat_session_store"
+    EXPIRY_COLUMN = "updated_at"
+    EVICTION_COLUMN = "updated_at"
+
+    def __init__(self, path: str, ttl: int = 600, max_size: int = 10000):
+        super().__init__(path, ttl=ttl, max_size=max_size)
+
+    def schema(self):
+        return [
+            """CREATE TABLE IF NOT EXISTS chat_session_store (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_chat_session_store_updated_at ON chat_session_store(updated_at)",
+        ]
+
+    def get(self, key: str) -> Optional[dict]:
+        """有効なエントリを取得（期限切れはNone）"""
+        row = self._connect().execute(
+            "SELECT value FROM chat_session_store WHERE key = ? AND updated_at >= ?",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: dict):
+        """エントリを保存（最終更新時刻も更新）"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO chat_session_store (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+        self._after_write()
+
+
+# シングルトンインスタンス
+_session_store = None
+
+def get_session_store():
+    """設定に応じたセッションストアのシングルトンインスタンスを取得"""
+    global _session_store
+    if _session_store is None:
+        if CHAT_SESSION_STORE == "memory":
+            _session_store = MemorySessionStore(ttl=CHAT_SESSION_TIMEOUT, max_size=CHAT_SESSION_STORE_SIZE)
+        else:
+            _session_store = SQLiteSessionStore(
+                CHAT_SESSION_STORE_PATH,
+                ttl=CHAT_SESSION_TIMEOUT,
+                max_size=CHAT_SESSION_STORE_SIZE
+            )
+        logger.info(f"Chat session store initialized: {CHAT_SESSION_STORE}")
+    return _session_store
@@ -0,0 +1,96 @@
+"""共有SQLiteファイルによるTTL・最大件数付きストアの基底クラス
+
+gunicornの全ワーカーから参照するキー・バリュー型のストア（対話セッション、LLM応答キャッシュ）で共通の
+接続管理・期限切れ/上限超過分の掃除を行う。ファイルには利用者の発言やLLM応答が入るため、所有者のみ
+読み書きできる権限（0600）で作成する。
+
+サブクラスはテーブル名と、期限判定・追い出し順に使う列名を指定する。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import List
+
+
+class SQLiteTTLStore:
+    """共有SQLiteファイルによるTTL・最大件数付きストア（複数ワーカー対応）"""
+
+    # この回数の書き込みごとに期限切れ・上限超過分を掃除する
+    SWEEP_INTERVAL = 100
+
+    # サブクラスで指定
+    TABLE = ""
+    EXPIRY_COLUMN = ""  # この時刻からttl秒を過ぎた行は無効
+    EVICTION_COLUMN = ""  # 上限超過時はこの時刻の古い順に削除
+
+    def __init__(self, path: str, ttl: int, max_size: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._write_count = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # sqlite3.connectに任せるとumask次第で他ユーザーから読めるため、先に0600で作成する
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+        conn = self._connect()
+        for statement in self.schema():
+            conn.execute(statement)
+
+    def schema(self) -> List[str]:
+        """CREATE TABLE / CREATE INDEX 文（サブクラスで定義）"""
+        raise NotImplementedError
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッド・プロセスごとの接続を取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _after_write(self):
+        """書き込み回数を数え、SWEEP_INTERVAL回ごとに掃除する"""
+        with self._write_lock:
+            self._write_count += 1
+            sweep = self._write_count % self.SWEEP_INTERVAL == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """期限切れエントリと上限超過分（EVICTION_COLUMNの古い順）を削除"""
+        conn = self._connect()
+        expired = conn.execute(
+            f"DELETE FROM {self.TABLE} WHERE {self.EXPIRY_COLUMN} < ?",
+            (time.time() - self.ttl,)
+        ).rowcount
+        overflow = conn.execute(
+            f"""DELETE FROM {self.TABLE} WHERE key IN (
+                SELECT key FROM {self.TABLE} ORDER BY {self.EVICTION_COLUMN} DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_size,)
+        ).rowcount
+        return expired + overflow
+
+    def delete(self, key: str):
+        """エントリを削除"""
+        self._connect().execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+
+    def clear(self):
+        """全エントリを削除"""
+        self._connect().execute(f"DELETE FROM {self.TABLE}")
+
+    def __len__(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
@@ -4,7 +4,7 @@ from flask import Blueprint, render_template, request, redirect, url_for
 from datetime import datetime
 import logging
 
-from database.db_manager import get_db, get_or_create_user, add_points, Opinion
+from database.db_manager import get_db, resolve_user, add_points, Opinion
 from config import OPINION_CATEGORIES, POINT_FREE_FORM
 
 logger = logging.getLogger(__name__)
@@ -77,11 +77,11 @@ def submit_survey():
         # データベース処理
         with get_db() as db:
             # ユーザー取得または作成
-            user = get_or_create_user(db, line_user_id)
+            user = resolve_user(db, line_user_id)
             
             # 意見を保存
             opinion = Opinion(
-                user_id=user.id,
+                user_id=user.user_id,
                 source_type='free_form',
                 content=opinion_text,
                 category=category,
@@ -90,12 +90,12 @@ def submit_survey():
                 created_at=datetime.utcnow()
             )
             db.add(opinion)
-            db.commit()
+            db.flush()
             
-            # ポイント付与
-            add_points(db, user.id, POINT_FREE_FORM, 'アンケート送信')
+            # ポイント付与（意見と同一トランザクションでコミット）
+            add_points(db, user.user_id, POINT_FREE_FORM, 'アンケート送信')
             
-            logger.info(f"Free-form opinion submitted: user={user.id}, category={category}")
+            logger.info(f"Free-form opinion submitted: user={user.user_id}, category={category}")
         
         # 成功ページ表示
         return render_template('survey_success.html',